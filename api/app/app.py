@@ -21,6 +21,8 @@ from .routes.download_routes import download_bp
 from .routes.ocr_routes import ocr_bp
 from .routes.text_routes import text_bp
 from .routes.upload_routes import upload_bp
+from .text_listing import register_text_listing_summary_listeners
+from .text_versions import register_text_version_listeners
 from .utils.api_errors import (
     INTERNAL_SERVER_ERROR,
     INVALID_REQUEST,
@@ -46,6 +48,8 @@ def create_app():
     jwt.init_app(app)
     db.init_app(app)
     limiter.init_app(app)
+    register_text_listing_summary_listeners()
+    register_text_version_listeners()
 
     @app.errorhandler(PydanticValidationError)
     @app.errorhandler(FlaskPydanticValidationError)
@@ -30,7 +30,13 @@ def create_background_job(
     created_by_user_id: int,
     payload_json: dict[str, Any],
     status_message: str = 'Waiting...',
+    commit: bool = True,
 ) -> models.BackgroundJob:
+    """Queues a job for the worker.
+
+    With ``commit=False`` the job is only flushed, so it is committed (or
+    rolled back) together with the caller's other changes.
+    """
     job = models.BackgroundJob(
         id=str(uuid.uuid4()),
         kind=kind,
@@ -40,6 +46,10 @@ def create_background_job(
         status_message=status_message,
     )
     session.add(job)
+    if not commit:
+        session.flush()
+        return job
+
     session.commit()
     session.refresh(job)
     return job
@@ -177,6 +187,25 @@ def mark_background_job_failure(
     return job
 
 
+def requeue_background_job(
+    session,
+    job: models.BackgroundJob,
+    *,
+    error_message: str,
+    status_message: str = 'Waiting for retry...',
+) -> models.BackgroundJob:
+    """Puts a failed job back in the queue, keeping its payload (and checkpoint)."""
+    job.state = models.BackgroundJobState.PENDING
+    job.status_message = status_message
+    job.error_message = error_message
+    job.claimed_at = None
+    job.claimed_by = None
+    job.heartbeat_at = utcnow()
+    session.commit()
+    session.refresh(job)
+    return job
+
+
 class BackgroundJobReporter:
     def __init__(self, session, job_id: str):
         self._session = session
@@ -201,3 +230,16 @@ class BackgroundJobReporter:
             total=total,
             status_message=status_message,
         )
+
+    def save_checkpoint(self, checkpoint: dict[str, Any]) -> None:
+        """Stores *checkpoint* in the job payload so a retried job can resume.
+
+        Commits, together with any other pending change of the session.
+        """
+        job = get_background_job(self._session, self._job_id)
+        if job is None:
+            return
+
+        job.payload_json = {**(job.payload_json or {}), 'checkpoint': checkpoint}
+        job.heartbeat_at = utcnow()
+        self._session.commit()
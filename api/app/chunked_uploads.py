@@ -0,0 +1,228 @@
+"""Resumable (chunked) text archive uploads.
+
+A client creates a ``ChunkedUpload``, sends its parts in any order (and in
+parallel) and then completes it. Parts are written to
+``CHUNKED_UPLOADS_FOLDER/<upload_id>/<part_number>.part``; which parts were
+received is read from disk, so concurrent part requests never update the same
+row. Completing claims the row, streams the parts into one archive in the
+spool folder and records the queued import on the row, so repeating the
+request returns the same job.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import time
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import or_, update
+
+from .database import models
+from .storage import storage_folder
+from .tasks.constants import CHUNKED_UPLOAD_PART_SIZE
+from .text_upload_batches import utcnow
+
+COPY_BUFFER_SIZE = 1024 * 1024
+# A completion that has not finished after this long is assumed to have died
+COMPLETION_TIMEOUT_SECONDS = 10 * 60
+
+STATUS_RECEIVING = 'receiving'
+STATUS_COMPLETING = 'completing'
+STATUS_COMPLETED = 'completed'
+_PART_FILE_PATTERN = re.compile(r'^(\d+)\.part$')
+
+
+class PartSizeMismatch(ValueError):
+    """Raised when a part does not have the size expected at its position."""
+
+
+def create_chunked_upload(
+    session,
+    *,
+    user_id: int,
+    file_name: str,
+    total_size: int,
+    duplicate_policy: str = 'import',
+) -> models.ChunkedUpload:
+    upload = models.ChunkedUpload(
+        id=str(uuid.uuid4()),
+        created_by_user_id=user_id,
+        file_name=file_name,
+        total_size=total_size,
+        part_size=CHUNKED_UPLOAD_PART_SIZE,
+        duplicate_policy=duplicate_policy,
+    )
+    session.add(upload)
+    session.commit()
+    os.makedirs(parts_folder(upload.id), exist_ok=True)
+    return upload
+
+
+def parts_folder(upload_id: str) -> str:
+    return os.path.join(storage_folder('CHUNKED_UPLOADS_FOLDER'), upload_id)
+
+
+def total_parts(upload: models.ChunkedUpload) -> int:
+    return -(-upload.total_size // upload.part_size)
+
+
+def expected_part_size(upload: models.ChunkedUpload, part_number: int) -> int:
+    """Size of part *part_number* (1-based): ``part_size``, except for the last part."""
+    if part_number == total_parts(upload):
+        return upload.total_size - (part_number - 1) * upload.part_size
+    return upload.part_size
+
+
+def received_parts(upload: models.ChunkedUpload) -> list[int]:
+    """Returns the numbers of the parts fully received, in order."""
+    numbers = []
+    try:
+        entries = list(os.scandir(parts_folder(upload.id)))
+    except FileNotFoundError:
+        return []
+
+    for entry in entries:
+        match = _PART_FILE_PATTERN.match(entry.name)
+        if match is None:
+            continue
+        number = int(match.group(1))
+        if 1 <= number <= total_parts(upload) and entry.stat().st_size == expected_part_size(upload, number):
+            numbers.append(number)
+
+    return sorted(numbers)
+
+
+def write_part(upload: models.ChunkedUpload, part_number: int, stream) -> int:
+    """Streams one part from *stream* to disk, replacing any earlier copy of it.
+
+    The part is written to a temporary file and renamed when complete, so an
+    interrupted request never leaves a truncated part behind.
+
+    Raises:
+        PartSizeMismatch: the stream holds more or fewer bytes than expected.
+    """
+    expected_size = expected_part_size(upload, part_number)
+    folder = parts_folder(upload.id)
+    os.makedirs(folder, exist_ok=True)
+    partial_path = os.path.join(folder, f'{part_number}.part.{uuid.uuid4()}')
+    size = 0
+
+    try:
+        with open(partial_path, 'wb') as part_file:
+            while True:
+                data = stream.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                size += len(data)
+                if size > expected_size:
+                    raise PartSizeMismatch(f'Part {part_number} must be {expected_size} bytes.')
+                part_file.write(data)
+
+        if size != expected_size:
+            raise PartSizeMismatch(f'Part {part_number} must be {expected_size} bytes.')
+
+        os.replace(partial_path, os.path.join(folder, f'{part_number}.part'))
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    return size
+
+
+def assemble_parts(upload: models.ChunkedUpload, destination: str) -> str:
+    """Concatenates all parts into *destination* and returns its SHA-256.
+
+    Parts are copied through a fixed-size buffer, never loaded whole. If
+    assembly fails, the partial *destination* is removed.
+    """
+    hasher = hashlib.sha256()
+    folder = parts_folder(upload.id)
+
+    try:
+        with open(destination, 'wb') as archive:
+            for part_number in range(1, total_parts(upload) + 1):
+                with open(os.path.join(folder, f'{part_number}.part'), 'rb') as part_file:
+                    while True:
+                        data = part_file.read(COPY_BUFFER_SIZE)
+                        if not data:
+                            break
+                        hasher.update(data)
+                        archive.write(data)
+    except Exception:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+
+    return hasher.hexdigest()
+
+
+def claim_for_completion(session, upload: models.ChunkedUpload) -> bool:
+    """Marks *upload* as being completed, unless another request already did (commits).
+
+    The claim is a single conditional UPDATE, so of two overlapping requests
+    only one gets it. A claim older than COMPLETION_TIMEOUT_SECONDS can be
+    taken over. Returns whether this request got the claim.
+    """
+    now = utcnow()
+    result = session.execute(
+        update(models.ChunkedUpload)
+        .where(
+            models.ChunkedUpload.id == upload.id,
+            or_(
+                models.ChunkedUpload.status == STATUS_RECEIVING,
+                (models.ChunkedUpload.status == STATUS_COMPLETING)
+                & (models.ChunkedUpload.updated_at < now - timedelta(seconds=COMPLETION_TIMEOUT_SECONDS)),
+            ),
+        )
+        .values(status=STATUS_COMPLETING, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    session.refresh(upload)
+    return result.rowcount == 1
+
+
+def release_completion_claim(session, upload: models.ChunkedUpload) -> None:
+    """Lets the upload be completed again after a failed attempt (commits)."""
+    upload.status = STATUS_RECEIVING
+    session.commit()
+
+
+def mark_chunked_upload_completed(session, upload: models.ChunkedUpload, *, job_id: str, batch_id: int) -> None:
+    """Records the queued import and removes the parts (commits, with the
+    caller's pending changes)."""
+    upload.status = STATUS_COMPLETED
+    upload.job_id = job_id
+    upload.batch_id = batch_id
+    session.commit()
+    shutil.rmtree(parts_folder(upload.id), ignore_errors=True)
+
+
+def discard_chunked_upload(session, upload: models.ChunkedUpload) -> None:
+    """Deletes the upload row and its parts (commits)."""
+    shutil.rmtree(parts_folder(upload.id), ignore_errors=True)
+    session.delete(upload)
+    session.commit()
+
+
+def cleanup_expired_chunked_uploads(session, max_age_seconds: int) -> int:
+    """Discards uploads not touched for *max_age_seconds*, and part folders
+    without an upload row. Returns how many uploads were removed."""
+    cutoff = utcnow() - timedelta(seconds=max_age_seconds)
+    expired = (
+        session.query(models.ChunkedUpload)
+        .filter(models.ChunkedUpload.updated_at < cutoff)
+        .all()
+    )
+    for upload in expired:
+        discard_chunked_upload(session, upload)
+
+    known_ids = {upload_id for (upload_id,) in session.query(models.ChunkedUpload.id).all()}
+    folder_cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(storage_folder('CHUNKED_UPLOADS_FOLDER')):
+        if entry.is_dir() and entry.name not in known_ids and entry.stat().st_mtime < folder_cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    return len(expired)
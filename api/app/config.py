@@ -61,7 +61,31 @@ class Config:
     TEXT_UPLOAD_RECONCILE_INTERVAL_SECONDS = int(os.getenv('TEXT_UPLOAD_RECONCILE_INTERVAL_SECONDS', '60'))
     TEXT_UPLOAD_STALE_AFTER_SECONDS = int(os.getenv('TEXT_UPLOAD_STALE_AFTER_SECONDS', '600'))
     TEXT_UPLOAD_MAX_PROCESSING_ATTEMPTS = int(os.getenv('TEXT_UPLOAD_MAX_PROCESSING_ATTEMPTS', '3'))
+    TEXT_UPLOAD_PARSE_WORKERS = int(os.getenv('TEXT_UPLOAD_PARSE_WORKERS', '2'))  # 0 parses in the job worker itself
+    TEXT_UPLOAD_INSERT_BATCH_SIZE = int(os.getenv('TEXT_UPLOAD_INSERT_BATCH_SIZE', '50'))
+    TEXT_UPLOAD_MAX_FILES = int(os.getenv('TEXT_UPLOAD_MAX_FILES', '10000'))
+    TEXT_UPLOAD_IMPORT_MAX_ATTEMPTS = int(os.getenv('TEXT_UPLOAD_IMPORT_MAX_ATTEMPTS', '3'))
     JOB_WORKER_IDLE_SLEEP_SECONDS = float(os.getenv('JOB_WORKER_IDLE_SLEEP_SECONDS', '1'))
+    TEXT_EXPORT_RETENTION_SECONDS = int(os.getenv('TEXT_EXPORT_RETENTION_SECONDS', str(24 * 60 * 60)))
+    CHUNKED_UPLOAD_RETENTION_SECONDS = int(os.getenv('CHUNKED_UPLOAD_RETENTION_SECONDS', str(24 * 60 * 60)))
+
+    # --- Storage -------------------------------------------------------------
+
+    # Working folders for uploaded archives, OCR page images and export archives
+    TEMP_UPLOADS_FOLDER = os.getenv('TEMP_UPLOADS_FOLDER', os.path.join(os.getcwd(), 'temp_uploads'))
+    CHUNKED_UPLOADS_FOLDER = os.getenv('CHUNKED_UPLOADS_FOLDER', os.path.join(TEMP_UPLOADS_FOLDER, 'chunked'))
+    IMAGES_FOLDER = os.getenv('IMAGES_FOLDER', os.path.join(os.getcwd(), 'images'))
+    IMAGE_DERIVATIVES_FOLDER = os.getenv('IMAGE_DERIVATIVES_FOLDER', os.path.join(os.getcwd(), 'image_derivatives'))
+    EXPORTS_FOLDER = os.getenv('EXPORTS_FOLDER', os.path.join(os.getcwd(), 'exports'))
+
+    # --- OCR -----------------------------------------------------------------
+
+    OCR_CONCURRENCY = int(os.getenv('OCR_CONCURRENCY', '4'))
+    OCR_REQUESTS_PER_MINUTE = int(os.getenv('OCR_REQUESTS_PER_MINUTE', '60'))  # 0 disables rate limiting
+    OCR_MAX_RETRIES = int(os.getenv('OCR_MAX_RETRIES', '2'))
+    OCR_RETRY_BACKOFF_SECONDS = float(os.getenv('OCR_RETRY_BACKOFF_SECONDS', '2'))
+    OCR_UPLOAD_MAX_ATTEMPTS = int(os.getenv('OCR_UPLOAD_MAX_ATTEMPTS', '3'))
+    OCR_MAX_RESOLUTION = int(os.getenv('OCR_MAX_RESOLUTION', '3000'))  # longest side sent to OCR, in pixels
 
     # --- Logging -------------------------------------------------------------
 
@@ -2,6 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from .models import Base
 from .scripts.initialize import init_empty_db
+from .scripts.upgrade import upgrade_database_schema
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -20,3 +21,4 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 init_empty_db(engine, SessionLocal)
+upgrade_database_schema(engine)
@@ -1,6 +1,7 @@
 from app.extensions import bcrypt
 
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String,
@@ -10,6 +11,9 @@ from sqlalchemy import (
     Text as TextType,
     ForeignKey,
     UniqueConstraint,
+    Index,
+    DDL,
+    event,
     func,
     Enum as SQLAlchemyEnum,
     JSON,
@@ -39,6 +43,8 @@ class TextUploadBatchStatus(enum.Enum):
 class BackgroundJobKind(enum.Enum):
     TEXT_UPLOAD_IMPORT = 'TEXT_UPLOAD_IMPORT'
     OCR_UPLOAD = 'OCR_UPLOAD'
+    TEXT_EXPORT = 'TEXT_EXPORT'
+    SUGGESTION_PROPAGATION = 'SUGGESTION_PROPAGATION'
 
 
 class BackgroundJobState(enum.Enum):
@@ -49,6 +55,13 @@ class BackgroundJobState(enum.Enum):
 
 Base = declarative_base()
 
+# Trigram indexes (gin_trgm_ops) need the pg_trgm extension before the tables are created.
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
+
 class User(Base):
     """
     Model for the 'users' table.
@@ -66,6 +79,7 @@ class User(Base):
     texts_association = relationship('TextsUsers', back_populates='user', cascade="all, delete-orphan")
     text_upload_batches = relationship('TextUploadBatch', back_populates='created_by_user', cascade="all, delete-orphan")
     background_jobs = relationship('BackgroundJob', back_populates='created_by_user', cascade="all, delete-orphan")
+    chunked_uploads = relationship('ChunkedUpload', back_populates='created_by_user', cascade="all, delete-orphan")
 
     def set_password(self, password: str):
         self.hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
@@ -96,6 +110,48 @@ class Text(Base):
     processing_heartbeat_at = Column(TIMESTAMP, nullable=True)
     processing_attempts = Column(Integer, nullable=False, default=0)
     last_processing_error = Column(TextType, nullable=True)
+    content_version = Column(Integer, nullable=False, default=1, server_default='1')
+    # SHA-256 of the extracted text, used to detect re-uploaded documents
+    content_sha256 = Column(String(64), nullable=True, index=True)
+
+
+class TextListingSummary(Base):
+    """
+    Model for the 'text_listing_summaries' table.
+    Precomputed listing row per text (metadata, assigned usernames and normalization
+    state), kept up to date by app.text_listing whenever texts or assignments change.
+    """
+    __tablename__ = 'text_listing_summaries'
+
+    text_id = Column(Integer, ForeignKey('texts.id', ondelete="CASCADE"), primary_key=True)
+    grade = Column(SmallInteger, nullable=True)
+    source_file_name = Column(String(255), nullable=True)
+    processing_status = Column(SQLAlchemyEnum(ProcessingStatus), nullable=False, default=ProcessingStatus.PENDING)
+    assigned_usernames = Column(JSON, nullable=False, default=list)
+    normalized_by_any = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(TIMESTAMP, nullable=False, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index(
+            'ix_text_listing_summaries_source_file_name_trgm',
+            'source_file_name',
+            postgresql_using='gin',
+            postgresql_ops={'source_file_name': 'gin_trgm_ops'},
+        ),
+    )
+
+
+# Keyset pagination indexes matching the listing sort expressions.
+Index(
+    'ix_text_listing_summaries_grade_sort',
+    func.coalesce(TextListingSummary.grade, -1),
+    TextListingSummary.text_id,
+)
+Index(
+    'ix_text_listing_summaries_source_file_name_sort',
+    func.coalesce(TextListingSummary.source_file_name, ''),
+    TextListingSummary.text_id,
+)
 
 
 class TextUploadBatch(Base):
@@ -104,6 +160,7 @@ class TextUploadBatch(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     created_by_user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
     source_file_name = Column(String(255), nullable=True)
+    archive_sha256 = Column(String(64), nullable=True, index=True)
     status = Column(
         SQLAlchemyEnum(TextUploadBatchStatus),
         nullable=False,
@@ -115,6 +172,8 @@ class TextUploadBatch(Base):
     processed_texts = Column(Integer, nullable=False, default=0)
     failed_texts = Column(Integer, nullable=False, default=0)
     failed_files = Column(TextType, nullable=False, default='[]')
+    # Files not imported because their content was already known (duplicate_policy='skip')
+    skipped_files = Column(TextType, nullable=False, default='[]', server_default='[]')
     last_error = Column(TextType, nullable=True)
     created_at = Column(TIMESTAMP, nullable=False, default=func.now())
     updated_at = Column(TIMESTAMP, nullable=False, default=func.now(), onupdate=func.now())
@@ -155,6 +214,31 @@ class BackgroundJob(Base):
 
     created_by_user = relationship('User', back_populates='background_jobs')
 
+
+class ChunkedUpload(Base):
+    """
+    Model for the 'chunked_uploads' table.
+    A resumable text archive upload in progress; its parts are stored on disk
+    (see app.chunked_uploads) until the upload is completed.
+    """
+    __tablename__ = 'chunked_uploads'
+
+    id = Column(String(36), primary_key=True)
+    created_by_user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    file_name = Column(String(255), nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    duplicate_policy = Column(String(16), nullable=False, default='import')
+    # 'receiving', then 'completing' while the parts are assembled, then 'completed'
+    status = Column(String(16), nullable=False, default='receiving')
+    # Set once completed, so a repeated completion returns the same import
+    job_id = Column(String(36), nullable=True)
+    batch_id = Column(Integer, nullable=True)
+    created_at = Column(TIMESTAMP, nullable=False, default=func.now())
+    updated_at = Column(TIMESTAMP, nullable=False, default=func.now(), onupdate=func.now())
+
+    created_by_user = relationship('User', back_populates='chunked_uploads')
+
 class RawText(Base):
     """
     Model for the 'raw_texts' table.
@@ -173,7 +257,7 @@ class Token(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     text_id = Column(Integer, ForeignKey('texts.id', ondelete="CASCADE"), nullable=False, index=True)
-    token_text = Column(String(512), nullable=False)
+    token_text = Column(String(512), nullable=False, index=True)
     is_word = Column(Boolean, nullable=False)
     position = Column(Integer, nullable=False)
     to_be_normalized = Column(Boolean, nullable=True, )
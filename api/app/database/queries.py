@@ -1,7 +1,12 @@
-from sqlalchemy import func, select
-from sqlalchemy.orm import joinedload
+import json
+from difflib import SequenceMatcher
+from types import SimpleNamespace
+
+from sqlalchemy import and_, delete, func, literal, or_, select
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from app.database.models import (
     Token,
@@ -13,8 +18,11 @@ from app.database.models import (
     TokensSuggestions,
     WhitelistTokens,
     RawText,
+    TextListingSummary,
 )
 from app.extensions import db
+from app.tasks.suggestion_task_logic import enqueue_suggestion_propagation
+from app.text_versions import bump_text_versions
 
 
 def authenticate_user(db, username, password):
@@ -37,35 +45,12 @@ def authenticate_user(db, username, password):
         return False, None
 
 
-def get_texts_data(db, user_id):
+def get_texts_data(db, user_id, **page_options):
     """
     Fetch a list of all texts with relevant metadata.
+    Accepts the same sorting, keyset and projection options as get_filtered_texts.
     """
-    # Subquery that checks if the text was normalized by the user
-    normalized_subquery = (
-        select(TextsUsers.normalized)
-        .where(TextsUsers.text_id == Text.id, TextsUsers.user_id == user_id)
-        .scalar_subquery()
-    )
-
-    users_agg_subquery = (
-        select(func.array_agg(User.username))
-        .join(TextsUsers, User.id == TextsUsers.user_id)
-        .where(TextsUsers.text_id == Text.id, TextsUsers.assigned == True)
-        .correlate(Text)
-        .scalar_subquery()
-    )
-
-    result = db.query(
-        func.coalesce(normalized_subquery, False).label("normalized_by_user"),
-        users_agg_subquery.label("users_assigned"),
-        Text.id.label("id"),
-        Text.grade.label("grade"),
-        Text.source_file_name.label("source_file_name"),
-        Text.processing_status.label("processing_status"),
-    ).all()
-
-    return result
+    return get_filtered_texts(db, user_id=user_id, **page_options)
 
 
 def get_raw_texts(db):
@@ -79,43 +64,112 @@ def get_raw_texts(db):
     return result
 
 
-def get_text_by_id(db, text_id, user_id):
+TEXT_TOKENS_YIELD_PER = 1000
+
+
+def _token_candidates_subquery(db, text_id):
+    """One row per flagged token of *text_id* with its suggestions aggregated
+    into a single value (a PostgreSQL array, or a JSON array elsewhere)."""
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = func.array_agg(aggregate_order_by(Suggestion.token_text, Suggestion.token_text))
+    else:
+        candidates = func.json_group_array(Suggestion.token_text)
+
+    return (
+        select(TokensSuggestions.token_id, candidates.label("candidates"))
+        .join(Suggestion, Suggestion.id == TokensSuggestions.suggestion_id)
+        .join(Token, Token.id == TokensSuggestions.token_id)
+        .where(Token.text_id == text_id)
+        .group_by(TokensSuggestions.token_id)
+        .subquery()
+    )
+
+
+def _token_row_to_dict(row) -> dict:
+    candidates = row.candidates
+    if candidates is None:
+        candidates = []
+    elif isinstance(candidates, str):
+        candidates = sorted(json.loads(candidates))
+
+    return {
+        "id": row.id,
+        "text": row.token_text,
+        "isWord": row.is_word,
+        "position": row.position,
+        "candidates": candidates,
+        "toBeNormalized": row.to_be_normalized,
+        "whitespaceAfter": row.whitespace_after,
+        "whitelisted": row.whitelisted,
+    }
+
+
+def iter_text_tokens(db, text_id):
     """
-    Fetch a specific text by its ID.
+    Yields the tokens of a text as dicts, ordered by position, each with its
+    suggestion candidates.
+
+    Tokens and aggregated suggestions are read in a single Core query (one row
+    per token, no ORM objects). The query runs immediately; rows are fetched
+    from the cursor in batches as the generator is consumed.
     """
-    text_info = (
-        db.query(Text)
-        .filter(Text.id == text_id)
-        .options(joinedload(Text.tokens).joinedload(Token.suggestions))
-        .first()
+    candidates = _token_candidates_subquery(db, text_id)
+    query = (
+        select(
+            Token.id,
+            Token.token_text,
+            Token.is_word,
+            Token.position,
+            Token.to_be_normalized,
+            Token.whitespace_after,
+            Token.whitelisted,
+            candidates.c.candidates,
+        )
+        .outerjoin(candidates, candidates.c.token_id == Token.id)
+        .where(Token.text_id == text_id)
+        .order_by(Token.position)
+        .execution_options(yield_per=TEXT_TOKENS_YIELD_PER)
     )
+    result = db.execute(query)
+    return (_token_row_to_dict(row) for row in result)
+
+
+def get_text_by_id(db, text_id, user_id, stream_tokens=False):
+    """
+    Fetch a specific text by its ID.
+
+    Args:
+        stream_tokens: When True, "tokens" is a lazy iterator (see iter_text_tokens)
+            instead of a list, so callers can serialize it without holding every token.
+    """
+    text_info = db.execute(
+        select(
+            Text.id,
+            Text.grade,
+            Text.source_file_name,
+            Text.processing_status,
+            TextsUsers.normalized,
+            TextsUsers.assigned,
+        )
+        .outerjoin(
+            TextsUsers,
+            and_(TextsUsers.text_id == Text.id, TextsUsers.user_id == user_id),
+        )
+        .where(Text.id == text_id)
+    ).first()
 
     if not text_info:
         return None
 
-    assoc = db.query(TextsUsers).filter_by(text_id=text_id, user_id=user_id).first()
-
-    tokens_data = [
-        {
-            "id": token.id,
-            "text": token.token_text,
-            "isWord": token.is_word,
-            "position": token.position,
-            "candidates": [s.token_text for s in token.suggestions],
-            "toBeNormalized": token.to_be_normalized,
-            "whitespaceAfter": token.whitespace_after,
-            "whitelisted": token.whitelisted,
-        }
-        for token in text_info.tokens
-    ]
+    tokens = iter_text_tokens(db, text_id)
 
     response_dict = {
         "id": text_info.id,
         "grade": text_info.grade,
-        "tokens": tokens_data,
-        "normalized_by_user": bool(assoc.normalized) if assoc else False,
+        "tokens": tokens if stream_tokens else list(tokens),
+        "normalized_by_user": bool(text_info.normalized),
         "source_file_name": text_info.source_file_name,
-        "assigned_to_user": bool(assoc.assigned) if assoc else False,
+        "assigned_to_user": bool(text_info.assigned),
         "processing_status": (
             text_info.processing_status.name
             if hasattr(text_info.processing_status, "name")
@@ -125,6 +179,13 @@ def get_text_by_id(db, text_id, user_id):
     return response_dict
 
 
+def get_text_content_version(db, text_id):
+    """
+    Returns the content version of a text (see app.text_versions), or None if it does not exist.
+    """
+    return db.execute(select(Text.content_version).where(Text.id == text_id)).scalar_one_or_none()
+
+
 def get_raw_text_by_id(db, text_id):
     """
     Fetch a specific raw text by its ID.
@@ -274,36 +335,16 @@ def save_normalization(
         db.add(new_norm)
 
     if suggest_for_all:
-        # Get the original token to find its text
-        token = db.query(Token).filter_by(text_id=text_id, position=start_index).first()
-        if token:
-            # Get or Create Suggestion
-            suggestion = db.query(Suggestion).filter_by(token_text=new_token).first()
-            if not suggestion:
-                suggestion = Suggestion(token_text=new_token)
-                db.add(suggestion)
-                db.flush()
-
-            # Find all matching tokens IDs
-            matching_token_ids = (
-                db.query(Token.id).filter(Token.token_text == token.token_text).all()
+        # Linking the suggestion to every matching token in the corpus is
+        # done by the job worker, after this request returns.
+        token_text = (
+            db.query(Token.token_text).filter_by(text_id=text_id, position=start_index).scalar()
+        )
+        if token_text is not None:
+            enqueue_suggestion_propagation(
+                db, user_id=user_id, token_text=token_text, suggestion=new_token
             )
 
-            if matching_token_ids:
-                # Bulk Insert with ON CONFLICT DO NOTHING
-                stmt = insert(TokensSuggestions).values(
-                    [
-                        {"token_id": t_id[0], "suggestion_id": suggestion.id}
-                        for t_id in matching_token_ids
-                    ]
-                )
-
-                stmt = stmt.on_conflict_do_nothing(
-                    index_elements=["token_id", "suggestion_id"]
-                )
-
-                db.execute(stmt)
-
     if autocommit:
         db.commit()
 
@@ -322,6 +363,59 @@ def delete_normalization(db, text_id, user_id, start_index):
         db.commit()
 
 
+def save_normalizations_batch(db, text_id, user_id, normalizations, deleted_indexes):
+    """
+    Saves and deletes several normalizations of a user in one transaction.
+
+    normalizations is a list of (start_index, end_index, new_token) tuples with
+    distinct start indexes; they are written with a single
+    INSERT ... ON CONFLICT DO UPDATE. deleted_indexes are start indexes of
+    normalizations to remove. Returns (saved, deleted) counts.
+    """
+    deleted = 0
+    if deleted_indexes:
+        deleted = db.execute(
+            delete(Normalization)
+            .where(
+                Normalization.text_id == text_id,
+                Normalization.user_id == user_id,
+                Normalization.start_index.in_(deleted_indexes),
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    if normalizations:
+        dialect_insert = insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        now = func.now()
+        stmt = dialect_insert(Normalization).values(
+            [
+                {
+                    "text_id": text_id,
+                    "user_id": user_id,
+                    "start_index": start_index,
+                    "end_index": end_index,
+                    "new_token": new_token,
+                    "creation_time": now,
+                }
+                for start_index, end_index, new_token in normalizations
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["text_id", "user_id", "start_index"],
+            set_={
+                "end_index": stmt.excluded.end_index,
+                "new_token": stmt.excluded.new_token,
+                "creation_time": stmt.excluded.creation_time,
+            },
+        )
+        db.execute(stmt)
+
+    if normalizations or deleted:
+        bump_text_versions(db, [text_id])
+    db.commit()
+    return len(normalizations), deleted
+
+
 def toggle_normalized(db, text_id, user_id):
     """
     Adds or removes an entry in the 'normalized_texts_users' table.
@@ -419,6 +513,105 @@ def add_text(
         raise e
 
 
+def add_texts_batch(
+    texts: list[tuple[Text, list[tuple[Token, list[str]]]]], db=db, commit: bool = True
+) -> list[int]:
+    """
+    Adds several texts and their tokens to the database in one transaction.
+
+    Unlike add_text, the tokens of all texts are inserted with a single flush
+    (batched INSERTs) and the batch is committed once.
+
+    Args:
+        db: The SQLAlchemy database session.
+        texts: A list of (text_obj, tokens_with_candidates) tuples, as taken by add_text.
+        commit: With False the texts are only flushed, and committing or rolling
+                back is left to the caller.
+    Returns:
+        The IDs of the new texts, in the order given.
+    """
+    try:
+        db.add_all([text_obj for text_obj, _ in texts])
+        db.flush()
+
+        for text_obj, tokens_with_candidates in texts:
+            for token, _ in tokens_with_candidates:
+                token.text_id = text_obj.id
+                db.add(token)
+        db.flush()
+
+        for text_obj, tokens_with_candidates in texts:
+            for token, candidates in tokens_with_candidates:
+                for candidate in set(candidates):
+                    add_suggestion(text_obj.id, token.id, candidate, db)
+
+        if commit:
+            db.commit()
+
+        return [text_obj.id for text_obj, _ in texts]
+
+    except Exception as e:
+        if commit:
+            db.rollback()
+        raise e
+
+
+def copy_text_tokens(source_text_id: int, text_obj: Text, db=db, commit: bool = True) -> int:
+    """
+    Adds *text_obj* with a copy of the tokens and suggestion links of an existing text.
+
+    Tokens and links are copied with two INSERT ... SELECT statements, so the
+    new text is ready without tokenization or spell-checking.
+
+    Args:
+        db: The SQLAlchemy database session.
+        source_text_id: ID of the text whose tokens are copied.
+        text_obj: An instance of the Text model (without ID).
+        commit: With False the copy is only flushed, as in add_texts_batch.
+    Returns:
+        The ID of the newly created text.
+    """
+    try:
+        db.add(text_obj)
+        db.flush()
+
+        db.execute(
+            Token.__table__.insert().from_select(
+                ['text_id', 'token_text', 'is_word', 'position', 'to_be_normalized', 'whitespace_after', 'whitelisted'],
+                select(
+                    literal(text_obj.id),
+                    Token.token_text,
+                    Token.is_word,
+                    Token.position,
+                    Token.to_be_normalized,
+                    Token.whitespace_after,
+                    Token.whitelisted,
+                ).where(Token.text_id == source_text_id),
+            )
+        )
+
+        source_token = aliased(Token)
+        db.execute(
+            TokensSuggestions.__table__.insert().from_select(
+                ['token_id', 'suggestion_id'],
+                select(Token.id, TokensSuggestions.suggestion_id)
+                .join(source_token, source_token.id == TokensSuggestions.token_id)
+                .join(Token, and_(Token.text_id == text_obj.id, Token.position == source_token.position))
+                .where(source_token.text_id == source_text_id),
+            )
+        )
+
+        if commit:
+            db.commit()
+
+        return text_obj.id
+
+    except Exception as e:
+        if commit:
+            db.rollback()
+        raise e
+
+
 def get_user_by_username(db, username: str):
     """
     Fetch a user by their username.
@@ -507,6 +700,31 @@ def get_all_users(db):
     return db.query(User).order_by(User.id).all()
 
 
+TEXT_LISTING_FIELDS = (
+    "id",
+    "grade",
+    "normalized_by_user",
+    "source_file_name",
+    "users_assigned",
+    "processing_status",
+)
+
+TEXT_LISTING_SORT_KEYS = ("id", "grade", "source_file_name")
+
+
+def _text_listing_sort_expression(sort_by: str):
+    """
+    Returns the non-null expression used to order (and seek) the text listing.
+    Nullable columns are coalesced so that keyset comparisons stay total; the
+    expressions match the sort indexes on text_listing_summaries.
+    """
+    if sort_by == "grade":
+        return func.coalesce(TextListingSummary.grade, -1)
+    if sort_by == "source_file_name":
+        return func.coalesce(TextListingSummary.source_file_name, "")
+    return TextListingSummary.text_id
+
+
 def get_filtered_texts(
     db,
     grades: list[int] = None,
@@ -514,85 +732,236 @@ def get_filtered_texts(
     user_id: int = None,
     normalized: bool = None,
     file_name: str = None,
+    sort_by: str = "id",
+    descending: bool = False,
+    after: tuple = None,
+    limit: int = None,
+    fields: list[str] = None,
 ):
     """
     Fetch filtered texts with optional filter criteria.
-    Uses LEFT JOINs to include all texts, even those without assignments.
-    """
-    from sqlalchemy import select
-    from sqlalchemy.orm import aliased
-
-    # Subquery for aggregating assigned usernames
-    users_agg_subquery = (
-        select(func.array_agg(User.username))
-        .join(TextsUsers, User.id == TextsUsers.user_id)
-        .where(TextsUsers.text_id == Text.id, TextsUsers.assigned == True)
-        .correlate(Text)
-        .scalar_subquery()
-    )
 
-    # Subquery for normalized status.
-    # If user_id is provided, this is the current user's normalized status.
-    # Otherwise, fallback to aggregate "any user normalized" semantics.
-    if user_id is not None:
-        normalized_subquery = (
-            select(TextsUsers.normalized)
-            .where(TextsUsers.text_id == Text.id, TextsUsers.user_id == user_id)
-            .correlate(Text)
-            .scalar_subquery()
-        )
-    else:
-        normalized_subquery = (
-            select(func.bool_or(TextsUsers.normalized))
-            .where(TextsUsers.text_id == Text.id)
-            .correlate(Text)
-            .scalar_subquery()
-        )
+    Reads the precomputed text_listing_summaries rows (see app.text_listing), so
+    assigned usernames come from a stored column instead of being aggregated per
+    request. The current user's normalized flag is a primary-key lookup on
+    textsusers, skipped when the projection in `fields` does not need it.
 
-    # Start query from Text table
-    query = db.query(
-        Text.id.label("id"),
-        Text.grade.label("grade"),
-        Text.source_file_name.label("source_file_name"),
-        Text.processing_status.label("processing_status"),
-        users_agg_subquery.label("users_assigned"),
-        func.coalesce(normalized_subquery, False).label("normalized_by_user"),
-    )
+    Args:
+        sort_by: One of TEXT_LISTING_SORT_KEYS.
+        descending: Sort direction.
+        after: Keyset position (sort_value, text_id) of the last row already seen.
+        limit: Maximum number of rows to return.
+        fields: Subset of TEXT_LISTING_FIELDS to compute. Defaults to all fields.
+    Returns:
+        Rows exposing the requested fields plus `sort_value`.
+    """
+    if sort_by not in TEXT_LISTING_SORT_KEYS:
+        raise ValueError(f"Unsupported sort key: {sort_by}")
+
+    requested_fields = set(fields or TEXT_LISTING_FIELDS)
+    sort_expression = _text_listing_sort_expression(sort_by)
+    summary = TextListingSummary
+
+    columns = [summary.text_id.label("id")]
+    if "grade" in requested_fields:
+        columns.append(summary.grade.label("grade"))
+    if "source_file_name" in requested_fields:
+        columns.append(summary.source_file_name.label("source_file_name"))
+    if "processing_status" in requested_fields:
+        columns.append(summary.processing_status.label("processing_status"))
+    if "users_assigned" in requested_fields:
+        columns.append(summary.assigned_usernames.label("users_assigned"))
+
+    query = select(*columns)
+
+    if "normalized_by_user" in requested_fields:
+        # If user_id is provided, this is the current user's normalized status.
+        # Otherwise, fallback to aggregate "any user normalized" semantics.
+        if user_id is not None:
+            current_user_assoc = aliased(TextsUsers)
+            query = query.add_columns(
+                func.coalesce(current_user_assoc.normalized, False).label("normalized_by_user")
+            ).outerjoin(
+                current_user_assoc,
+                and_(
+                    current_user_assoc.text_id == summary.text_id,
+                    current_user_assoc.user_id == user_id,
+                ),
+            )
+        else:
+            query = query.add_columns(summary.normalized_by_any.label("normalized_by_user"))
+
+    query = query.add_columns(sort_expression.label("sort_value"))
 
     # Filter by grades
     if grades:
-        query = query.filter(Text.grade.in_(grades))
+        query = query.where(summary.grade.in_(grades))
 
-    # Filter by assigned users - need a subquery check
+    # Filter by assigned users
     if assigned_users:
         assigned_subquery = (
             select(TextsUsers.text_id)
             .join(User, User.id == TextsUsers.user_id)
             .where(User.username.in_(assigned_users), TextsUsers.assigned == True)
         )
-        query = query.filter(Text.id.in_(assigned_subquery))
+        query = query.where(summary.text_id.in_(assigned_subquery))
 
     # Filter by normalized status for current user.
-    if user_id is not None and normalized is True:
-        normalized_check = select(TextsUsers.text_id).where(
-            TextsUsers.user_id == user_id, TextsUsers.normalized == True
-        )
-        query = query.filter(Text.id.in_(normalized_check))
-    elif user_id is not None and normalized is False:
+    if user_id is not None and normalized is not None:
         normalized_check = select(TextsUsers.text_id).where(
             TextsUsers.user_id == user_id, TextsUsers.normalized == True
         )
-        query = query.filter(~Text.id.in_(normalized_check))
+        if normalized:
+            query = query.where(summary.text_id.in_(normalized_check))
+        else:
+            query = query.where(~summary.text_id.in_(normalized_check))
 
-    # Filter by file name
+    # Filter by file name (served by the trigram index on PostgreSQL)
     if file_name:
         # fuzzy search logic: split by spaces, add wildcards between terms
         # "20152 t4" becomes "%20152%t4%" to match "20152t4p4363n3r.docx"
         terms = file_name.split()
         pattern = "%" + "%".join(terms) + "%"
-        query = query.filter(Text.source_file_name.ilike(pattern))
+        query = query.where(summary.source_file_name.ilike(pattern))
+
+    # Keyset seek: (sort_value, id) strictly after the cursor position
+    if after is not None:
+        after_value, after_id = after
+        if sort_by == "id":
+            query = query.where(
+                summary.text_id < after_id if descending else summary.text_id > after_id
+            )
+        elif descending:
+            query = query.where(
+                or_(
+                    sort_expression < after_value,
+                    and_(sort_expression == after_value, summary.text_id < after_id),
+                )
+            )
+        else:
+            query = query.where(
+                or_(
+                    sort_expression > after_value,
+                    and_(sort_expression == after_value, summary.text_id > after_id),
+                )
+            )
+
+    if descending:
+        query = query.order_by(sort_expression.desc(), summary.text_id.desc())
+    else:
+        query = query.order_by(sort_expression.asc(), summary.text_id.asc())
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return db.execute(query).all()
+
+
+FILE_NAME_SEARCH_MODES = ("fuzzy", "prefix", "substring")
+
 
-    return query.all()
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _file_name_search_pattern(term: str, mode: str) -> str:
+    """
+    Builds the LIKE pattern for a file name search.
+    prefix: "2015" -> "2015%"; substring: "t4p4" -> "%t4p4%";
+    fuzzy: "20152 t4" -> "%20152%t4%" (terms in order, anything in between).
+    """
+    if mode == "prefix":
+        return _escape_like(term) + "%"
+    if mode == "substring":
+        return "%" + _escape_like(term) + "%"
+    return "%" + "%".join(_escape_like(part) for part in term.split()) + "%"
+
+
+def _file_name_match_score(file_name: str, term: str) -> float:
+    """Python ranking used when pg_trgm is not available (SQLite)."""
+    name = (file_name or "").lower()
+    query = term.lower()
+    score = SequenceMatcher(None, query, name).ratio()
+    if name.startswith(query):
+        score += 1.0
+    elif query in name:
+        score += 0.5
+    return score
+
+
+def search_texts_by_file_name(db, term: str, mode: str = "fuzzy", limit: int = 20):
+    """
+    Ranked search over text file names.
+
+    On PostgreSQL the search runs against text_listing_summaries.source_file_name,
+    whose pg_trgm GIN index serves both the ILIKE patterns and the fuzzy
+    word-similarity operator (<%), and results are ranked by similarity.
+    Other databases fall back to LIKE filtering and ranking in Python.
+
+    Args:
+        term: The search text, e.g. "20152 t4".
+        mode: "prefix", "substring" or "fuzzy" (trigram similarity or ordered terms).
+        limit: Maximum number of results.
+    Returns:
+        Rows with id, source_file_name, grade, processing_status and score,
+        best matches first.
+    """
+    if mode not in FILE_NAME_SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode: {mode}")
+
+    term = term.strip()
+    if not term:
+        return []
+
+    summary = TextListingSummary
+    pattern = _file_name_search_pattern(term, mode)
+    pattern_match = summary.source_file_name.ilike(pattern, escape="\\")
+    columns = (
+        summary.text_id.label("id"),
+        summary.source_file_name.label("source_file_name"),
+        summary.grade.label("grade"),
+        summary.processing_status.label("processing_status"),
+    )
+
+    if db.get_bind().dialect.name == "postgresql":
+        if mode == "fuzzy":
+            score = func.word_similarity(term, summary.source_file_name)
+            condition = or_(
+                literal(term).op("<%")(summary.source_file_name),
+                pattern_match,
+            )
+        else:
+            score = func.similarity(summary.source_file_name, term)
+            condition = pattern_match
+
+        query = (
+            select(*columns, score.label("score"))
+            .where(condition)
+            .order_by(score.desc(), summary.text_id.asc())
+            .limit(limit)
+        )
+        return db.execute(query).all()
+
+    if mode == "fuzzy":
+        # Candidates contain at least one of the terms; ranking happens below.
+        condition = or_(
+            *[
+                summary.source_file_name.ilike("%" + _escape_like(part) + "%", escape="\\")
+                for part in term.split()
+            ]
+        )
+    else:
+        condition = pattern_match
+
+    rows = db.execute(select(*columns).where(condition)).all()
+    ranked = sorted(
+        (
+            SimpleNamespace(**row._mapping, score=_file_name_match_score(row.source_file_name, term))
+            for row in rows
+        ),
+        key=lambda row: (-row.score, row.id),
+    )
+    return ranked[:limit]
 
 
 def delete_all_normalizations(db, user_id: int, text_id: int):
@@ -602,6 +971,7 @@ def delete_all_normalizations(db, user_id: int, text_id: int):
     db.query(Normalization).filter(
         Normalization.user_id == user_id, Normalization.text_id == text_id
     ).delete()
+    bump_text_versions(db, [text_id])
     db.commit()
 
 
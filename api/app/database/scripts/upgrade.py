@@ -0,0 +1,55 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.database.models import Base, BackgroundJobKind
+
+# Serializes concurrent upgrades (the API and the job worker start together)
+UPGRADE_LOCK_ID = 0x636F7263
+
+# Columns added to tables that existed before, as (table, column, DDL type)
+ADDED_COLUMNS = [
+    ('texts', 'content_version', 'INTEGER NOT NULL DEFAULT 1'),
+    ('texts', 'content_sha256', 'VARCHAR(64)'),
+    ('text_upload_batches', 'archive_sha256', 'VARCHAR(64)'),
+    ('text_upload_batches', 'skipped_files', "TEXT NOT NULL DEFAULT '[]'"),
+]
+
+# Indexes on tables that existed before, as (name, table, columns)
+ADDED_INDEXES = [
+    ('ix_tokens_token_text', 'tokens', 'token_text'),
+    ('ix_texts_content_sha256', 'texts', 'content_sha256'),
+    ('ix_text_upload_batches_archive_sha256', 'text_upload_batches', 'archive_sha256'),
+]
+
+
+def upgrade_database_schema(engine: Engine) -> None:
+    """Brings an existing database up to the current models (idempotent).
+
+    ``create_all`` only creates missing tables, so columns, indexes and enum
+    values added to existing tables are added here. Runs in one transaction,
+    under an advisory lock on PostgreSQL.
+    """
+    with engine.begin() as connection:
+        is_postgresql = connection.dialect.name == 'postgresql'
+        if is_postgresql:
+            connection.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': UPGRADE_LOCK_ID})
+            # Needed by the trigram index of text_listing_summaries
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
+        Base.metadata.create_all(bind=connection, checkfirst=True)
+
+        for table_name, column_name, column_type in ADDED_COLUMNS:
+            if is_postgresql:
+                connection.execute(text(
+                    f'ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column_name} {column_type}'
+                ))
+            elif column_name not in {column['name'] for column in inspect(connection).get_columns(table_name)}:
+                connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+
+        for index_name, table_name, columns in ADDED_INDEXES:
+            connection.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})'))
+
+        if is_postgresql:
+            # Native enum types only get the values they were created with
+            for kind in BackgroundJobKind:
+                connection.execute(text(f"ALTER TYPE backgroundjobkind ADD VALUE IF NOT EXISTS '{kind.value}'"))
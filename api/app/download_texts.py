@@ -1,92 +1,259 @@
 import tempfile
 import os
-import shutil
 import time
+import zipfile
+from dataclasses import dataclass
+from itertools import groupby
+from operator import attrgetter
+
+from sqlalchemy import select
 
 import app.database.models as models
-from app.database.queries import get_normalizations_by_text
 from app.extensions import db
 
 session = db.session
 
+TOKENS_YIELD_PER = 5000
+
 def normalizations_to_dict(normalizations):
     return {n.start_index: n for n in normalizations}
 
-def get_normalized_tokens(text_ids:list[int], user_id:int, use_tags=False) -> dict[str, dict]:
-    texts = session.query(models.Text).filter(models.Text.id.in_(text_ids)).all()
-    texts_tokens = {}
-    
+
+@dataclass(frozen=True)
+class ExportToken:
+    """A token of an exported text, with the user's normalization already applied."""
+
+    position: int
+    token_text: str
+    whitespace_after: str | None = ''
+
+
+def _joined_original_text(rows) -> str:
+    parts = []
+    for row in rows[:-1]:
+        parts.append(row.token_text)
+        parts.append(row.whitespace_after if row.whitespace_after is not None else ' ')
+    parts.append(rows[-1].token_text)
+    return ''.join(parts)
+
+
+def _normalized_token(norm, rows, use_tags: bool) -> ExportToken:
+    """Replaces the tokens in norm.start_index..norm.end_index (rows) by a single token."""
+    if use_tags:
+        token_text = f"<norm orig='{_joined_original_text(rows)}'>{norm.new_token}</norm>"
+    else:
+        token_text = norm.new_token
+    return ExportToken(rows[0].position, token_text, rows[-1].whitespace_after)
+
+
+def _apply_normalizations(token_rows, normalizations: dict, use_tags: bool) -> list[ExportToken]:
+    tokens = []
+    span = None  # (normalization, rows) while inside a multi-token normalization
+
+    for row in token_rows:
+        if span is not None:
+            span[1].append(row)
+            if row.position >= span[0].end_index:
+                tokens.append(_normalized_token(*span, use_tags))
+                span = None
+            continue
+
+        norm = normalizations.get(row.position)
+        if norm is None:
+            tokens.append(ExportToken(row.position, row.token_text, row.whitespace_after))
+        elif norm.end_index > row.position:
+            span = (norm, [row])
+        else:
+            tokens.append(_normalized_token(norm, [row], use_tags))
+
+    if span is not None:
+        # The normalization ends past the last token of the text
+        tokens.append(_normalized_token(*span, use_tags))
+
+    return tokens
+
+
+def iter_texts_with_normalizations(text_ids: list[int], user_ids: list[int]):
+    """Yields (text, tokens, normalizations) for each text, ordered by text id.
+
+    All tokens and all normalizations of *user_ids* are read with two ordered
+    queries over server-side cursors and merged text by text, so the number of
+    round-trips does not grow with the number of texts and only one text's
+    tokens are in memory at a time. Suggestions are never loaded.
+
+    Yields:
+        text: Row with id, source_file_name and grade.
+        tokens: Rows with position, token_text and whitespace_after, by position.
+        normalizations: Rows with user_id, start_index, end_index and new_token,
+            ordered by (start_index, user_id).
+    """
+    texts = session.execute(
+        select(models.Text.id, models.Text.source_file_name, models.Text.grade)
+        .where(models.Text.id.in_(text_ids))
+        .order_by(models.Text.id)
+    ).all()
+    if not texts:
+        return
+
+    found_ids = [text.id for text in texts]
+
+    token_rows = session.execute(
+        select(models.Token.text_id, models.Token.position, models.Token.token_text, models.Token.whitespace_after)
+        .where(models.Token.text_id.in_(found_ids))
+        .order_by(models.Token.text_id, models.Token.position)
+        .execution_options(yield_per=TOKENS_YIELD_PER)
+    )
+    normalization_rows = session.execute(
+        select(
+            models.Normalization.text_id,
+            models.Normalization.user_id,
+            models.Normalization.start_index,
+            models.Normalization.end_index,
+            models.Normalization.new_token,
+        )
+        .where(models.Normalization.text_id.in_(found_ids), models.Normalization.user_id.in_(user_ids))
+        .order_by(models.Normalization.text_id, models.Normalization.start_index, models.Normalization.user_id)
+        .execution_options(yield_per=TOKENS_YIELD_PER)
+    )
+
+    tokens_by_text = groupby(token_rows, key=attrgetter('text_id'))
+    normalizations_by_text = groupby(normalization_rows, key=attrgetter('text_id'))
+    next_tokens = next(tokens_by_text, None)
+    next_normalizations = next(normalizations_by_text, None)
+
     for text in texts:
-        texts_tokens[text.source_file_name] = {'grade': text.grade, 'tokens': []}
-        
-        tokens = session.query(models.Token).filter(models.Token.text_id == text.id).all()
-        tokens = sorted(tokens, key=lambda t: t.position)
-        
-        normalizations = normalizations_to_dict(get_normalizations_by_text(session, text.id, user_id))
-        
-        for token in tokens:
-            norm = normalizations.get(token.position)
-            if norm and use_tags:
-                token.token_text = f"<norm orig='{token.token_text}'>{norm.new_token}</norm>"
-            elif norm and not use_tags:
-                token.token_text = norm.new_token
-
-            texts_tokens[text.source_file_name]['tokens'].append(token)
-
-    return texts_tokens
-
-def rebuild_text(tokens:list[models.Token]) -> str:
-    # There may be a better way to do this
-    NO_SPACE_BEFORE = {':', ',', '.', ')', '}', '?', '!', ']', '\n', '\t', ';', ' '}
-    NO_SPACE_AFTER = {'{', '(', '[', '#', '\n', '\t', ' '}
-
-    result = ""
+        tokens = []
+        if next_tokens and next_tokens[0] == text.id:
+            tokens = list(next_tokens[1])
+            next_tokens = next(tokens_by_text, None)
+
+        normalizations = []
+        if next_normalizations and next_normalizations[0] == text.id:
+            normalizations = list(next_normalizations[1])
+            next_normalizations = next(normalizations_by_text, None)
+
+        yield text, tokens, normalizations
+
+
+def iter_normalized_tokens(text_ids: list[int], user_id: int, use_tags=False):
+    """Yields (text_id, source_file_name, grade, tokens) for each text, ordered by
+    text id, with the user's normalizations applied to the tokens."""
+    for text, tokens, normalizations in iter_texts_with_normalizations(text_ids, [user_id]):
+        normalized = _apply_normalizations(tokens, normalizations_to_dict(normalizations), use_tags)
+        yield text.id, text.source_file_name, text.grade, normalized
+
+
+WHITESPACE_MODES = ('stored', 'heuristic')
+
+# Spacing rules of the heuristic mode
+NO_SPACE_BEFORE = {':', ',', '.', ')', '}', '?', '!', ']', '\n', '\t', ';', ' '}
+NO_SPACE_AFTER = {'{', '(', '[', '#', '\n', '\t', ' '}
+
+
+def _heuristic_separator(previous_text: str, token_text: str) -> str:
+    if previous_text in NO_SPACE_AFTER or token_text in NO_SPACE_BEFORE:
+        return ''
+    return ' '
+
+
+def rebuild_text(tokens:list[ExportToken], whitespace_mode: str = 'stored') -> str:
+    """Joins tokens back into the text.
+
+    Args:
+        tokens: Tokens in position order.
+        whitespace_mode: 'stored' uses each token's whitespace_after as recorded by
+            the tokenizer (falling back to the heuristic where it is missing);
+            'heuristic' ignores it and guesses spacing from punctuation.
+    """
+    if whitespace_mode not in WHITESPACE_MODES:
+        raise ValueError(f"Unsupported whitespace mode: {whitespace_mode}")
+
+    use_stored = whitespace_mode == 'stored'
+    parts = []
     previous_token = None
-    
+
     for token in tokens:
-        # It's the first token
-        if not previous_token:
-            result += token.token_text
-            previous_token = token
-        # It's not the first token...
-        else:
-            # ...and there are rules for no space
-            if (previous_token.token_text in NO_SPACE_AFTER) or (token.token_text in NO_SPACE_BEFORE):
-                result += token.token_text
-                previous_token = token
-            # ...and there are NO rules for no space
+        if previous_token is not None:
+            if use_stored and previous_token.whitespace_after is not None:
+                parts.append(previous_token.whitespace_after)
             else:
-                result += ' ' + token.token_text
-                previous_token = token
-                
-    return result
+                parts.append(_heuristic_separator(previous_token.token_text, token.token_text))
+        parts.append(token.token_text)
+        previous_token = token
+
+    if use_stored and previous_token is not None and previous_token.whitespace_after:
+        parts.append(previous_token.whitespace_after)
+
+    return ''.join(parts)
+
+
+class _ZipStreamBuffer:
+    """Write-only, non-seekable file object that hands written bytes back to the caller.
+
+    zipfile writes local headers, compressed data and data descriptors to it
+    sequentially, so an archive can be produced without a file on disk.
+    """
 
-def save_result(base_dir: str, source_file_name: str, text: str, grade: int):
-    safe_filename = os.path.basename(source_file_name)
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_name(source_file_name: str, grade) -> str:
+    safe_filename = os.path.basename(source_file_name or '')
     safe_filename = safe_filename.replace('.docx', '')
-    # Adds 'n' to the end of the filename before the extension ------------\/
-    output_path = os.path.join(base_dir, f'NOTA {grade}', f'{safe_filename}n.txt')
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w', encoding='utf-8') as f: # Specify UTF-8 encoding
-        f.write(text)
+    # Adds 'n' to the end of the filename before the extension
+    return f'NOTA {grade}/{safe_filename}n.txt'
 
-def save_modified_texts(user_id: int, text_ids: list[int], use_tags: bool = False) -> str:
-    temp_dir = tempfile.mkdtemp(prefix=f'recovered_texts_user_{user_id}_')
-    
-    txt_output_dir = os.path.join(temp_dir, 'texts')
-    os.makedirs(txt_output_dir, exist_ok=True)
 
-    tokens_by_file = get_normalized_tokens(text_ids, user_id, use_tags) 
+def iter_modified_texts_zip(
+    user_id: int, text_ids: list[int], use_tags: bool = False, whitespace_mode: str = 'stored'
+):
+    """Yields a ZIP archive of the rebuilt texts chunk by chunk.
 
-    for source_file, data in tokens_by_file.items():
-        rebuilt_text = rebuild_text(data['tokens'])
-        save_result(txt_output_dir, source_file, rebuilt_text, data.get('grade', 0))
+    Each text is rebuilt, compressed and yielded as soon as it is ready, so only
+    one text is held in memory and nothing is written to disk.
+    """
+    buffer = _ZipStreamBuffer()
+    used_names = set()
 
-    zip_basename = 'recovered_texts'
-    zip_path_base = os.path.join(temp_dir, zip_basename)
-    shutil.make_archive(zip_path_base, 'zip', txt_output_dir)
-    
-    return f"{zip_path_base}.zip"
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for text_id, source_file, grade, tokens in iter_normalized_tokens(text_ids, user_id, use_tags):
+            name = archive_name(source_file, grade)
+            if name in used_names:
+                # Texts uploaded twice under the same file name
+                name = f"{name[:-len('n.txt')]}_{text_id}n.txt"
+            used_names.add(name)
+
+            archive.writestr(name, rebuild_text(tokens, whitespace_mode))
+            yield buffer.drain()
+
+    # Central directory, written when the archive is closed
+    yield buffer.drain()
+
+
+def save_modified_texts(
+    user_id: int, text_ids: list[int], use_tags: bool = False, whitespace_mode: str = 'stored'
+) -> str:
+    temp_dir = tempfile.mkdtemp(prefix=f'recovered_texts_user_{user_id}_')
+    zip_path = os.path.join(temp_dir, 'recovered_texts.zip')
+
+    with open(zip_path, 'wb') as f:
+        for chunk in iter_modified_texts_zip(user_id, text_ids, use_tags, whitespace_mode):
+            f.write(chunk)
+
+    return zip_path
 
 
 if __name__ == '__main__':
@@ -1,41 +1,132 @@
-
 import csv
-import io
+from collections import Counter
+from itertools import groupby
+from operator import attrgetter
 
-from app.database.queries import get_original_text_tokens_by_id, get_normalizations_by_text, get_text_by_id, get_username_by_id
+from app.database.queries import get_username_by_id
+from app.download_texts import iter_texts_with_normalizations
 from app.extensions import db
 
 CONTEXT_WINDOW = 5
 
 session = db.session
 
+
+class _RowBuffer:
+    """Collects what csv.writer writes so it can be yielded in chunks."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data: str) -> int:
+        self._parts.append(data)
+        return len(data)
+
+    def drain(self) -> str:
+        data = ''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _token_context(tokens, start_index: int, end_index: int) -> tuple[str, str, str]:
+    """Returns the previous tokens, the normalized span and the subsequent tokens as strings."""
+    prev_tokens = tokens[max(0, start_index - CONTEXT_WINDOW):start_index]
+    span_tokens = tokens[start_index:end_index + 1]
+    subseq_tokens = tokens[end_index + 1:end_index + 1 + CONTEXT_WINDOW]
+    return (
+        " ".join(token.token_text for token in prev_tokens),
+        " ".join(token.token_text for token in span_tokens),
+        " ".join(token.token_text for token in subseq_tokens),
+    )
+
+
 def generate_report(user_id:int, text_ids:list[int]):
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';')
+    """Yields the CSV report of a user's normalizations, one chunk per text.
+
+    Text names, tokens and normalizations are fetched in bulk for all
+    *text_ids* (see iter_texts_with_normalizations).
+    """
+    buffer = _RowBuffer()
+    writer = csv.writer(buffer, delimiter=';')
     username = get_username_by_id(session, user_id)
-    
+
     # Write CSV header
-    output.write('\ufeff')  # BOM for UTF-8
+    buffer.write('\ufeff')  # BOM for UTF-8
     writer.writerow(['Text ID', 'User', 'Previous Tokens', 'Word', 'Subsequent Tokens', 'Normalization'])
-    
-    for text_id in text_ids:
-        tokens = get_original_text_tokens_by_id(session, text_id)        
-        tokens.sort(key=lambda token: token.position)
-        normalizations = get_normalizations_by_text(session, text_id, user_id)
-        text_sourcefilename = get_text_by_id(session, text_id, user_id)['source_file_name']
 
+    for text, tokens, normalizations in iter_texts_with_normalizations(text_ids, [user_id]):
         for norm in normalizations:
-            prev_tokens = tokens[max(0, norm.start_index - CONTEXT_WINDOW):norm.start_index]
-            subseq_tokens = tokens[norm.end_index + 1:norm.end_index + 1 + CONTEXT_WINDOW]
-            length = norm.end_index - norm.start_index + 1
-
+            previous, word, subsequent = _token_context(tokens, norm.start_index, norm.end_index)
             writer.writerow([
-                text_sourcefilename,
+                text.source_file_name,
                 username,
-                " ".join(token.token_text for token in prev_tokens),
-                " ".join(token.token_text for token in tokens[norm.start_index:norm.start_index + length]),          
-                " ".join(token.token_text for token in subseq_tokens),
+                previous,
+                word,
+                subsequent,
                 norm.new_token
             ])
 
-    return output.getvalue()
\ No newline at end of file
+        chunk = buffer.drain()
+        if chunk:
+            yield chunk
+
+    # Header only, when no rows were written
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
+
+
+def _agreement_cell(norm, end_index: int) -> str:
+    if norm is None:
+        return ''
+    if norm.end_index != end_index:
+        # Shorter span than another annotator's normalization at the same position
+        return f"{norm.new_token} [{norm.start_index}-{norm.end_index}]"
+    return norm.new_token
+
+
+def generate_agreement_report(users: list[tuple[int, str]], text_ids: list[int]):
+    """Yields a CSV comparing the normalizations of several users, one chunk per text.
+
+    Normalizations of all *users* are read in one query ordered by
+    (text_id, start_index, user_id) and grouped by position in a single pass.
+    Each row is a token position normalized by at least one user, with one
+    column per user and an agreement column: how many of the selected users
+    chose the most common normalization (same span and new token).
+
+    Args:
+        users: (user_id, username) pairs, in column order.
+        text_ids: Texts to include.
+    """
+    user_ids = [user_id for user_id, _ in users]
+    buffer = _RowBuffer()
+    writer = csv.writer(buffer, delimiter=';')
+
+    buffer.write('\ufeff')  # BOM for UTF-8
+    writer.writerow(
+        ['Text ID', 'Previous Tokens', 'Word', 'Subsequent Tokens']
+        + [username for _, username in users]
+        + ['Agreement']
+    )
+
+    for text, tokens, normalizations in iter_texts_with_normalizations(text_ids, user_ids):
+        for start_index, group in groupby(normalizations, key=attrgetter('start_index')):
+            by_user = {norm.user_id: norm for norm in group}
+            end_index = max(norm.end_index for norm in by_user.values())
+            previous, word, subsequent = _token_context(tokens, start_index, end_index)
+            choices = Counter((norm.end_index, norm.new_token) for norm in by_user.values())
+
+            writer.writerow(
+                [text.source_file_name, previous, word, subsequent]
+                + [_agreement_cell(by_user.get(user_id), end_index) for user_id in user_ids]
+                + [f"{max(choices.values())}/{len(user_ids)}"]
+            )
+
+        chunk = buffer.drain()
+        if chunk:
+            yield chunk
+
+    # Header only, when no rows were written
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
@@ -1,16 +1,29 @@
+import os
 import time
 
+from flask import current_app
+
 from .background_jobs import (
     BackgroundJobReporter,
     build_worker_id,
     claim_next_background_job,
     mark_background_job_failure,
     mark_background_job_success,
+    requeue_background_job,
 )
+from .chunked_uploads import cleanup_expired_chunked_uploads
 from .database import models
+from .database.scripts.upgrade import upgrade_database_schema
+from .tasks.export_task_logic import cleanup_expired_exports, run_text_export_pipeline
 from .tasks.ocr_task_logic import run_ocr_zip_pipeline
+from .tasks.suggestion_task_logic import run_suggestion_propagation_pipeline
 from .tasks.text_task_logic import run_process_single_text_pipeline
-from .tasks.text_upload_task_logic import run_text_upload_zip_pipeline
+from .tasks.text_upload_task_logic import (
+    migrate_legacy_text_upload_jobs,
+    run_text_upload_zip_pipeline,
+    spool_legacy_zip_payload,
+)
+from .text_listing import backfill_text_listing_summaries
 from .text_upload_batches import (
     claim_next_pending_text_for_processing,
     reconcile_stale_text_upload_batches,
@@ -21,13 +34,33 @@ from .text_upload_batches import (
 
 def _run_text_upload_import_job(session, job: models.BackgroundJob) -> None:
     payload = job.payload_json or {}
+    if 'zip_payload_b64' in payload:
+        # Queued by an older release, before the worker last started
+        payload = spool_legacy_zip_payload(session, job)
     reporter = BackgroundJobReporter(session, job.id)
-    result = run_text_upload_zip_pipeline(
-        reporter,
-        batch_id=payload.get('batch_id'),
-        zip_path=payload.get('zip_path'),
-        original_filename=payload.get('original_filename'),
-    )
+    zip_path = payload.get('zip_path')
+    try:
+        result = run_text_upload_zip_pipeline(
+            reporter,
+            batch_id=payload.get('batch_id'),
+            zip_path=zip_path,
+            original_filename=payload.get('original_filename'),
+            duplicate_policy=payload.get('duplicate_policy', 'import'),
+            checkpoint=payload.get('checkpoint'),
+        )
+    except Exception as exc:
+        # Imported chunks are committed with the checkpoint, and the ZIP is
+        # kept unless the archive itself was rejected, so a retry resumes.
+        session.rollback()
+        job = session.get(models.BackgroundJob, job.id)
+        max_attempts = current_app.config.get('TEXT_UPLOAD_IMPORT_MAX_ATTEMPTS', 3)
+        if job is not None and job.attempts < max_attempts and zip_path and os.path.exists(zip_path):
+            requeue_background_job(session, job, error_message=str(exc))
+            return
+
+        if zip_path and os.path.exists(zip_path):
+            os.remove(zip_path)
+        raise
 
     mark_background_job_success(
         session,
@@ -42,7 +75,67 @@ def _run_text_upload_import_job(session, job: models.BackgroundJob) -> None:
 def _run_ocr_upload_job(session, job: models.BackgroundJob) -> None:
     payload = job.payload_json or {}
     reporter = BackgroundJobReporter(session, job.id)
-    result = run_ocr_zip_pipeline(reporter, payload.get('zip_path'))
+    zip_path = payload.get('zip_path')
+    try:
+        result = run_ocr_zip_pipeline(reporter, zip_path, checkpoint=payload.get('checkpoint'))
+    except Exception as exc:
+        # Images already OCRed are committed and listed in the checkpoint, so
+        # a retry only processes the rest of the archive. The pipeline removes
+        # the ZIP when a retry could not succeed, which fails the job at once.
+        session.rollback()
+        job = session.get(models.BackgroundJob, job.id)
+        max_attempts = current_app.config.get('OCR_UPLOAD_MAX_ATTEMPTS', 3)
+        if job is not None and job.attempts < max_attempts and zip_path and os.path.exists(zip_path):
+            requeue_background_job(session, job, error_message=str(exc))
+            return
+
+        if zip_path and os.path.exists(zip_path):
+            os.remove(zip_path)
+        raise
+
+    result_json = result.get('result')
+    if result.get('failed_files'):
+        result_json = {**result_json, 'failed_files': result['failed_files']}
+
+    mark_background_job_success(
+        session,
+        job,
+        result_json=result_json,
+        status_message='Finished',
+        current=result.get('total'),
+        total=result.get('total'),
+    )
+
+
+def _run_text_export_job(session, job: models.BackgroundJob) -> None:
+    payload = job.payload_json or {}
+    reporter = BackgroundJobReporter(session, job.id)
+    result = run_text_export_pipeline(
+        reporter,
+        job_id=job.id,
+        user_id=payload.get('user_id', job.created_by_user_id),
+        text_ids=payload.get('text_ids') or [],
+        use_tags=payload.get('use_tags', False),
+        whitespace_mode=payload.get('whitespace_mode', 'stored'),
+    )
+
+    mark_background_job_success(
+        session,
+        job,
+        result_json=result.get('result'),
+        status_message='Finished',
+        current=result.get('total'),
+        total=result.get('total'),
+    )
+
+
+def _run_suggestion_propagation_job(session, job: models.BackgroundJob) -> None:
+    payload = job.payload_json or {}
+    result = run_suggestion_propagation_pipeline(
+        session,
+        token_text=payload.get('token_text'),
+        suggestion=payload.get('suggestion'),
+    )
 
     mark_background_job_success(
         session,
@@ -68,6 +161,10 @@ def process_next_background_job(session, *, worker_id: str, stale_after_seconds:
             _run_text_upload_import_job(session, job)
         elif job.kind == models.BackgroundJobKind.OCR_UPLOAD:
             _run_ocr_upload_job(session, job)
+        elif job.kind == models.BackgroundJobKind.TEXT_EXPORT:
+            _run_text_export_job(session, job)
+        elif job.kind == models.BackgroundJobKind.SUGGESTION_PROPAGATION:
+            _run_suggestion_propagation_job(session, job)
         else:
             raise RuntimeError(f'Unsupported background job kind: {job.kind.name}')
 
@@ -109,15 +206,22 @@ def run_background_job_worker(app) -> None:
     stale_after_seconds = app.config.get('TEXT_UPLOAD_STALE_AFTER_SECONDS', 600)
     max_attempts = app.config.get('TEXT_UPLOAD_MAX_PROCESSING_ATTEMPTS', 3)
     idle_sleep_seconds = app.config.get('JOB_WORKER_IDLE_SLEEP_SECONDS', 1)
+    export_retention_seconds = app.config.get('TEXT_EXPORT_RETENTION_SECONDS', 24 * 60 * 60)
+    chunked_upload_retention_seconds = app.config.get('CHUNKED_UPLOAD_RETENTION_SECONDS', 24 * 60 * 60)
 
 
     with app.app_context():
+        upgrade_database_schema(db.engine)
         reconcile_stale_text_upload_batches(
             db.session,
             stale_after_seconds=stale_after_seconds,
             max_attempts=max_attempts,
             force_processing_recovery=True,
         )
+        backfill_text_listing_summaries(db.session)
+        cleanup_expired_exports(export_retention_seconds)
+        cleanup_expired_chunked_uploads(db.session, chunked_upload_retention_seconds)
+        migrate_legacy_text_upload_jobs(db.session)
         db.session.remove()
 
     last_reconcile_at = time.monotonic()
@@ -145,6 +249,8 @@ def run_background_job_worker(app) -> None:
                     stale_after_seconds=stale_after_seconds,
                     max_attempts=max_attempts,
                 )
+                cleanup_expired_exports(export_retention_seconds)
+                cleanup_expired_chunked_uploads(db.session, chunked_upload_retention_seconds)
                 last_reconcile_at = now
 
             db.session.remove()
@@ -1,16 +1,23 @@
 import os
-import shutil
-from flask import Blueprint, jsonify, make_response, send_from_directory, after_this_request
+from itertools import chain
+
+from flask import Blueprint, Response, jsonify, send_file, stream_with_context
 from flask_pydantic import validate
 
-from app.utils.decorators import login_required
+from app.utils.decorators import admin_required, login_required
+import app.database.queries as queries
 import app.schemas.download as download_schemas
-from app.download_texts import save_modified_texts
-from app.generate_report import generate_report
-from app.extensions import limiter
+from app.background_jobs import create_background_job, get_background_job
+from app.database import models
+from app.download_texts import iter_modified_texts_zip
+from app.generate_report import generate_agreement_report, generate_report
+from app.extensions import db, limiter
+from app.tasks.export_task_logic import export_file_path
 from app.utils.api_errors import (
     BUSINESS_RULE_VIOLATION,
     INTERNAL_SERVER_ERROR,
+    RESOURCE_NOT_FOUND,
+    VALIDATION_ERROR,
     error_response,
 )
 
@@ -28,16 +35,18 @@ def request_report(current_user, body: download_schemas.ReportRequest):
         current_user: The currently logged-in user.
         body (ReportRequest): List of text IDs for the report.
 
-    Returns: A response object containing the generated csv report.
+    Returns: A response streaming the generated csv report.
         
     Pre-Conditions:
         User must be logged in.
         
     """
     try:
-        report = generate_report(current_user.id, body.text_ids)
-        
-        response = make_response(report)
+        chunks = iter(generate_report(current_user.id, body.text_ids))
+        # Produce the header before responding so query failures still return a 500
+        first_chunk = next(chunks, '')
+
+        response = Response(stream_with_context(chain([first_chunk], chunks)))
         response.headers["Content-Disposition"] = "attachment; filename=report.csv"
         response.headers["Content-type"] = "text/csv"
         return response
@@ -45,6 +54,45 @@ def request_report(current_user, body: download_schemas.ReportRequest):
         pass
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
 
+@download_bp.route('/api/report/agreement', methods=['POST'])
+@limiter.limit("10 per minute")
+@admin_required()
+@validate()
+def request_agreement_report(current_user, body: download_schemas.AgreementReportRequest):
+    """Generates a CSV comparing the normalizations of several users on the given texts.
+
+    Args:
+        current_user: The currently logged-in admin.
+        body (AgreementReportRequest): Text IDs and the usernames to compare.
+
+    Returns: A response streaming the generated csv report.
+
+    Pre-Conditions:
+        User must be an admin.
+
+    """
+    try:
+        usernames = list(dict.fromkeys(body.usernames))
+        user_ids = queries.get_user_ids_by_usernames(db.session, usernames)
+        if len(user_ids) != len(usernames):
+            return error_response(
+                error="Validation failed",
+                code=VALIDATION_ERROR,
+                status_code=400,
+                details=[{"field": "usernames", "message": "All usernames must belong to existing users."}],
+            )
+
+        users = list(zip(user_ids, usernames))
+        chunks = generate_agreement_report(users, body.text_ids)
+        first_chunk = next(chunks, '')
+
+        response = Response(stream_with_context(chain([first_chunk], chunks)))
+        response.headers["Content-Disposition"] = "attachment; filename=agreement_report.csv"
+        response.headers["Content-type"] = "text/csv"
+        return response
+    except Exception:
+        return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
+
 @download_bp.route('/api/download/', methods=['POST'])
 @limiter.limit("5 per minute")
 @login_required()
@@ -57,8 +105,9 @@ def download_normalized_texts(current_user, body: download_schemas.DownloadReque
         body (DownloadRequest): Contains text IDs and use_tags flag.
             - text_ids: List of text IDs to download.
             - use_tags: Boolean indicating whether to use XML syntax in normalized tokens.
+            - whitespace_mode: 'stored' (default) or 'heuristic' spacing between tokens.
 
-    Returns: A response object containing the generated zip file.
+    Returns: A response streaming the generated zip file.
         
     Pre-Conditions:
         User must be logged in.
@@ -76,24 +125,82 @@ def download_normalized_texts(current_user, body: download_schemas.DownloadReque
                 status_code=400,
             )
 
-        zip_abs_path = save_modified_texts(current_user.id, text_ids, use_tags)
+        chunks = iter_modified_texts_zip(current_user.id, text_ids, use_tags, body.whitespace_mode)
+        # Produce the first entry before responding so query failures still return a 500
+        first_chunk = next(chunks)
 
-        if not os.path.exists(zip_abs_path):
-            return error_response(error="Failed to generate zip", code=INTERNAL_SERVER_ERROR, status_code=500)
+        return Response(
+            stream_with_context(chain([first_chunk], chunks)),
+            mimetype='application/zip',
+            headers={"Content-Disposition": "attachment; filename=recovered_texts.zip"},
+        )
 
-        directory = os.path.dirname(zip_abs_path)
-        filename = os.path.basename(zip_abs_path)
+    except Exception:
+        return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
+
+
+@download_bp.route('/api/download/jobs', methods=['POST'])
+@limiter.limit("10 per minute")
+@login_required()
+@validate()
+def create_download_job(current_user, body: download_schemas.DownloadRequest):
+    """Queues an export of normalized texts to be built by the background worker.
+
+    Args:
+        current_user: The currently logged-in user.
+        body (DownloadRequest): Same options as /api/download/.
+
+    Returns: ExportJobResponse with the job id. Progress is reported by
+        /api/status/<job_id> and the archive is fetched from /api/download/jobs/<job_id>/file.
 
-        @after_this_request
-        def cleanup(response):
-            try:
-                if os.path.exists(directory):
-                    shutil.rmtree(directory)
-            except Exception as e:
-                pass
-            return response
+    Pre-Conditions:
+        User must be logged in.
 
-        return send_from_directory(directory=directory, path=filename, as_attachment=True)
+    """
+    if not body.text_ids:
+        return error_response(
+            error="'text_ids' must be a non-empty list",
+            code=BUSINESS_RULE_VIOLATION,
+            status_code=400,
+        )
 
+    try:
+        job = create_background_job(
+            db.session,
+            kind=models.BackgroundJobKind.TEXT_EXPORT,
+            created_by_user_id=current_user.id,
+            payload_json={
+                'user_id': current_user.id,
+                'text_ids': body.text_ids,
+                'use_tags': body.use_tags,
+                'whitespace_mode': body.whitespace_mode,
+            },
+        )
     except Exception:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
+
+    response = download_schemas.ExportJobResponse(job_id=job.id)
+    return jsonify(response.model_dump()), 202
+
+@download_bp.route('/api/download/jobs/<job_id>/file', methods=['GET'])
+@limiter.limit("30 per minute")
+@login_required()
+def get_download_job_file(current_user, job_id):
+    """Sends the archive produced by a finished export job."""
+    job = get_background_job(db.session, job_id)
+
+    if (
+        job is None
+        or job.kind != models.BackgroundJobKind.TEXT_EXPORT
+        or (not current_user.is_admin and job.created_by_user_id != current_user.id)
+    ):
+        return error_response(error="Job not found", code=RESOURCE_NOT_FOUND, status_code=404)
+
+    if job.state != models.BackgroundJobState.SUCCESS:
+        return error_response(error="Export is not ready", code=BUSINESS_RULE_VIOLATION, status_code=409)
+
+    path = export_file_path(job.id)
+    if not os.path.exists(path):
+        return error_response(error="Export file has expired", code=RESOURCE_NOT_FOUND, status_code=404)
+
+    return send_file(path, mimetype='application/zip', as_attachment=True, download_name='recovered_texts.zip')
@@ -1,16 +1,16 @@
 import os
-import uuid
 
 from flask import Blueprint, jsonify, request, send_from_directory
+from flask_pydantic import validate
 from sqlalchemy.orm.exc import NoResultFound
-from werkzeug.utils import secure_filename
 
 from app.background_jobs import create_background_job
 from app.database import models
 from app.database.models import RawText
 from app.extensions import db, limiter
 from app.schemas import ocr as ocr_schemas
-from app.tasks.constants import IMAGES_FOLDER, TEMP_UPLOADS_FOLDER
+from app.services.image_derivatives import get_image_derivative
+from app.storage import storage_folder
 from app.utils.api_errors import (
     BUSINESS_RULE_VIOLATION,
     INTERNAL_SERVER_ERROR,
@@ -19,43 +19,45 @@ from app.utils.api_errors import (
     error_response,
 )
 from app.utils.decorators import admin_required
+from app.utils.uploads import UploadRejected, receive_file_upload
 
 
 ocr_bp = Blueprint('ocr', __name__)
 
-UPLOAD_FOLDER = TEMP_UPLOADS_FOLDER
+# Stored image names are unique and never rewritten
+IMAGE_CACHE_MAX_AGE = 7 * 24 * 60 * 60
 
 
 @ocr_bp.route('/api/ocr/upload', methods=['POST'])
 @limiter.limit("5 per minute; 20 per hour")
 @admin_required()
 def upload_ocr_zip(current_user):
-    """Upload a ZIP file containing images for OCR processing."""
-    max_zip_size = 500 * 1024 * 1024
-
-    if 'file' not in request.files:
-        return error_response(error='File not found.', code=INVALID_REQUEST, status_code=400)
-
-    file = request.files['file']
-
-    if file.filename == '' or not file.filename.endswith('.zip'):
-        return error_response(error='Invalid file type. Must be .zip', code=INVALID_REQUEST, status_code=400)
+    """Upload a ZIP file containing images for OCR processing.
 
-    file.seek(0, os.SEEK_END)
-    file_size = file.tell()
-    file.seek(0)
+    The archive is streamed to the spool directory as it is received.
+    """
+    max_zip_size = 500 * 1024 * 1024
 
-    if file_size > max_zip_size:
+    try:
+        upload = receive_file_upload(
+            request.environ,
+            folder=storage_folder('TEMP_UPLOADS_FOLDER'),
+            max_size=max_zip_size,
+            prefix='ocr_',
+        )
+    except UploadRejected as exc:
+        if exc.reason == 'missing':
+            return error_response(error='File not found.', code=INVALID_REQUEST, status_code=400)
+        if exc.reason == 'invalid_type':
+            return error_response(error='Invalid file type. Must be .zip', code=INVALID_REQUEST, status_code=400)
         return error_response(
             error=f'File too large. Maximum size is {max_zip_size // (1024 * 1024)}MB',
             code=BUSINESS_RULE_VIOLATION,
             status_code=400,
         )
 
-    filename = secure_filename(file.filename)
-    unique_name = f"ocr_{uuid.uuid4()}_{filename}"
-    save_path = os.path.join(UPLOAD_FOLDER, unique_name)
-    file.save(save_path)
+    unique_name = upload.filename
+    save_path = upload.path
 
     try:
         job = create_background_job(
@@ -79,8 +81,14 @@ def upload_ocr_zip(current_user):
 
 @ocr_bp.route('/api/ocr/raw-texts/<int:text_id>/image', methods=['GET'])
 @admin_required()
-def get_raw_text_image(current_user, text_id):
-    """Retrieve the image file associated with a raw text."""
+@validate()
+def get_raw_text_image(current_user, text_id, query: ocr_schemas.RawTextImageQuery):
+    """Retrieve the image file associated with a raw text.
+
+    ``?size=thumbnail`` or ``?size=preview`` returns a downscaled copy, created
+    on first request and then served from disk. Responses support conditional
+    and range requests and may be cached privately by the client.
+    """
     _ = current_user
     try:
         raw_text = db.session.query(RawText).filter(RawText.id == text_id).one()
@@ -92,9 +100,20 @@ def get_raw_text_image(current_user, text_id):
                 status_code=404,
             )
 
-        return send_from_directory(IMAGES_FOLDER, raw_text.image_path)
+        if query.size == 'original':
+            response = send_from_directory(storage_folder('IMAGES_FOLDER'), raw_text.image_path, max_age=IMAGE_CACHE_MAX_AGE)
+        else:
+            name = get_image_derivative(raw_text.image_path, query.size)
+            response = send_from_directory(storage_folder('IMAGE_DERIVATIVES_FOLDER'), name, max_age=IMAGE_CACHE_MAX_AGE)
+
+        # Images are only shown to admins
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
 
     except NoResultFound:
         return error_response(error='Raw text not found.', code=RESOURCE_NOT_FOUND, status_code=404)
+    except FileNotFoundError:
+        return error_response(error='Image file not found.', code=RESOURCE_NOT_FOUND, status_code=404)
     except Exception as exc:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
@@ -1,14 +1,19 @@
+import json
+import logging
 import os
+from itertools import chain, islice
 from urllib.parse import unquote
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_pydantic import validate
+from sqlalchemy.exc import IntegrityError
 
 from app.utils.decorators import login_required
 import app.database.queries as queries
 from app.extensions import db, limiter
 from app.database.models import Text, Token, RawText
 from app.text_pipeline import process_text
+from app.services.image_derivatives import remove_image_derivatives
 
 from app.schemas import text as text_schemas
 from app.schemas import generic as generic_schemas
@@ -20,9 +25,12 @@ from app.utils.api_errors import (
     VALIDATION_ERROR,
     error_response,
 )
+from app.utils.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
 
 session = db.session
 
+logger = logging.getLogger(__name__)
+
 text_bp = Blueprint('text', __name__)
 
 
@@ -50,13 +58,185 @@ def _parse_normalized_filter(normalized_param: str):
         }
     ]
 
+# JSON types a cursor's sort value may have, per sort key (see _text_listing_sort_expression)
+CURSOR_SORT_VALUE_TYPES = {
+    "id": (int,),
+    "grade": (int, type(None)),
+    "source_file_name": (str,),
+}
+
+
+def _is_valid_cursor_position(sort_by: str, sort_value, text_id) -> bool:
+    """Checks the (sort value, id) position of a decoded cursor before it reaches SQL."""
+    def is_int(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    if not is_int(text_id):
+        return False
+    if isinstance(sort_value, bool):
+        return False
+    return isinstance(sort_value, CURSOR_SORT_VALUE_TYPES[sort_by])
+
+
+def _parse_text_listing_options(query: text_schemas.TextsPageQuery):
+    """Parses sorting, keyset pagination and projection options of a text listing.
+
+    Returns:
+        tuple[dict | None, int | None, list[dict] | None]:
+            - Keyword arguments for queries.get_filtered_texts (without limit).
+            - Requested page size, or None for an unpaginated listing.
+            - Validation error details (or None).
+    """
+    options = {
+        "sort_by": query.sort.lstrip('-'),
+        "descending": query.sort.startswith('-'),
+    }
+
+    if query.fields:
+        fields_by_name = {}
+        for name, field_info in text_schemas.TextMetadata.model_fields.items():
+            fields_by_name[name] = name
+            if field_info.alias:
+                fields_by_name[field_info.alias] = name
+
+        fields = ["id"]
+        for requested in query.fields.split(','):
+            requested = requested.strip()
+            if not requested:
+                continue
+            if requested not in fields_by_name:
+                return None, None, [{"field": "fields", "message": f"Unknown field '{requested}'"}]
+            if fields_by_name[requested] not in fields:
+                fields.append(fields_by_name[requested])
+        options["fields"] = fields
+
+    page_size = None
+    if query.limit is not None or query.cursor:
+        page_size = query.limit or DEFAULT_PAGE_SIZE
+
+    if query.cursor:
+        try:
+            cursor_values = decode_cursor(query.cursor)
+        except ValueError:
+            return None, None, [{"field": "cursor", "message": "Invalid cursor"}]
+
+        if len(cursor_values) != 3 or cursor_values[0] != query.sort:
+            return None, None, [{"field": "cursor", "message": "Cursor does not match the requested sort"}]
+        if not _is_valid_cursor_position(options["sort_by"], cursor_values[1], cursor_values[2]):
+            return None, None, [{"field": "cursor", "message": "Invalid cursor"}]
+        options["after"] = (cursor_values[1], cursor_values[2])
+
+    return options, page_size, None
+
+
+def _serialize_text_listing_row(row, fields) -> dict:
+    """Converts a text listing row into a TextMetadata payload restricted to *fields*."""
+    item = {}
+    for field in fields:
+        value = getattr(row, field)
+        if field == "normalized_by_user":
+            value = value or False
+        elif field == "users_assigned":
+            value = value or []
+        elif field == "processing_status":
+            value = value.name if hasattr(value, 'name') else str(value)
+        item[field] = value
+    return item
+
+
+def _build_texts_listing_response(query: text_schemas.TextsPageQuery, rows, options: dict, page_size: int | None):
+    """Builds the TextsDataResponse payload for a (possibly paginated) listing.
+
+    Paginated listings fetch one extra row to know whether a next page exists.
+    """
+    fields = options.get("fields") or queries.TEXT_LISTING_FIELDS
+    response_data = {}
+
+    if page_size is not None:
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last_row = rows[-1]
+            next_cursor = encode_cursor([query.sort, last_row.sort_value, last_row.id])
+        response_data["nextCursor"] = next_cursor
+
+    response_data["textsData"] = [_serialize_text_listing_row(row, fields) for row in rows]
+
+    response = text_schemas.TextsDataResponse(**response_data)
+    return response.model_dump(by_alias=True, exclude_unset=True)
+
+def _text_etag(resource: str, text_id: int, user_id: int) -> str | None:
+    """ETag for a per-user view of a text, derived from its content version."""
+    version = queries.get_text_content_version(session, text_id)
+    if version is None:
+        return None
+    return f"{resource}-{text_id}-v{version}-u{user_id}"
+
+
+def _with_revalidation_headers(response, etag: str | None):
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified_response(etag: str | None):
+    """Returns a 304 response when the request's If-None-Match matches *etag*, else None."""
+    if etag and request.if_none_match.contains_weak(etag):
+        return _with_revalidation_headers(Response(status=304), etag)
+    return None
+
+
+TOKEN_STREAM_CHUNK_SIZE = 500
+TOKEN_DEFAULTS = {"candidates": [], "whitespaceAfter": "", "whitelisted": False}
+
+
+def _text_detail_json_stream(text_data: dict):
+    """Returns an iterator serializing a text detail as JSON incrementally.
+
+    The text metadata is validated with TextDetailResponse; tokens are already
+    in their response shape and are written in chunks as they are read, so the
+    full token list is never materialized as models or as one JSON string.
+    The metadata and the first chunk of tokens are read before returning, so
+    early failures still produce an error response instead of a 200.
+    """
+    tokens = iter(text_data["tokens"])
+    header = text_schemas.TextDetailResponse(**{**text_data, "tokens": []}).model_dump(by_alias=True)
+    header.pop("tokens")
+    first_tokens = list(islice(tokens, TOKEN_STREAM_CHUNK_SIZE))
+
+    return _iter_text_detail_json(text_data["id"], header, chain(first_tokens, tokens))
+
+
+def _iter_text_detail_json(text_id: int, header: dict, tokens):
+    yield json.dumps(header, ensure_ascii=False)[:-1] + ', "tokens": ['
+
+    try:
+        chunk = []
+        for index, token in enumerate(tokens):
+            chunk.append(("," if index else "") + json.dumps({**TOKEN_DEFAULTS, **token}, ensure_ascii=False))
+            if len(chunk) >= TOKEN_STREAM_CHUNK_SIZE:
+                yield "".join(chunk)
+                chunk = []
+    except Exception:
+        # The status line is already sent: log, clean up the session, and
+        # abort the response so the client sees an incomplete body
+        logger.exception("Streaming the detail of text %s failed", text_id)
+        session.rollback()
+        raise
+
+    yield "".join(chunk) + "]}"
+
+
 @text_bp.route('/api/texts/', methods=['GET'])
 @login_required()
-def get_texts_data(current_user):
+@validate()
+def get_texts_data(current_user, query: text_schemas.TextsPageQuery):
     """Retrieves the list of texts metadata for the current user.
 
     Args:
         current_user (User): The currently logged-in user.
+        query (TextsPageQuery): Optional sorting, keyset pagination and field projection.
 
     Returns:
         TextsDataResponse: The response containing the list of texts metadata.
@@ -66,22 +246,24 @@ def get_texts_data(current_user):
         
     """
     try:
-        texts_data_from_db = queries.get_texts_data(session, current_user.id)
-        
-        texts_list = [
-            {
-                "id": row.id,
-                "grade": row.grade,
-                "normalized_by_user": row.normalized_by_user or False,
-                "source_file_name": row.source_file_name,
-                "users_assigned": row.users_assigned or [],
-                "processing_status": row.processing_status.name if hasattr(row.processing_status, 'name') else str(row.processing_status),
-            }
-            for row in texts_data_from_db
-        ]
+        options, page_size, options_error = _parse_text_listing_options(query)
+        if options_error:
+            return error_response(
+                error="Validation failed",
+                code=VALIDATION_ERROR,
+                status_code=400,
+                details=options_error,
+            )
 
-        response = text_schemas.TextsDataResponse(textsData=texts_list)
-        return jsonify(response.model_dump(by_alias=True)), 200
+        texts_data_from_db = queries.get_texts_data(
+            session,
+            current_user.id,
+            limit=page_size + 1 if page_size is not None else None,
+            **options,
+        )
+
+        response_data = _build_texts_listing_response(query, texts_data_from_db, options, page_size)
+        return jsonify(response_data), 200
     except Exception:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
 
@@ -140,30 +322,54 @@ def get_filtered_texts_data(current_user, query: text_schemas.FilteredTextsQuery
                 status_code=400,
                 details=normalized_error,
             )
+
+        options, page_size, options_error = _parse_text_listing_options(query)
+        if options_error:
+            return error_response(
+                error="Validation failed",
+                code=VALIDATION_ERROR,
+                status_code=400,
+                details=options_error,
+            )
         
-        # Use existing get_filtered_texts query
         texts_data_from_db = queries.get_filtered_texts(
             session,
             grades=grades,
             assigned_users=assigned_users,
             user_id=current_user.id,
             normalized=normalized_filter,
-            file_name=query.file_name
+            file_name=query.file_name,
+            limit=page_size + 1 if page_size is not None else None,
+            **options,
         )
-        
-        texts_list = [
-            {
-                "id": row.id,
-                "grade": row.grade,
-                "normalized_by_user": row.normalized_by_user or False,
-                "source_file_name": row.source_file_name,
-                "users_assigned": row.users_assigned or [],
-                "processing_status": row.processing_status.name if hasattr(row.processing_status, 'name') else str(row.processing_status),
-            }
-            for row in texts_data_from_db
-        ]
 
-        response = text_schemas.TextsDataResponse(textsData=texts_list)
+        response_data = _build_texts_listing_response(query, texts_data_from_db, options, page_size)
+        return jsonify(response_data), 200
+    except Exception:
+        return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
+
+@text_bp.route('/api/texts/search', methods=['GET'])
+@login_required()
+@validate()
+def search_texts(current_user, query: text_schemas.TextSearchQuery):
+    """Ranked search of texts by source file name.
+
+    Returns:
+        TextSearchResponse: Matching texts, best matches first.
+    """
+    try:
+        rows = queries.search_texts_by_file_name(session, query.q, mode=query.mode, limit=query.limit)
+        results = [
+            text_schemas.TextSearchResult(
+                id=row.id,
+                source_file_name=row.source_file_name,
+                grade=row.grade,
+                processing_status=row.processing_status.name if hasattr(row.processing_status, 'name') else str(row.processing_status),
+                score=round(float(row.score or 0), 4),
+            )
+            for row in rows
+        ]
+        response = text_schemas.TextSearchResponse(results=results)
         return jsonify(response.model_dump(by_alias=True)), 200
     except Exception:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
@@ -186,12 +392,21 @@ def get_text_detail(current_user, text_id: int):
         
     """
     try:
-        text_data_dict = queries.get_text_by_id(session, text_id, current_user.id)
+        etag = _text_etag('text', text_id, current_user.id)
+        not_modified = _not_modified_response(etag)
+        if not_modified:
+            return not_modified
+
+        text_data_dict = queries.get_text_by_id(session, text_id, current_user.id, stream_tokens=True)
         if not text_data_dict:
             return error_response(error="Text not found", code=RESOURCE_NOT_FOUND, status_code=404)
-    
-        response_schema = text_schemas.TextDetailResponse(**text_data_dict)
-        return jsonify(response_schema.model_dump(by_alias=True)), 200
+
+        response = Response(
+            stream_with_context(_text_detail_json_stream(text_data_dict)),
+            status=200,
+            mimetype='application/json',
+        )
+        return _with_revalidation_headers(response, etag)
     except Exception:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
 
@@ -352,6 +567,7 @@ def finalize_raw_text(current_user, text_id: int, body: text_schemas.FinalizeRaw
             image_full_path = os.path.join(images_folder, image_path)
             if os.path.exists(image_full_path):
                 os.remove(image_full_path)
+            remove_image_derivatives(image_path)
         
         response = text_schemas.FinalizeRawTextResponse(message="Text finalized successfully", text_id=new_text_id)
         return jsonify(response.model_dump()), 200
@@ -377,6 +593,11 @@ def get_normalizations(current_user, text_id: int):
         
     """
     try:
+        etag = _text_etag('normalizations', text_id, current_user.id)
+        not_modified = _not_modified_response(etag)
+        if not_modified:
+            return not_modified
+
         normalizations_from_db = queries.get_normalizations_by_text(session, text_id, current_user.id)
 
         corrections = {
@@ -388,7 +609,7 @@ def get_normalizations(current_user, text_id: int):
         }
         validated = normalization_schemas.NormalizationResponse.validate_python(corrections)
         response_data = {key: value.model_dump() for key, value in validated.items()}
-        return jsonify(response_data), 200
+        return _with_revalidation_headers(jsonify(response_data), etag), 200
     except Exception:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
 
@@ -425,6 +646,41 @@ def save_normalization(current_user, text_id: int, body: normalization_schemas.N
     except Exception:
         return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
 
+@text_bp.route('/api/texts/<int:text_id>/normalizations/batch', methods=['POST'])
+@login_required()
+@validate()
+def save_normalizations_batch(current_user, text_id: int, body: normalization_schemas.NormalizationBatchRequest):
+    """Creates, updates and deletes several normalizations of a text in one request.
+
+    Args:
+        current_user (User): The currently logged-in user.
+        text_id (int): The ID of the text being normalized.
+        body (NormalizationBatchRequest): The normalizations to save and the indexes to delete.
+
+    Returns:
+        NormalizationBatchResponse: How many normalizations were saved and deleted.
+
+    Pre-Conditions:
+        User must be logged in.
+
+    """
+    try:
+        saved, deleted = queries.save_normalizations_batch(
+            session,
+            text_id,
+            current_user.id,
+            [(item.first_index, item.last_index, item.new_token) for item in body.normalizations],
+            body.deletions,
+        )
+        response = normalization_schemas.NormalizationBatchResponse(saved=saved, deleted=deleted)
+        return jsonify(response.model_dump()), 200
+    except IntegrityError:
+        session.rollback()
+        return error_response(error="Text not found", code=RESOURCE_NOT_FOUND, status_code=404)
+    except Exception:
+        session.rollback()
+        return error_response(error="Internal server error", code=INTERNAL_SERVER_ERROR, status_code=500)
+
 @text_bp.route('/api/texts/<int:text_id>/normalizations', methods=['DELETE'])
 @login_required()
 @validate()
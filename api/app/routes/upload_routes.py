@@ -2,62 +2,77 @@ import os
 import uuid
 
 from flask import Blueprint, jsonify, request
+from flask_pydantic import validate
 from werkzeug.utils import secure_filename
 
+from app import chunked_uploads
+
 from app.background_jobs import create_background_job, get_background_job, serialize_background_job_status
 from app.database import models
 from app.extensions import db, limiter
 from app.schemas import upload as upload_schemas
-from app.tasks.constants import TEMP_UPLOADS_FOLDER, TEXT_UPLOAD_MAX_ARCHIVE_SIZE
+from app.storage import storage_folder
+from app.tasks.constants import TEXT_UPLOAD_MAX_ARCHIVE_SIZE
+from app.tasks.text_upload_task_logic import DUPLICATE_POLICIES
 from app.text_upload_batches import (
     list_resumable_text_upload_batches,
     serialize_text_upload_batch,
     sync_text_upload_batch_state,
+    utcnow,
 )
 from app.utils.api_errors import (
+    BUSINESS_RULE_VIOLATION,
     INTERNAL_SERVER_ERROR,
     INVALID_REQUEST,
     RESOURCE_NOT_FOUND,
+    VALIDATION_ERROR,
     error_response,
 )
 from app.utils.decorators import admin_required, login_required
+from app.utils.uploads import UploadRejected, receive_file_upload
 
 
 upload_bp = Blueprint('upload', __name__)
 
 
-@upload_bp.route('/api/upload', methods=['POST'])
-@limiter.limit("10 per minute; 50 per hour")
-@admin_required()
-def upload_file(current_user):
-    """Upload a ZIP file and create a durable background job."""
-    if 'file' not in request.files:
-        return error_response(error='File not found.', code=INVALID_REQUEST, status_code=400)
-
-    file = request.files['file']
-
-    if file.filename == '' or not file.filename.endswith('.zip'):
-        return error_response(error='Invalid file type.', code=INVALID_REQUEST, status_code=400)
-
-    file.seek(0, os.SEEK_END)
-    archive_size = file.tell()
-    file.seek(0)
+def _queue_text_upload(
+    current_user,
+    unique_name: str,
+    save_path: str,
+    archive_sha256: str,
+    duplicate_policy: str,
+    chunked_upload: models.ChunkedUpload | None = None,
+):
+    """Creates the upload batch and import job for an archive stored at *save_path*.
 
-    if archive_size > TEXT_UPLOAD_MAX_ARCHIVE_SIZE:
-        return error_response(
-            error='Uploaded ZIP exceeds the maximum supported size.',
-            code=INVALID_REQUEST,
-            status_code=400,
+    The archive is removed if it is rejected or the job cannot be created.
+    When the archive was assembled from *chunked_upload*, the job is recorded
+    on it in the same transaction.
+    """
+    if duplicate_policy == 'skip':
+        previous_batch = (
+            db.session.query(models.TextUploadBatch)
+            .filter(
+                models.TextUploadBatch.archive_sha256 == archive_sha256,
+                models.TextUploadBatch.status != models.TextUploadBatchStatus.FAILED,
+            )
+            .order_by(models.TextUploadBatch.id)
+            .first()
         )
-
-    filename = secure_filename(file.filename)
-    unique_name = f"{uuid.uuid4()}_{filename}"
-    save_path = os.path.join(TEMP_UPLOADS_FOLDER, unique_name)
-    file.save(save_path)
+        if previous_batch is not None:
+            os.remove(save_path)
+            if chunked_upload is not None:
+                chunked_uploads.discard_chunked_upload(db.session, chunked_upload)
+            return error_response(
+                error=f'This archive was already uploaded (batch {previous_batch.id}).',
+                code=BUSINESS_RULE_VIOLATION,
+                status_code=409,
+            )
 
     batch = models.TextUploadBatch(
         created_by_user_id=current_user.id,
         source_file_name=unique_name,
+        archive_sha256=archive_sha256,
         status=models.TextUploadBatchStatus.IMPORTING,
     )
     db.session.add(batch)
@@ -72,21 +87,228 @@ def upload_file(current_user):
                 'batch_id': batch.id,
                 'zip_path': save_path,
                 'original_filename': unique_name,
+                'archive_sha256': archive_sha256,
+                'duplicate_policy': duplicate_policy,
             },
             status_message='Waiting...',
+            commit=chunked_upload is None,
         )
+        if chunked_upload is not None:
+            chunked_uploads.mark_chunked_upload_completed(
+                db.session, chunked_upload, job_id=job.id, batch_id=batch.id
+            )
     except Exception as exc:
+        db.session.rollback()
         batch.status = models.TextUploadBatchStatus.FAILED
         batch.last_error = 'Failed to create text upload job.'
         db.session.commit()
         if os.path.exists(save_path):
             os.remove(save_path)
+        if chunked_upload is not None:
+            chunked_uploads.release_completion_claim(db.session, chunked_upload)
         return error_response(error='Internal server error', code=INTERNAL_SERVER_ERROR, status_code=500)
 
     response = upload_schemas.UploadResponse(job_id=job.id, batch_id=batch.id)
     return jsonify(response.model_dump()), 202
 
 
+@upload_bp.route('/api/upload', methods=['POST'])
+@limiter.limit("10 per minute; 50 per hour")
+@admin_required()
+def upload_file(current_user):
+    """Upload a ZIP file and create a durable background job.
+
+    The archive is streamed to the spool directory as it is received.
+    """
+    try:
+        upload = receive_file_upload(
+            request.environ,
+            folder=storage_folder('TEMP_UPLOADS_FOLDER'),
+            max_size=TEXT_UPLOAD_MAX_ARCHIVE_SIZE,
+        )
+    except UploadRejected as exc:
+        if exc.reason == 'missing':
+            return error_response(error='File not found.', code=INVALID_REQUEST, status_code=400)
+        if exc.reason == 'invalid_type':
+            return error_response(error='Invalid file type.', code=INVALID_REQUEST, status_code=400)
+        return error_response(
+            error='Uploaded ZIP exceeds the maximum supported size.',
+            code=INVALID_REQUEST,
+            status_code=400,
+        )
+
+    unique_name = upload.filename
+    save_path = upload.path
+
+    duplicate_policy = upload.form.get('duplicate_policy', 'import')
+    if duplicate_policy not in DUPLICATE_POLICIES:
+        os.remove(save_path)
+        return error_response(
+            error=f"duplicate_policy must be one of: {', '.join(DUPLICATE_POLICIES)}.",
+            code=VALIDATION_ERROR,
+            status_code=400,
+        )
+
+    return _queue_text_upload(current_user, unique_name, save_path, upload.sha256, duplicate_policy)
+
+
+def _get_chunked_upload(current_user, upload_id: str) -> models.ChunkedUpload | None:
+    return (
+        db.session.query(models.ChunkedUpload)
+        .filter_by(id=upload_id, created_by_user_id=current_user.id)
+        .first()
+    )
+
+
+def _chunked_upload_status(upload: models.ChunkedUpload) -> upload_schemas.ChunkedUploadStatus:
+    return upload_schemas.ChunkedUploadStatus(
+        upload_id=upload.id,
+        file_name=upload.file_name,
+        total_size=upload.total_size,
+        part_size=upload.part_size,
+        total_parts=chunked_uploads.total_parts(upload),
+        received_parts=chunked_uploads.received_parts(upload),
+        status=upload.status,
+        job_id=upload.job_id,
+        batch_id=upload.batch_id,
+    )
+
+
+def _completed_upload_response(upload: models.ChunkedUpload):
+    response = upload_schemas.UploadResponse(job_id=upload.job_id, batch_id=upload.batch_id)
+    return jsonify(response.model_dump()), 202
+
+
+def _upload_not_receiving_response(upload: models.ChunkedUpload):
+    if upload.status == chunked_uploads.STATUS_COMPLETED:
+        error = 'Upload was already completed.'
+    else:
+        error = 'Upload is already being completed.'
+    return error_response(error=error, code=BUSINESS_RULE_VIOLATION, status_code=409)
+
+
+@upload_bp.route('/api/upload/chunked', methods=['POST'])
+@limiter.limit("10 per minute; 50 per hour")
+@admin_required()
+@validate()
+def create_chunked_upload(current_user, body: upload_schemas.ChunkedUploadCreateRequest):
+    """Start a resumable archive upload; parts are then sent with PUT .../parts/<n>."""
+    if body.total_size > TEXT_UPLOAD_MAX_ARCHIVE_SIZE:
+        return error_response(
+            error='Uploaded ZIP exceeds the maximum supported size.',
+            code=INVALID_REQUEST,
+            status_code=400,
+        )
+
+    upload = chunked_uploads.create_chunked_upload(
+        db.session,
+        user_id=current_user.id,
+        file_name=body.file_name,
+        total_size=body.total_size,
+        duplicate_policy=body.duplicate_policy,
+    )
+    return jsonify(_chunked_upload_status(upload).model_dump()), 201
+
+
+@upload_bp.route('/api/upload/chunked/<upload_id>', methods=['GET'])
+@limiter.limit("120 per minute")
+@admin_required()
+def get_chunked_upload(current_user, upload_id: str):
+    """List the parts received so far, so an interrupted upload can send only the missing ones."""
+    upload = _get_chunked_upload(current_user, upload_id)
+    if upload is None:
+        return error_response(error='Upload not found', code=RESOURCE_NOT_FOUND, status_code=404)
+
+    return jsonify(_chunked_upload_status(upload).model_dump()), 200
+
+
+@upload_bp.route('/api/upload/chunked/<upload_id>/parts/<int:part_number>', methods=['PUT'])
+@limiter.limit("600 per minute")
+@admin_required()
+def upload_chunked_part(current_user, upload_id: str, part_number: int):
+    """Store one part (raw request body). Parts may be sent in any order, in parallel, and re-sent."""
+    upload = _get_chunked_upload(current_user, upload_id)
+    if upload is None:
+        return error_response(error='Upload not found', code=RESOURCE_NOT_FOUND, status_code=404)
+
+    if upload.status != chunked_uploads.STATUS_RECEIVING:
+        return _upload_not_receiving_response(upload)
+
+    if not 1 <= part_number <= chunked_uploads.total_parts(upload):
+        return error_response(error='Invalid part number.', code=INVALID_REQUEST, status_code=400)
+
+    expected_size = chunked_uploads.expected_part_size(upload, part_number)
+    if request.content_length is not None and request.content_length != expected_size:
+        return error_response(
+            error=f'Part {part_number} must be {expected_size} bytes.',
+            code=INVALID_REQUEST,
+            status_code=400,
+        )
+
+    try:
+        size = chunked_uploads.write_part(upload, part_number, request.stream)
+    except chunked_uploads.PartSizeMismatch as exc:
+        return error_response(error=str(exc), code=INVALID_REQUEST, status_code=400)
+
+    # Keeps an upload that is still receiving parts from expiring
+    upload.updated_at = utcnow()
+    db.session.commit()
+
+    response = upload_schemas.ChunkedUploadPartResponse(part_number=part_number, size=size)
+    return jsonify(response.model_dump()), 200
+
+
+@upload_bp.route('/api/upload/chunked/<upload_id>/complete', methods=['POST'])
+@limiter.limit("10 per minute; 50 per hour")
+@admin_required()
+def complete_chunked_upload(current_user, upload_id: str):
+    """Assemble the parts into one archive and queue its import, like POST /api/upload.
+
+    Repeating the request (e.g. after a timeout) returns the job queued by the
+    first one.
+    """
+    upload = _get_chunked_upload(current_user, upload_id)
+    if upload is None:
+        return error_response(error='Upload not found', code=RESOURCE_NOT_FOUND, status_code=404)
+
+    if upload.status == chunked_uploads.STATUS_COMPLETED:
+        return _completed_upload_response(upload)
+
+    missing_parts = chunked_uploads.total_parts(upload) - len(chunked_uploads.received_parts(upload))
+    if upload.status == chunked_uploads.STATUS_RECEIVING and missing_parts:
+        return error_response(
+            error=f'Upload is missing {missing_parts} part(s).',
+            code=BUSINESS_RULE_VIOLATION,
+            status_code=409,
+        )
+
+    if not chunked_uploads.claim_for_completion(db.session, upload):
+        if upload.status == chunked_uploads.STATUS_COMPLETED:
+            return _completed_upload_response(upload)
+        return _upload_not_receiving_response(upload)
+
+    unique_name = f"{uuid.uuid4()}_{secure_filename(upload.file_name)}"
+    save_path = os.path.join(storage_folder('TEMP_UPLOADS_FOLDER'), unique_name)
+    try:
+        archive_sha256 = chunked_uploads.assemble_parts(upload, save_path)
+    except OSError:
+        chunked_uploads.release_completion_claim(db.session, upload)
+        return error_response(
+            error='Failed to assemble the uploaded parts.',
+            code=INTERNAL_SERVER_ERROR,
+            status_code=500,
+        )
+
+    return _queue_text_upload(
+        current_user,
+        unique_name,
+        save_path,
+        archive_sha256,
+        upload.duplicate_policy,
+        chunked_upload=upload,
+    )
+
+
 @upload_bp.route('/api/status/<job_id>', methods=['GET'])
 @limiter.limit("120 per minute")
 @login_required()
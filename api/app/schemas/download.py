@@ -1,14 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Literal
 
 class DownloadRequest(BaseModel):
     """Schema for the download request body.
     Args:
         text_ids (List[int]): List of text IDs to download.
         use_tags (bool): Whether to use XML syntax in normalized tokens.
+        whitespace_mode (str): 'stored' to keep the original spacing, 'heuristic' to guess it from punctuation.
     """
     text_ids: List[int] = Field(..., json_schema_extra={"example": [1, 2, 3]}, description="List of text IDs to download.")
     use_tags: bool = Field(False, description="Whether to use tags in the normalized tokens.")
+    whitespace_mode: Literal["stored", "heuristic"] = Field("stored", description="How spacing between tokens is rebuilt.")
 
 class ReportRequest(BaseModel):
     """Schema for the report request body.
@@ -16,3 +18,19 @@ class ReportRequest(BaseModel):
         text_ids (List[int]): List of text IDs to generate the report for.
     """
     text_ids: List[int] = Field(..., json_schema_extra={"example": [1, 2, 3]}, description="List of text IDs to generate the report for.")
+
+class AgreementReportRequest(BaseModel):
+    """Schema for the agreement report request body.
+    Args:
+        text_ids (List[int]): List of text IDs to compare.
+        usernames (List[str]): Users whose normalizations are compared, in column order.
+    """
+    text_ids: List[int] = Field(..., min_length=1, json_schema_extra={"example": [1, 2, 3]}, description="List of text IDs to compare.")
+    usernames: List[str] = Field(..., min_length=2, max_length=50, json_schema_extra={"example": ["ana", "bia"]}, description="Users to compare.")
+
+class ExportJobResponse(BaseModel):
+    """Schema for the response of an export job request.
+    Args:
+        job_id (str): ID of the background job; poll /api/status/<job_id> for progress.
+    """
+    job_id: str
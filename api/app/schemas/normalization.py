@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field, TypeAdapter
-from typing import Dict, Optional
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
+from typing import Dict, List, Optional
+
+MAX_NORMALIZATION_BATCH_SIZE = 1000
 
 class NormalizationValue(BaseModel):
     last_index: int
@@ -27,6 +29,48 @@ class NormalizationCreateRequest(BaseModel):
     new_token: str = Field(..., json_schema_extra={"example": "new corrected token"}, description="The new token that will replace the original.")
     suggest_for_all: Optional[bool] = Field(False, description="If true, suggests this correction for all occurrences of the text.")
 
+class NormalizationBatchItem(BaseModel):
+    """One normalization of a batch save.
+    Args:
+        first_index (int): Index from the first token.
+        last_index (int): Index of the last token of the normalization.
+        new_token (str): The new token that will replace the original.
+    """
+    first_index: int = Field(..., ge=0, json_schema_extra={"example": 15}, description="Index from the first token.")
+    last_index: int = Field(..., ge=0, json_schema_extra={"example": 16}, description="Index of the last token of the normalization.")
+    new_token: str = Field(..., max_length=512, json_schema_extra={"example": "new corrected token"}, description="The new token that will replace the original.")
+
+class NormalizationBatchRequest(BaseModel):
+    """Schema for the POST request body to save and delete several normalizations at once.
+    Args:
+        normalizations (List[NormalizationBatchItem]): Normalizations to create or update.
+        deletions (List[int]): Indexes of the first token of normalizations to delete.
+    """
+    normalizations: List[NormalizationBatchItem] = Field(default_factory=list, max_length=MAX_NORMALIZATION_BATCH_SIZE, description="Normalizations to create or update.")
+    deletions: List[int] = Field(default_factory=list, max_length=MAX_NORMALIZATION_BATCH_SIZE, json_schema_extra={"example": [3, 8]}, description="Indexes of the first token of normalizations to delete.")
+
+    @model_validator(mode="after")
+    def check_batch(self):
+        if not self.normalizations and not self.deletions:
+            raise ValueError("At least one normalization or deletion is required.")
+        first_indexes = [item.first_index for item in self.normalizations]
+        if len(set(first_indexes)) != len(first_indexes):
+            raise ValueError("Each first_index may appear only once in normalizations.")
+        if set(first_indexes) & set(self.deletions):
+            raise ValueError("An index cannot be both saved and deleted in the same batch.")
+        if any(item.last_index < item.first_index for item in self.normalizations):
+            raise ValueError("last_index must be greater than or equal to first_index.")
+        return self
+
+class NormalizationBatchResponse(BaseModel):
+    """Schema for the response of a batch normalization save.
+    Args:
+        saved (int): Number of normalizations created or updated.
+        deleted (int): Number of normalizations removed.
+    """
+    saved: int
+    deleted: int
+
 class SetToBeNormalizedRequest(BaseModel):
     """Schema for explicitly setting the to_be_normalized flag for a token."""
     to_be_normalized: bool = Field(
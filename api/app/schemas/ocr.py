@@ -1,4 +1,13 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 class OCRUploadResponse(BaseModel):
     job_id: str
+
+class RawTextImageQuery(BaseModel):
+    """Schema for the raw text image query.
+    Args:
+        size (str): 'original' (stored image), 'preview' (1024 px) or 'thumbnail' (256 px).
+    """
+    size: Literal["original", "preview", "thumbnail"] = "original"
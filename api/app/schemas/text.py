@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+from app.utils.pagination import MAX_PAGE_SIZE
 
 class TextMetadata(BaseModel):
     """Schema for the metadata of a single text in the list.
@@ -24,6 +26,7 @@ class TextsDataResponse(BaseModel):
         texts_data (List[TextMetadata]): List of text metadata.
     """
     texts_data: List[TextMetadata] = Field(alias="textsData")
+    next_cursor: Optional[str] = Field(alias="nextCursor", default=None)
     model_config = ConfigDict(populate_by_name=True, title="textsData")
 
 class Token(BaseModel):
@@ -90,12 +93,54 @@ class BatchTextsStatusResponse(BaseModel):
     statuses: List[BatchTextsStatusItem]
     missing_ids: List[int] = []
 
-class FilteredTextsQuery(BaseModel):
+TextsSortKey = Literal[
+    "id", "-id",
+    "grade", "-grade",
+    "source_file_name", "-source_file_name",
+]
+
+class TextsPageQuery(BaseModel):
+    """Schema for keyset pagination, sorting and projection of text listings.
+    Args:
+        limit (Optional[int]): Page size. Listings are unpaginated when neither limit nor cursor is given.
+        cursor (Optional[str]): Opaque cursor returned as nextCursor by the previous page.
+        sort (TextsSortKey): Sort key, prefixed with '-' for descending order.
+        fields (Optional[str]): Comma-separated list of fields to return. 'id' is always included.
+    """
+    limit: Optional[int] = Field(default=None, ge=1, le=MAX_PAGE_SIZE)
+    cursor: Optional[str] = None
+    sort: TextsSortKey = "id"
+    fields: Optional[str] = None
+
+class FilteredTextsQuery(TextsPageQuery):
     grades: Optional[str] = None
     assigned_users: Optional[str] = None
     normalized: Optional[str] = None
     file_name: Optional[str] = None
 
+class TextSearchQuery(BaseModel):
+    """Schema for the file name search.
+    Args:
+        q (str): Search term.
+        mode (str): 'fuzzy' (trigram similarity), 'prefix' or 'substring'.
+        limit (int): Maximum number of results.
+    """
+    q: str = Field(min_length=1, max_length=255)
+    mode: Literal["fuzzy", "prefix", "substring"] = "fuzzy"
+    limit: int = Field(default=20, ge=1, le=100)
+
+class TextSearchResult(BaseModel):
+    id: int
+    source_file_name: Optional[str] = Field(alias="sourceFileName", default=None)
+    grade: Optional[int] = None
+    processing_status: str = Field(alias="processingStatus", default="PENDING")
+    score: float
+    model_config = ConfigDict(populate_by_name=True)
+
+class TextSearchResponse(BaseModel):
+    results: List[TextSearchResult]
+    model_config = ConfigDict(populate_by_name=True)
+
 class RawTextItem(BaseModel):
     id: int
     source_file_name: Optional[str] = Field(alias="sourceFileName", default=None)
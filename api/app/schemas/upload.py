@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 
 class UploadResponse(BaseModel):
@@ -9,12 +9,44 @@ class UploadResponse(BaseModel):
     batch_id: int
 
 
+class ChunkedUploadCreateRequest(BaseModel):
+    file_name: str = Field(..., min_length=1, max_length=255)
+    total_size: int = Field(..., gt=0)
+    duplicate_policy: Literal["import", "skip", "link"] = "import"
+
+    @field_validator("file_name")
+    @classmethod
+    def check_zip_name(cls, value: str) -> str:
+        if not value.endswith(".zip"):
+            raise ValueError("file_name must end with .zip")
+        return value
+
+
+class ChunkedUploadStatus(BaseModel):
+    upload_id: str
+    file_name: str
+    total_size: int
+    part_size: int
+    total_parts: int
+    received_parts: list[int]
+    status: Literal["receiving", "completing", "completed"] = "receiving"
+    job_id: Optional[str] = None
+    batch_id: Optional[int] = None
+
+
+class ChunkedUploadPartResponse(BaseModel):
+    part_number: int
+    size: int
+
+
 class TextUploadTaskResult(BaseModel):
     kind: Literal["text_upload"]
     batch_id: int
     text_ids: list[int]
     created: int
+    linked: int = 0
     failed_files: list[str] = []
+    skipped_files: list[str] = []
 
 
 class TextUploadBatchTextStatus(BaseModel):
@@ -35,6 +67,7 @@ class TextUploadBatchSummary(BaseModel):
     processed_texts: int = 0
     failed_texts: int = 0
     failed_files: list[str] = []
+    skipped_files: list[str] = []
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     import_finished_at: Optional[datetime] = None
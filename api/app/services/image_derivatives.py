@@ -0,0 +1,68 @@
+"""Downscaled copies of stored OCR images for the raw-text review screens.
+
+Derivatives are generated on first request and kept in
+IMAGE_DERIVATIVES_FOLDER as ``<size>_<stored name>``. Stored image names are
+unique (``<uuid>_<name>.jpg``) and never rewritten, so a derivative never goes
+stale and can be cached by clients.
+"""
+
+import os
+import threading
+
+from PIL import Image
+
+from ..storage import storage_folder
+
+
+# Longest side, in pixels
+IMAGE_SIZES = {
+    'thumbnail': 256,
+    'preview': 1024,
+}
+DERIVATIVE_JPEG_QUALITY = 80
+
+
+def derivative_name(image_path: str, size: str) -> str:
+    return f'{size}_{image_path}'
+
+
+def get_image_derivative(image_path: str, size: str) -> str:
+    """Returns the file name (in IMAGE_DERIVATIVES_FOLDER) of *image_path* at *size*, creating it if needed.
+
+    Raises:
+        FileNotFoundError: If the stored image does not exist.
+        ValueError: If *size* is unknown.
+    """
+    if size not in IMAGE_SIZES:
+        raise ValueError(f'Unsupported image size: {size}')
+
+    name = derivative_name(image_path, size)
+    path = os.path.join(storage_folder('IMAGE_DERIVATIVES_FOLDER'), name)
+    if os.path.exists(path):
+        return name
+
+    max_side = IMAGE_SIZES[size]
+    with Image.open(os.path.join(storage_folder('IMAGES_FOLDER'), image_path)) as image:
+        image.draft('RGB', (max_side, max_side))
+        image.thumbnail((max_side, max_side))
+        derivative = image.convert('RGB') if image.mode != 'RGB' else image.copy()
+
+    # Concurrent requests may build the same derivative; each writes its own
+    # file and the rename keeps whichever finishes last.
+    partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+    try:
+        derivative.save(partial_path, format='JPEG', quality=DERIVATIVE_JPEG_QUALITY)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    return name
+
+
+def remove_image_derivatives(image_path: str) -> None:
+    """Deletes every derivative of *image_path*."""
+    for size in IMAGE_SIZES:
+        path = os.path.join(storage_folder('IMAGE_DERIVATIVES_FOLDER'), derivative_name(image_path, size))
+        if os.path.exists(path):
+            os.remove(path)
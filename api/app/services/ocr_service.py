@@ -1,58 +1,270 @@
+import hashlib
+import io
 import os
+import threading
 import time
+from abc import ABC, abstractmethod
+
 from google import genai
-from google.genai import types
 from PIL import Image
-import io
 
 
+OCR_MODEL = 'gemini-flash-lite-latest'
+
+# Prompt for OCR
+OCR_PROMPT = """
+        Você é um especialista em OCR (Reconhecimento Óptico de Caracteres).
+        Transcreva EXATAMENTE todo o texto visível nesta imagem.
+        Use DUAS quebras de linha consecutivas (linha em branco) antes de cada parágrafo.
+        Ignore as quebras de linha ao fim das linhas na imagem (junte as linhas do mesmo parágrafo).
+        Não adicione comentários, introduções, conclusões ou correções, forneça apenas o texto extraído.
+        Junte palavras separadas por hífens no final das linhas.
+        """
+
+# Part of the cache key, so cached results are not reused after the prompt changes
+OCR_PROMPT_VERSION = hashlib.sha256(OCR_PROMPT.encode('utf-8')).hexdigest()[:12]
 
+OCR_CACHE_FOLDER = os.getenv('OCR_CACHE_FOLDER', os.path.join(os.getcwd(), 'ocr_cache'))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', '100000'))  # 0 disables the limit
 
-def perform_ocr(image_path_or_bytes):
+
+class EmptyOCRResult(Exception):
+    """The backend returned no text (e.g. a blocked or empty Gemini response)."""
+
+
+class OCRBackend(ABC):
+    """Interface of the services that turn an image into text.
+
+    Implementations must be safe to call from several threads at once.
+    ``cache_namespace`` identifies the backend and model in OCR cache keys;
+    backends that leave it as ``None`` are never cached.
     """
-    Performs OCR on an image using Google Gemini Flash (using updated google-genai SDK).
-    Args:
-        image_path_or_bytes (str or bytes): Path to the image file or bytes.
-    Returns:
-        str: Extracted text.
+
+    cache_namespace = None
+
+    @abstractmethod
+    def extract_text(self, image: Image.Image) -> str:
+        """Returns the text read from *image* (an RGB image)."""
+
+
+class GeminiOCRBackend(OCRBackend):
+    """OCR through Google Gemini (google-genai SDK).
+
+    The SDK client is created once, so its HTTP connections are reused by every
+    call; it is thread-safe and shared by the OCR worker threads.
     """
-    start_time = time.perf_counter()
-    input_kind = 'path' if isinstance(image_path_or_bytes, str) else 'bytes'
+
+    def __init__(self, api_key: str, model: str = OCR_MODEL):
+        self.model = model
+        self.cache_namespace = f'gemini:{model}'
+        self._client = genai.Client(api_key=api_key)
+
+    def extract_text(self, image: Image.Image) -> str:
+        response = self._client.models.generate_content(
+            model=self.model,
+            contents=[OCR_PROMPT, image]
+        )
+        return response.text
+
+
+class StubOCRBackend(OCRBackend):
+    """Local backend for tests and benchmarks: returns *text* after *latency_seconds*."""
+
+    def __init__(self, text: str = 'Texto de teste.', latency_seconds: float = 0.0):
+        self.text = text
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def extract_text(self, image: Image.Image) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self.text
+
+
+def create_ocr_backend() -> OCRBackend:
+    """Builds the backend selected by the OCR_BACKEND environment variable ('gemini' or 'stub')."""
+    backend_name = os.getenv('OCR_BACKEND', 'gemini').strip().lower()
+    if backend_name == 'stub':
+        return StubOCRBackend()
+    if backend_name != 'gemini':
+        raise ValueError(f"Unsupported OCR_BACKEND: {backend_name}")
 
     api_key = os.getenv("API_KEY")
     if not api_key:
         raise ValueError("API_KEY not found in environment variables.")
 
-    client = genai.Client(api_key=api_key)
+    return GeminiOCRBackend(api_key)
+
 
-    image = None
-    if isinstance(image_path_or_bytes, str):
-        image = Image.open(image_path_or_bytes)
+def _load_image(image_source) -> Image.Image:
+    if isinstance(image_source, Image.Image):
+        image = image_source
+    elif isinstance(image_source, str):
+        image = Image.open(image_source)
     else:
-        image = Image.open(io.BytesIO(image_path_or_bytes))
+        image = Image.open(io.BytesIO(image_source))
 
-    # Convert to RGB if needed and resize/optimize if necessary
     # Gemini handles images well, but standardizing to RGB is good practice
     if image.mode != 'RGB':
         image = image.convert('RGB')
-    
-    # Prompt for OCR
-    prompt = """
-        Você é um especialista em OCR (Reconhecimento Óptico de Caracteres).
-        Transcreva EXATAMENTE todo o texto visível nesta imagem. 
-        Use DUAS quebras de linha consecutivas (linha em branco) antes de cada parágrafo.
-        Ignore as quebras de linha ao fim das linhas na imagem (junte as linhas do mesmo parágrafo). 
-        Não adicione comentários, introduções, conclusões ou correções, forneça apenas o texto extraído.
-        Junte palavras separadas por hífens no final das linhas.
+    return image
+
+
+class OCRResultCache:
+    """Persistent image -> extracted text cache, one UTF-8 file per entry.
+
+    Keys hash the decoded RGB pixels, so re-encoded or renamed copies of the
+    same scan hit the cache, plus the backend namespace and prompt version.
+    Entries are written atomically and safe to share between threads and
+    worker processes. A hit refreshes the entry's modification time, and every
+    PRUNE_EVERY writes the least recently used entries beyond *max_entries*
+    are deleted (``0`` keeps every entry).
+    """
+
+    HASH_BAND_HEIGHT = 256
+    PRUNE_EVERY = 1000
+
+    def __init__(self, folder: str = OCR_CACHE_FOLDER, max_entries: int = OCR_CACHE_MAX_ENTRIES):
+        self.folder = folder
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def key(self, image: Image.Image, namespace: str) -> str:
+        hasher = hashlib.sha256(f'{namespace}|{OCR_PROMPT_VERSION}|{image.mode}|{image.width}x{image.height}|'.encode('utf-8'))
+        # Hash the pixels in bands to avoid copying a large image at once
+        for top in range(0, image.height, self.HASH_BAND_HEIGHT):
+            band = image.crop((0, top, image.width, min(image.height, top + self.HASH_BAND_HEIGHT)))
+            hasher.update(band.tobytes())
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key[:2], f'{key}.txt')
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as cached:
+                text = cached.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Marks the entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        with open(partial_path, 'w', encoding='utf-8') as cached:
+            cached.write(text)
+        os.replace(partial_path, path)
+
+        with self._lock:
+            prune = self.max_entries > 0 and self._writes % self.PRUNE_EVERY == 0
+            self._writes += 1
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Deletes the least recently used entries beyond *max_entries*. Returns how many were removed."""
+        if self.max_entries <= 0 or not os.path.isdir(self.folder):
+            return 0
+
+        entries = []
+        for shard in os.scandir(self.folder):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.txt'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        pass
+
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return excess
+
+
+class OCRClient:
+    """Long-lived OCR entry point wrapping one backend and an optional result cache."""
+
+    def __init__(self, backend: OCRBackend, cache: OCRResultCache | None = None):
+        self.backend = backend
+        self.cache = cache if backend.cache_namespace else None
+
+    def perform(self, image_source) -> str:
+        """
+        Args:
+            image_source (PIL.Image.Image, str or bytes): In-memory image, path to an image file or image bytes.
+        Returns:
+            str: Extracted text.
         """
+        image = _load_image(image_source)
+        if self.cache is None:
+            return self._extract_text(image)
 
-    try:
-        response = client.models.generate_content(
-            model='gemini-flash-lite-latest',
-            contents=[prompt, image]
-        )
-        return response.text
-        
-    except Exception as e:
-        pass
-        raise e
+        key = self.cache.key(image, self.backend.cache_namespace)
+        text = self.cache.get(key)
+        if text is None:
+            text = self._extract_text(image)
+            self.cache.put(key, text)
+        return text
+
+    def _extract_text(self, image: Image.Image) -> str:
+        text = self.backend.extract_text(image)
+        # Never return (or cache) an empty result as if the page had been read
+        if not text or not text.strip():
+            raise EmptyOCRResult(f'{type(self.backend).__name__} returned no text.')
+        return text
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_ocr_client() -> OCRClient:
+    """Returns the process-wide OCR client, creating it on first use."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            cache_enabled = os.getenv('OCR_CACHE_ENABLED', 'true').strip().lower() != 'false'
+            _shared_client = OCRClient(
+                create_ocr_backend(),
+                cache=OCRResultCache() if cache_enabled else None,
+            )
+        return _shared_client
+
+
+def set_ocr_client(client: OCRClient | None) -> None:
+    """Replaces the process-wide OCR client (``None`` rebuilds it on next use)."""
+    global _shared_client
+    with _shared_client_lock:
+        _shared_client = client
+
+
+def perform_ocr(image_path_or_bytes, client: OCRClient | None = None):
+    """
+    Performs OCR on an image using the shared OCR client (Google Gemini Flash by default).
+    Args:
+        image_path_or_bytes (PIL.Image.Image, str or bytes): In-memory image, path to the image file or bytes.
+        client (OCRClient, optional): Client to use instead of the shared one.
+    Returns:
+        str: Extracted text.
+    """
+    return (client or get_ocr_client()).perform(image_path_or_bytes)
@@ -0,0 +1,23 @@
+"""Locations of the working folders (uploaded archives, OCR images, exports).
+
+Read from ``current_app.config`` so deployments and tests can move them,
+falling back to :class:`app.config.Config` outside an app context. Folders
+are created on first use.
+"""
+
+import os
+
+from flask import current_app
+
+from .config import Config
+
+
+def storage_folder(key: str) -> str:
+    """Returns the folder configured under *key* (e.g. ``'IMAGES_FOLDER'``), creating it if needed."""
+    try:
+        folder = current_app.config.get(key, getattr(Config, key))
+    except RuntimeError:
+        # No active Flask application context
+        folder = getattr(Config, key)
+    os.makedirs(folder, exist_ok=True)
+    return folder
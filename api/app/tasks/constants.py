@@ -1,18 +1,14 @@
-import os
-
-
-TEMP_UPLOADS_FOLDER = os.path.join(os.getcwd(), 'temp_uploads')
-IMAGES_FOLDER = os.path.join(os.getcwd(), 'images')
-
 # Text upload safety limits
 TEXT_UPLOAD_MAX_ARCHIVE_SIZE = 100 * 1024 * 1024  # 100 MB
 TEXT_UPLOAD_MAX_UNCOMPRESSED_SIZE = 250 * 1024 * 1024  # 250 MB
 TEXT_UPLOAD_MAX_MEMBER_SIZE = 50 * 1024 * 1024  # 50 MB per text file
+CHUNKED_UPLOAD_PART_SIZE = 8 * 1024 * 1024  # 8 MB per part of a resumable upload
 
 # OCR processing safety limits
 OCR_MAX_UNCOMPRESSED_SIZE = 1000 * 1024 * 1024  # 1000 MB
 OCR_MAX_IMAGE_PIXELS = 89478485  # ~300 megapixels (PIL default)
 OCR_MAX_IMAGE_DIMENSION = 20000
+OCR_SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # archive members larger than this are spooled to disk
 
 VALID_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
 IMAGE_MAGIC_BYTES = {
@@ -21,7 +17,3 @@ IMAGE_MAGIC_BYTES = {
     b'II*\x00': 'tiff',  # Little-endian TIFF
     b'MM\x00*': 'tiff',  # Big-endian TIFF
 }
-
-
-os.makedirs(TEMP_UPLOADS_FOLDER, exist_ok=True)
-os.makedirs(IMAGES_FOLDER, exist_ok=True)
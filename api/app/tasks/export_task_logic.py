@@ -0,0 +1,88 @@
+"""Background task logic for text exports (ZIP of normalized texts)."""
+
+import os
+import time
+
+from ..download_texts import iter_modified_texts_zip
+from ..storage import storage_folder
+
+
+EXPORT_PROGRESS_INTERVAL = 25
+
+
+def export_file_path(job_id: str) -> str:
+    return os.path.join(storage_folder('EXPORTS_FOLDER'), f'{job_id}.zip')
+
+
+def _report_progress(task, *, current: int, total: int) -> None:
+    if task is None or not hasattr(task, 'report_progress'):
+        return
+
+    task.report_progress(
+        current=current,
+        total=total,
+        status_message=f'Exportando texto {current}/{total}',
+    )
+
+
+def run_text_export_pipeline(
+    task,
+    *,
+    job_id: str,
+    user_id: int,
+    text_ids: list[int],
+    use_tags: bool = False,
+    whitespace_mode: str = 'stored',
+):
+    """Writes the export archive of *text_ids* to EXPORTS_FOLDER.
+
+    The archive is written to a temporary file and renamed once complete, so a
+    partially written export is never served.
+    """
+    total = len(text_ids)
+    final_path = export_file_path(job_id)
+    partial_path = f'{final_path}.part'
+    exported = 0
+
+    _report_progress(task, current=0, total=total)
+
+    try:
+        with open(partial_path, 'wb') as archive_file:
+            for chunk in iter_modified_texts_zip(user_id, text_ids, use_tags, whitespace_mode):
+                archive_file.write(chunk)
+                # One chunk per exported text, plus the central directory at the end
+                exported = min(exported + 1, total)
+                if exported % EXPORT_PROGRESS_INTERVAL == 0:
+                    _report_progress(task, current=exported, total=total)
+
+        os.replace(partial_path, final_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    return {
+        'status': 'Completed',
+        'total': total,
+        'result': {
+            'kind': 'text_export',
+            'file_name': 'recovered_texts.zip',
+            'size': os.path.getsize(final_path),
+            'text_ids': text_ids,
+        },
+    }
+
+
+def cleanup_expired_exports(max_age_seconds: int) -> int:
+    """Deletes export archives older than *max_age_seconds*. Returns how many were removed."""
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+
+    for entry in os.scandir(storage_folder('EXPORTS_FOLDER')):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+    return removed
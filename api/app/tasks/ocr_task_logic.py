@@ -1,48 +1,222 @@
-import io
 import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
 import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
+from flask import current_app
 from PIL import Image
 
+from ..config import Config
+from ..database import models
 from ..services import ocr_service
+from ..storage import storage_folder
 from .constants import (
     IMAGE_MAGIC_BYTES,
-    IMAGES_FOLDER,
     OCR_MAX_IMAGE_DIMENSION,
     OCR_MAX_IMAGE_PIXELS,
     OCR_MAX_UNCOMPRESSED_SIZE,
+    OCR_SPOOL_MAX_MEMORY,
     VALID_IMAGE_EXTENSIONS,
 )
-from .persistence import add_to_database
+from .persistence import add_raw_text
 
 
+class OCRArchiveRejected(Exception):
+    """The archive can never be processed, so the job must not be retried."""
 
 
-def run_ocr_zip_pipeline(task, zip_path):
+def _ocr_setting(key: str):
+    try:
+        return current_app.config.get(key, getattr(Config, key))
+    except RuntimeError:
+        # No active Flask application context
+        return getattr(Config, key)
+
+
+class _RateLimiter:
+    """Spaces calls evenly so at most *requests_per_minute* start per minute (thread-safe)."""
+
+    def __init__(self, requests_per_minute: int):
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _perform_ocr_with_retries(image: Image.Image, rate_limiter: _RateLimiter, max_retries: int, backoff_seconds: float):
+    """Runs OCR on one in-memory image, retrying failed calls with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        rate_limiter.wait()
+        try:
+            return ocr_service.perform_ocr(image)
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff_seconds * (2 ** attempt))
+
+
+def _prepare_image(zip_ref: zipfile.ZipFile, filename: str, base_name: str, max_resolution: int) -> tuple[str, Image.Image]:
+    """Validates one archive member and stores it as JPEG in IMAGES_FOLDER.
+
+    The member is spooled to a temporary file (on disk past
+    OCR_SPOOL_MAX_MEMORY) rather than read into memory, and decoded at reduced
+    scale where the format allows it (``Image.draft`` for JPEG), so the image
+    never exceeds *max_resolution* on its longest side.
+
+    Returns the storage file name (relative to IMAGES_FOLDER) and the decoded
+    RGB image, which is sent to OCR without reading the JPEG back.
+    """
+    # 1. Spool image from ZIP
+    with zip_ref.open(filename) as member, tempfile.SpooledTemporaryFile(max_size=OCR_SPOOL_MAX_MEMORY) as spool:
+        shutil.copyfileobj(member, spool, 1024 * 1024)
+        spool.seek(0)
+
+        # Validate magic bytes to ensure it's actually an image
+        header = spool.read(max(len(magic) for magic in IMAGE_MAGIC_BYTES))
+        if not any(header.startswith(magic) for magic in IMAGE_MAGIC_BYTES):
+            raise ValueError(
+                f'Invalid image file format (magic bytes check failed): {base_name}'
+            )
+        spool.seek(0)
+
+        # 2. Decode and downscale
+        # Set PIL protection limits
+        Image.MAX_IMAGE_PIXELS = OCR_MAX_IMAGE_PIXELS
+
+        image = Image.open(spool)
+
+        # Check image dimensions before decoding
+        width, height = image.size
+        if width > OCR_MAX_IMAGE_DIMENSION or height > OCR_MAX_IMAGE_DIMENSION:
+            raise ValueError(
+                f'Image dimensions too large ({width}x{height}) for {base_name}'
+            )
+
+        image.draft('RGB', (max_resolution, max_resolution))
+        image.thumbnail((max_resolution, max_resolution))
+        image.load()
+
+    # Ensure RGB
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Save to permanent storage
+    # structure: images/<uuid>_<filename>.jpg
+    clean_name = os.path.splitext(base_name)[0] + '.jpg'
+    storage_filename = f"{uuid.uuid4()}_{clean_name}"
+    image.save(os.path.join(storage_folder('IMAGES_FOLDER'), storage_filename), format='JPEG', quality=85)
+
+    return storage_filename, image
+
+
+def _remove_stored_image(storage_filename: str | None) -> None:
+    if storage_filename:
+        storage_path = os.path.join(storage_folder('IMAGES_FOLDER'), storage_filename)
+        if os.path.exists(storage_path):
+            os.remove(storage_path)
+
+
+def _discard_in_flight(in_flight: deque) -> None:
+    """Cancels the OCR calls that have not started and removes the images of uncollected members."""
+    while in_flight:
+        _, _, storage_filename, outcome = in_flight.popleft()
+        if isinstance(outcome, Future):
+            outcome.cancel()
+        _remove_stored_image(storage_filename)
+
+
+def _load_checkpoint_results(raw_text_ids: dict[str, int]) -> dict[str, dict]:
+    """Loads the results committed by earlier attempts, keyed by archive member name."""
+    from app.extensions import db
+
+    if not raw_text_ids:
+        return {}
+
+    member_by_id = {raw_text_id: filename for filename, raw_text_id in raw_text_ids.items()}
+    rows = db.session.query(models.RawText).filter(models.RawText.id.in_(member_by_id)).all()
+    return {
+        member_by_id[row.id]: {'text_content': row.text_content, 'image_path': row.image_path}
+        for row in rows
+    }
+
+
+def _commit_result(task, raw_text_ids: dict[str, int]) -> None:
+    from app.extensions import db
+
+    # The reporter commits the new RawText together with the checkpoint
+    if task is not None and hasattr(task, 'save_checkpoint'):
+        task.save_checkpoint({'raw_text_ids': raw_text_ids})
+    db.session.commit()
+
+
+def run_ocr_zip_pipeline(task, zip_path, checkpoint: dict | None = None):
     """
     Process a ZIP file containing images with OCR.
+
+    Images are decoded and stored on the calling thread, while the remote OCR
+    calls run on a thread pool of OCR_CONCURRENCY workers, paced by
+    OCR_REQUESTS_PER_MINUTE and retried up to OCR_MAX_RETRIES times. At most
+    twice the pool size of images are in flight, and results are collected in
+    archive order. An image that still fails is listed in ``failed_files``
+    instead of aborting the archive; the job only fails if no image succeeded.
+
+    Each ``RawText`` is committed as soon as its OCR result is collected, and
+    the member name -> RawText id map is saved through
+    ``task.save_checkpoint``. Passing that *checkpoint* back skips the members
+    it lists. The ZIP is kept when the run fails for an unexpected (possibly
+    transient) error, so it can be retried; OCR calls that have not started
+    are then cancelled and the images of uncommitted members removed. The
+    ZIP is removed once the archive is processed, or when the archive is
+    invalid or none of its images could be decoded, since retrying those
+    would fail again. If no image succeeded but some failed in the OCR call
+    itself (an outage or exhausted quota), the run fails like an unexpected
+    error and the ZIP is kept.
     """
     if not os.path.exists(zip_path):
         pass
         raise FileNotFoundError('Temp file not found in server.')
 
-    # Ensure images directory exists (in case it was deleted or worker runs in different context)
-    os.makedirs(IMAGES_FOLDER, exist_ok=True)
+    raw_text_ids = dict((checkpoint or {}).get('raw_text_ids') or {})
+    member_results = _load_checkpoint_results(raw_text_ids)
+    raw_text_ids = {filename: raw_text_ids[filename] for filename in member_results}
+    failed_files = []
+    first_error = None
+    first_ocr_error = None
 
-    results = {}
+    concurrency = max(1, _ocr_setting('OCR_CONCURRENCY'))
+    max_retries = max(0, _ocr_setting('OCR_MAX_RETRIES'))
+    backoff_seconds = _ocr_setting('OCR_RETRY_BACKOFF_SECONDS')
+    rate_limiter = _RateLimiter(_ocr_setting('OCR_REQUESTS_PER_MINUTE'))
+    max_resolution = _ocr_setting('OCR_MAX_RESOLUTION')
+    keep_archive = False
 
     try:
         # Check uncompressed size to prevent zip bombs
         with zipfile.ZipFile(zip_path, 'r') as zip_check:
             total_size = sum(info.file_size for info in zip_check.infolist())
             if total_size > OCR_MAX_UNCOMPRESSED_SIZE:
-                raise ValueError(
+                raise OCRArchiveRejected(
                     f'Uncompressed size too large ({total_size // (1024 * 1024)}MB). '
                     f'Maximum is {OCR_MAX_UNCOMPRESSED_SIZE // (1024 * 1024)}MB.'
                 )
 
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref, ThreadPoolExecutor(max_workers=concurrency) as executor:
             file_list = [
                 f
                 for f in zip_ref.namelist()
@@ -52,90 +226,109 @@ def run_ocr_zip_pipeline(task, zip_path):
             total_files = len(file_list)
 
             if total_files == 0:
-                raise ValueError('The zip file does not contain valid images.')
+                raise OCRArchiveRejected('The zip file does not contain valid images.')
 
-            for index, filename in enumerate(file_list):
-                # Path traversal protection: ensure filename doesn't escape directory
-                base_name = os.path.basename(filename)
-                # Only block actual path traversal attempts (../) not subdirectories
+            # Only block actual path traversal attempts (../) not subdirectories
+            for filename in file_list:
                 if '..' in filename:
-                    raise ValueError(f'Invalid filename (path traversal detected): {filename}')
+                    raise OCRArchiveRejected(f'Invalid filename (path traversal detected): {filename}')
+
+            in_flight = deque()
+            completed = sum(1 for filename in file_list if filename in member_results)
 
+            def collect_oldest():
+                nonlocal completed, first_error, first_ocr_error
+                filename, base_name, storage_filename, outcome = in_flight.popleft()
+                try:
+                    if isinstance(outcome, Exception):
+                        raise outcome
+                    extracted_text = outcome.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    if not isinstance(outcome, Exception):
+                        first_ocr_error = first_ocr_error or e
+                    failed_files.append(base_name)
+                    _remove_stored_image(storage_filename)
+                else:
+                    # 4. Store raw text without tokenization
+                    try:
+                        raw_text = add_raw_text(base_name, extracted_text, storage_filename)
+                        raw_text_ids[filename] = raw_text.id
+                        member_results[filename] = {
+                            'text_content': raw_text.text_content,
+                            'image_path': storage_filename,
+                        }
+                        _commit_result(task, raw_text_ids)
+                    except BaseException:
+                        _remove_stored_image(storage_filename)
+                        raise
+
+                completed += 1
                 if task is not None and hasattr(task, 'report_progress'):
                     task.report_progress(
-                        current=index + 1,
+                        current=completed,
                         total=total_files,
-                        status_message=f'Processando OCR: {base_name} ({index + 1}/{total_files})',
+                        status_message=f'Processando OCR: {base_name} ({completed}/{total_files})',
                     )
 
-                try:
-                    # 1. Read image from ZIP
-                    with zip_ref.open(filename) as file:
-                        image_bytes = file.read()
-
-                    # Validate magic bytes to ensure it's actually an image
-                    is_valid_image = False
-                    for magic in IMAGE_MAGIC_BYTES:
-                        if image_bytes.startswith(magic):
-                            is_valid_image = True
-                            break
-
-                    if not is_valid_image:
-                        raise ValueError(
-                            f'Invalid image file format (magic bytes check failed): {base_name}'
-                        )
-
-                    # 2. Convert/Optimize Image (e.g. to JPG)
-                    # Set PIL protection limits
-                    Image.MAX_IMAGE_PIXELS = OCR_MAX_IMAGE_PIXELS
+            try:
+                for filename in file_list:
+                    if filename in member_results:
+                        continue
 
-                    image = Image.open(io.BytesIO(image_bytes))
-
-                    # Check image dimensions before processing
-                    width, height = image.size
-                    if width > OCR_MAX_IMAGE_DIMENSION or height > OCR_MAX_IMAGE_DIMENSION:
-                        raise ValueError(
-                            f'Image dimensions too large ({width}x{height}) for {base_name}'
+                    base_name = os.path.basename(filename)
+                    storage_filename = None
+                    try:
+                        storage_filename, image = _prepare_image(zip_ref, filename, base_name, max_resolution)
+                        # 3. Perform OCR
+                        outcome = executor.submit(
+                            _perform_ocr_with_retries,
+                            image,
+                            rate_limiter,
+                            max_retries,
+                            backoff_seconds,
                         )
+                    except Exception as e:
+                        outcome = e
 
-                    # Ensure RGB
-                    if image.mode != 'RGB':
-                        image = image.convert('RGB')
-
-                    # Save to permanent storage
-                    # structure: images/<uuid>_<filename>.jpg
-                    clean_name = os.path.splitext(base_name)[0] + '.jpg'
-                    storage_filename = f"{uuid.uuid4()}_{clean_name}"
-                    storage_path = os.path.join(IMAGES_FOLDER, storage_filename)
+                    in_flight.append((filename, base_name, storage_filename, outcome))
+                    if len(in_flight) >= concurrency * 2:
+                        collect_oldest()
 
-                    image.save(storage_path, format='JPEG', quality=85)
+                while in_flight:
+                    collect_oldest()
+            except BaseException:
+                # The run is aborted: do not wait for (or pay for) the remaining OCR calls
+                _discard_in_flight(in_flight)
+                raise
 
-                    # 3. Perform OCR
-                    # Use the saved file path or the bytes. Service accepts path.
-                    extracted_text = ocr_service.perform_ocr(storage_path)
+        if not member_results:
+            if first_ocr_error is not None:
+                # Likely an outage or exhausted quota: worth another attempt
+                raise first_ocr_error
+            # Every image was rejected before OCR
+            raise OCRArchiveRejected(str(first_error))
 
-                    # 4. Store raw text without tokenization
-                    # Use only the base filename (last part after / or \\\)
-                    results[base_name] = {
-                        'text_content': extracted_text,
-                        'image_path': storage_filename,
-                    }
-                except Exception as e:
-                    pass
-                    raise
-
-            add_to_database(results)
-
-        return {
-            'status': 'Concluido',
-            'total': total_files,
-            'result': results,
-            'failed_files': [],
+        # Use only the base filename (last part after / or \\)
+        results = {
+            os.path.basename(filename): member_results[filename]
+            for filename in file_list
+            if filename in member_results
         }
 
+    except (zipfile.BadZipFile, OCRArchiveRejected) as e:
+        # Another attempt would fail too
+        raise RuntimeError(f'OCR Processing Error: {str(e)}') from e
     except Exception as e:
-        pass
+        keep_archive = True
         raise RuntimeError(f'OCR Processing Error: {str(e)}') from e
     finally:
-        if os.path.exists(zip_path):
+        if not keep_archive and os.path.exists(zip_path):
             os.remove(zip_path)
+
+    return {
+        'status': 'Concluido',
+        'total': total_files,
+        'result': results,
+        'failed_files': failed_files,
+    }
@@ -28,3 +28,17 @@ def add_to_database(results: dict):
     except Exception as e:
         db.session.rollback()
         raise e
+
+
+def add_raw_text(file_name: str, text_content: str, image_path: str) -> models.RawText:
+    """Adds one OCR result to the session and flushes it, without committing."""
+    from app.extensions import db
+
+    raw_text = models.RawText(
+        source_file_name=file_name,
+        text_content=format_text_content(text_content),
+        image_path=image_path,
+    )
+    db.session.add(raw_text)
+    db.session.flush()
+    return raw_text
@@ -0,0 +1,79 @@
+"""Background task logic for propagating a suggestion to every matching token."""
+
+from sqlalchemy import literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..background_jobs import create_background_job
+from ..database import models
+
+
+def enqueue_suggestion_propagation(session, *, user_id: int, token_text: str, suggestion: str) -> models.BackgroundJob:
+    """Queues a job linking *suggestion* to all tokens whose text is *token_text*.
+
+    The job is added to the caller's transaction and is not committed here.
+    """
+    return create_background_job(
+        session,
+        kind=models.BackgroundJobKind.SUGGESTION_PROPAGATION,
+        created_by_user_id=user_id,
+        payload_json={'token_text': token_text, 'suggestion': suggestion},
+        commit=False,
+    )
+
+
+def _dialect_insert(session):
+    return pg_insert if session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+
+def _get_or_create_suggestion_id(session, suggestion: str) -> int:
+    session.execute(
+        _dialect_insert(session)(models.Suggestion)
+        .values(token_text=suggestion)
+        .on_conflict_do_nothing(index_elements=['token_text'])
+    )
+    return session.execute(
+        select(models.Suggestion.id).where(models.Suggestion.token_text == suggestion)
+    ).scalar_one()
+
+
+def run_suggestion_propagation_pipeline(session, *, token_text: str, suggestion: str):
+    """Links *suggestion* to every token with *token_text* in one transaction.
+
+    Uses a single ``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` served by the
+    index on ``tokens.token_text``, and bumps the content version of the
+    affected texts with one set-based UPDATE.
+    """
+    suggestion_id = _get_or_create_suggestion_id(session, suggestion)
+
+    linked = session.execute(
+        _dialect_insert(session)(models.TokensSuggestions)
+        .from_select(
+            ['token_id', 'suggestion_id'],
+            select(models.Token.id, literal(suggestion_id)).where(models.Token.token_text == token_text),
+        )
+        .on_conflict_do_nothing(index_elements=['token_id', 'suggestion_id'])
+    ).rowcount
+
+    if linked:
+        session.execute(
+            update(models.Text)
+            .where(models.Text.id.in_(
+                select(models.Token.text_id).where(models.Token.token_text == token_text).distinct()
+            ))
+            .values(content_version=models.Text.content_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    session.commit()
+
+    return {
+        'status': 'Completed',
+        'total': linked,
+        'result': {
+            'kind': 'suggestion_propagation',
+            'token_text': token_text,
+            'suggestion': suggestion,
+            'linked_tokens': linked,
+        },
+    }
@@ -0,0 +1,34 @@
+"""Extraction of plain text from text-upload archive members.
+
+Kept free of Flask and database imports so it can run in the parse worker
+processes of ``run_text_upload_zip_pipeline`` without loading the app.
+"""
+
+import io
+import zipfile
+
+from docx import Document
+
+
+_worker_archive: zipfile.ZipFile | None = None
+
+
+def extract_member_text(zip_ref: zipfile.ZipFile, member_name: str) -> str:
+    """Returns the text of one ``.txt`` (UTF-8) or ``.docx`` archive member."""
+    with zip_ref.open(member_name) as file_handle:
+        if member_name.lower().endswith('.docx'):
+            doc = Document(io.BytesIO(file_handle.read()))
+            return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+
+        return file_handle.read().decode('utf-8', errors='replace')
+
+
+def open_worker_archive(zip_path: str) -> None:
+    """Process pool initializer: opens the archive once per worker process."""
+    global _worker_archive
+    _worker_archive = zipfile.ZipFile(zip_path, 'r')
+
+
+def extract_worker_member_text(member_name: str) -> str:
+    """Process pool task: extracts *member_name* from the worker's archive."""
+    return extract_member_text(_worker_archive, member_name)
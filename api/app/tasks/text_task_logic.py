@@ -3,6 +3,7 @@
 from ..database import models
 from ..text_pipeline import process_tokens
 from ..text_upload_batches import sync_text_upload_batch_state, utcnow
+from ..text_versions import bump_text_versions
 
 
 
@@ -69,6 +70,7 @@ def run_process_single_text_pipeline(task, text_id: int):
             db.session.query(models.TokensSuggestions).filter(
                 models.TokensSuggestions.token_id.in_(token_ids)
             ).delete(synchronize_session=False)
+            bump_text_versions(db.session, [text_id])
 
         for token in token_rows:
             token.to_be_normalized = False
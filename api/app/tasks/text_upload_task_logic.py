@@ -2,26 +2,46 @@
 
 import base64
 import binascii
-import io
+import hashlib
+import multiprocessing
 import os
+import uuid
 import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-from docx import Document
+from flask import current_app
+from werkzeug.utils import secure_filename
 
+from ..config import Config
 from ..database import models
+from ..storage import storage_folder
 from ..tasks.constants import (
     TEXT_UPLOAD_MAX_MEMBER_SIZE,
     TEXT_UPLOAD_MAX_UNCOMPRESSED_SIZE,
 )
+from .text_extraction import extract_member_text, extract_worker_member_text, open_worker_archive
 from ..text_upload_batches import (
     append_failed_files,
+    append_skipped_files,
     load_failed_files,
     sync_text_upload_batch_state,
     utcnow,
 )
 
 
-MAX_TEXT_UPLOAD_FILES = 200
+# 'import' always imports; 'skip' leaves out documents whose content is already
+# known; 'link' copies the processed tokens of the known text instead of
+# tokenizing and spell-checking the document again.
+DUPLICATE_POLICIES = ('import', 'skip', 'link')
+
+
+def _upload_setting(key: str):
+    try:
+        return current_app.config.get(key, getattr(Config, key))
+    except RuntimeError:
+        # No active Flask application context
+        return getattr(Config, key)
 
 
 def _collect_text_archive_members(zip_ref: zipfile.ZipFile) -> list[str]:
@@ -37,8 +57,9 @@ def _collect_text_archive_members(zip_ref: zipfile.ZipFile) -> list[str]:
     if len(file_list) == 0:
         raise ValueError('The zip file does not contain valid files.')
 
-    if len(file_list) > MAX_TEXT_UPLOAD_FILES:
-        raise ValueError(f'Maximum of {MAX_TEXT_UPLOAD_FILES} files allowed per upload.')
+    max_files = _upload_setting('TEXT_UPLOAD_MAX_FILES')
+    if len(file_list) > max_files:
+        raise ValueError(f'Maximum of {max_files} files allowed per upload.')
 
     return file_list
 
@@ -56,103 +77,355 @@ def _validate_text_archive_members(zip_ref: zipfile.ZipFile, file_list: list[str
             raise ValueError('The uploaded archive exceeds the maximum uncompressed size.')
 
 
-def _open_text_upload_archive(zip_path: str | None, zip_payload_b64: str | None) -> zipfile.ZipFile:
-    if zip_payload_b64 is not None:
-        try:
-            zip_bytes = base64.b64decode(zip_payload_b64)
-        except (binascii.Error, ValueError) as exc:
-            raise RuntimeError('Invalid or corrupted ZIP file.') from exc
-
-        return zipfile.ZipFile(io.BytesIO(zip_bytes), 'r')
-
+def _open_text_upload_archive(zip_path: str | None) -> zipfile.ZipFile:
     if zip_path is None:
         raise RuntimeError('No ZIP archive was provided.')
 
     return zipfile.ZipFile(zip_path, 'r')
 
 
+# Multiple of 4, so every slice of a base64 payload decodes on its own
+LEGACY_PAYLOAD_DECODE_CHUNK = 4 * 256 * 1024
+
+
+def spool_legacy_zip_payload(session, job: models.BackgroundJob) -> dict:
+    """Moves the ``zip_payload_b64`` of a job queued by older releases to a file.
+
+    The archive is decoded slice by slice into the spool folder and the job
+    payload is rewritten to reference it through ``zip_path``, like jobs queued
+    by current releases (commits). Returns the new payload.
+
+    Raises:
+        RuntimeError: the payload is not valid base64; the job's batch is
+            marked FAILED.
+    """
+    payload = dict(job.payload_json or {})
+    zip_payload_b64 = payload.pop('zip_payload_b64')
+    original_filename = payload.get('original_filename') or 'upload.zip'
+    zip_path = os.path.join(storage_folder('TEMP_UPLOADS_FOLDER'), f'{uuid.uuid4()}_{secure_filename(original_filename)}')
+
+    try:
+        with open(zip_path, 'wb') as archive:
+            for start in range(0, len(zip_payload_b64), LEGACY_PAYLOAD_DECODE_CHUNK):
+                archive.write(base64.b64decode(
+                    zip_payload_b64[start:start + LEGACY_PAYLOAD_DECODE_CHUNK],
+                    validate=True,
+                ))
+    except (binascii.Error, ValueError) as exc:
+        os.remove(zip_path)
+        batch_id = payload.get('batch_id')
+        batch = session.get(models.TextUploadBatch, batch_id) if batch_id is not None else None
+        if batch is not None:
+            batch.status = models.TextUploadBatchStatus.FAILED
+            batch.last_error = 'Invalid or corrupted ZIP file.'
+            session.commit()
+        raise RuntimeError('Invalid or corrupted ZIP file.') from exc
+
+    payload['zip_path'] = zip_path
+    job.payload_json = payload
+    session.commit()
+    return payload
+
+
+def migrate_legacy_text_upload_jobs(session) -> int:
+    """Spools the base64 archives of queued TEXT_UPLOAD_IMPORT jobs to files.
+
+    Jobs whose payload cannot be decoded are marked as failed. Returns how
+    many jobs were migrated.
+    """
+    from ..background_jobs import mark_background_job_failure
+
+    job_ids = [
+        job_id
+        for (job_id,) in session.query(models.BackgroundJob.id).filter(
+            models.BackgroundJob.kind == models.BackgroundJobKind.TEXT_UPLOAD_IMPORT,
+            models.BackgroundJob.state == models.BackgroundJobState.PENDING,
+        )
+    ]
+    migrated = 0
+    # One job at a time, so a single payload is held in memory
+    for job_id in job_ids:
+        job = session.get(models.BackgroundJob, job_id)
+        if job is None or 'zip_payload_b64' not in (job.payload_json or {}):
+            continue
+        try:
+            spool_legacy_zip_payload(session, job)
+            migrated += 1
+        except RuntimeError as exc:
+            mark_background_job_failure(session, job, error_message=str(exc))
+        session.expunge(job)
+
+    return migrated
+
+
+def _iter_member_texts(zip_ref: zipfile.ZipFile, zip_path: str | None, file_list: list[str], parse_workers: int):
+    """Yields ``(member_name, text or exception)`` for *file_list*, in archive order.
+
+    With *parse_workers* > 0 and an on-disk archive, members are read and
+    parsed in a pool of worker processes (each opening the archive once), with
+    at most twice the pool size of members in flight. Otherwise they are
+    parsed one by one in the calling process.
+    """
+    if parse_workers <= 0 or zip_path is None:
+        for member_name in file_list:
+            try:
+                yield member_name, extract_member_text(zip_ref, member_name)
+            except Exception as exc:
+                yield member_name, exc
+        return
+
+    # spawn: the job worker holds DB connections and threads that must not be forked
+    with ProcessPoolExecutor(
+        max_workers=parse_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=open_worker_archive,
+        initargs=(zip_path,),
+    ) as executor:
+        in_flight = deque()
+
+        def collect_oldest():
+            member_name, future = in_flight.popleft()
+            try:
+                return member_name, future.result()
+            except Exception as exc:
+                return member_name, exc
+
+        for member_name in file_list:
+            in_flight.append((member_name, executor.submit(extract_worker_member_text, member_name)))
+            if len(in_flight) >= parse_workers * 2:
+                yield collect_oldest()
+
+        while in_flight:
+            yield collect_oldest()
+
+
+def _build_text(batch_id: int, base_name: str, content_sha256: str, tokenized_tokens) -> tuple[models.Text, list]:
+    text_obj = models.Text(
+        source_file_name=base_name,
+        upload_batch_id=batch_id,
+        content_sha256=content_sha256,
+    )
+
+    tokenized_data = {token.idx: token for token in tokenized_tokens}
+    tokens_with_candidates = []
+    for position, token_data in tokenized_data.items():
+        token = models.Token(
+            token_text=token_data.text,
+            is_word=token_data.is_word,
+            position=int(position),
+            to_be_normalized=False,
+            whitespace_after=token_data.whitespace_after,
+        )
+        tokens_with_candidates.append((token, []))
+
+    return text_obj, tokens_with_candidates
+
+
+def _insert_parsed_texts(session, batch_id: int, parsed: list[tuple[str, str, list]]) -> tuple[list[int], list[str]]:
+    """Flushes a chunk of tokenized members, returning the new text ids and the failed file names.
+
+    The chunk is inserted at once in a savepoint; if that fails, its members
+    are retried one by one so a single bad file does not fail its neighbours.
+    Nothing is committed here.
+    """
+    from app.database.queries import add_texts_batch
+
+    try:
+        with session.begin_nested():
+            return add_texts_batch(
+                [_build_text(batch_id, *parsed_text) for parsed_text in parsed],
+                session,
+                commit=False,
+            ), []
+    except Exception:
+        pass
+
+    text_ids: list[int] = []
+    failed_files: list[str] = []
+    for base_name, content_sha256, tokens in parsed:
+        try:
+            with session.begin_nested():
+                text_ids.extend(add_texts_batch(
+                    [_build_text(batch_id, base_name, content_sha256, tokens)],
+                    session,
+                    commit=False,
+                ))
+        except Exception:
+            failed_files.append(base_name)
+
+    return text_ids, failed_files
+
+
+def _find_known_text(session, content_sha256: str, ready_only: bool):
+    """Returns the oldest existing text with this content hash, or ``None``.
+
+    Failed texts are ignored; with *ready_only*, so are texts not processed yet.
+    """
+    query = session.query(models.Text.id, models.Text.grade).filter(models.Text.content_sha256 == content_sha256)
+    if ready_only:
+        query = query.filter(models.Text.processing_status == models.ProcessingStatus.READY)
+    else:
+        query = query.filter(models.Text.processing_status != models.ProcessingStatus.FAILED)
+    return query.order_by(models.Text.id).first()
+
+
+def _load_imported_text_ids(session, batch_id: int) -> list[int]:
+    return [
+        text_id
+        for (text_id,) in session.query(models.Text.id)
+        .filter(models.Text.upload_batch_id == batch_id)
+        .order_by(models.Text.id)
+    ]
+
+
 def run_text_upload_zip_pipeline(
     task,
     batch_id: int | None = None,
     zip_path: str | None = None,
-    zip_payload_b64: str | None = None,
     original_filename: str | None = None,
+    duplicate_policy: str = 'import',
+    checkpoint: dict | None = None,
 ):
+    """Imports the ``.txt``/``.docx`` members of an uploaded archive as PENDING texts.
+
+    Members are read and parsed (python-docx for ``.docx``) in a pool of
+    TEXT_UPLOAD_PARSE_WORKERS processes, while this process tokenizes the
+    results in archive order. Only one chunk of TEXT_UPLOAD_INSERT_BATCH_SIZE
+    members is held at a time: each chunk is inserted and committed in one
+    transaction together with a checkpoint (``members_done``, saved through
+    ``task.save_checkpoint``) and the batch's failed/skipped files, and
+    progress is reported once per chunk. Passing that *checkpoint* back
+    resumes after the last committed chunk. Members that cannot be parsed or
+    inserted are listed in ``failed_files``; archives may hold up to
+    TEXT_UPLOAD_MAX_FILES members.
+
+    Each text stores the SHA-256 of its content. With *duplicate_policy*
+    ``'skip'``, members whose content matches an existing text (or an earlier
+    member) are listed in ``skipped_files`` instead of being imported; with
+    ``'link'``, members matching a READY text are created READY from a copy of
+    its tokens and suggestions.
+
+    The ZIP is kept when the import fails for an unexpected (possibly
+    transient) error, so the job can be retried; it is removed otherwise.
+    """
+    from app.database.queries import copy_text_tokens
     from app.extensions import db
     from app.text_pipeline import get_tokenizer
-    from app.database.queries import add_text
 
-    text_ids: list[int] = []
-    ingestion_failed_files: list[str] = []
+    if duplicate_policy not in DUPLICATE_POLICIES:
+        raise RuntimeError(f'Unsupported duplicate policy: {duplicate_policy}')
+
+    checkpoint = checkpoint or {}
+    members_done = int(checkpoint.get('members_done', 0))
+    linked_count = int(checkpoint.get('linked', 0))
+    seen_hashes: set[str] = set()
+    keep_archive = False
     batch = db.session.get(models.TextUploadBatch, batch_id) if batch_id is not None else None
 
     try:
         if batch is None:
             raise RuntimeError('Text upload batch not found.')
 
-        with _open_text_upload_archive(zip_path, zip_payload_b64) as zip_ref:
+        # Texts of chunks committed by an earlier attempt
+        text_ids = _load_imported_text_ids(db.session, batch.id) if members_done else []
+
+        with _open_text_upload_archive(zip_path) as zip_ref:
             file_list = _collect_text_archive_members(zip_ref)
             _validate_text_archive_members(zip_ref, file_list)
             total_files = len(file_list)
             tokenizer = get_tokenizer()
+            remaining_members = file_list[members_done:]
+            parse_workers = min(max(0, _upload_setting('TEXT_UPLOAD_PARSE_WORKERS')), len(remaining_members))
+            insert_batch_size = max(1, _upload_setting('TEXT_UPLOAD_INSERT_BATCH_SIZE'))
             batch.total_files = total_files
             batch.status = models.TextUploadBatchStatus.IMPORTING
             db.session.commit()
 
+            parsed: list[tuple[str, str, list]] = []
+            chunk_failed_files: list[str] = []
+            chunk_skipped_files: list[str] = []
+            any_skipped = bool(load_failed_files(batch.skipped_files))
+
+            def flush_parsed():
+                inserted_ids, failed_files = _insert_parsed_texts(db.session, batch.id, parsed)
+                text_ids.extend(inserted_ids)
+                chunk_failed_files.extend(failed_files)
+                parsed.clear()
+
+            def commit_chunk(members_done: int):
+                if parsed:
+                    flush_parsed()
+                append_failed_files(batch, chunk_failed_files)
+                append_skipped_files(batch, chunk_skipped_files)
+                chunk_failed_files.clear()
+                chunk_skipped_files.clear()
+                # The reporter commits the chunk together with the checkpoint
+                if task is not None and hasattr(task, 'save_checkpoint'):
+                    task.save_checkpoint({'members_done': members_done, 'linked': linked_count})
+                db.session.commit()
 
-            for index, member_name in enumerate(file_list):
-                base_name = os.path.basename(member_name)
                 if task is not None and hasattr(task, 'report_progress'):
                     task.report_progress(
-                        current=index + 1,
+                        current=members_done,
                         total=total_files,
-                        status_message=f'Importando arquivo {index + 1}/{total_files}',
+                        status_message=f'Importando arquivo {members_done}/{total_files}',
                     )
 
+            member_texts = _iter_member_texts(zip_ref, zip_path, remaining_members, parse_workers)
+            for index, (member_name, text_content) in enumerate(member_texts, start=members_done):
+                base_name = os.path.basename(member_name)
+
                 try:
-                    with zip_ref.open(member_name) as file_handle:
-                        if member_name.lower().endswith('.docx'):
-                            doc = Document(io.BytesIO(file_handle.read()))
-                            text_content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-                        else:
-                            text_content = file_handle.read().decode('utf-8', errors='replace')
-
-                    tokenized_tokens = tokenizer.tokenize(text_content)
-                    tokenized_data = {token.idx: token for token in tokenized_tokens}
-                    text_obj = models.Text(
-                        source_file_name=base_name,
-                        upload_batch_id=batch.id,
+                    if isinstance(text_content, Exception):
+                        raise text_content
+                    content_sha256 = hashlib.sha256(text_content.encode('utf-8')).hexdigest()
+
+                    if duplicate_policy == 'skip' and (
+                        content_sha256 in seen_hashes
+                        or _find_known_text(db.session, content_sha256, ready_only=False) is not None
+                    ):
+                        chunk_skipped_files.append(base_name)
+                        any_skipped = True
+                        continue
+
+                    known_text = (
+                        _find_known_text(db.session, content_sha256, ready_only=True)
+                        if duplicate_policy == 'link'
+                        else None
                     )
-
-                    tokens_with_candidates = []
-                    for position, token_data in tokenized_data.items():
-                        token = models.Token(
-                            token_text=token_data.text,
-                            is_word=token_data.is_word,
-                            position=int(position),
-                            to_be_normalized=False,
-                            whitespace_after=token_data.whitespace_after,
+                    if known_text is not None:
+                        # Keep text ids in archive order
+                        if parsed:
+                            flush_parsed()
+                        text_obj = models.Text(
+                            source_file_name=base_name,
+                            upload_batch_id=batch.id,
+                            grade=known_text.grade,
+                            content_sha256=content_sha256,
+                            processing_status=models.ProcessingStatus.READY,
                         )
-                        tokens_with_candidates.append((token, []))
-
-                    text_id = add_text(text_obj, tokens_with_candidates, db.session)
-                    if text_obj.id is None:
-                        text_obj.id = text_id
-                    text_ids.append(text_id)
-
-                except Exception as exc:
-                    db.session.rollback()
-                    ingestion_failed_files.append(base_name)
-
-            if not text_ids:
+                        with db.session.begin_nested():
+                            text_ids.append(copy_text_tokens(known_text.id, text_obj, db.session, commit=False))
+                        linked_count += 1
+                        continue
+
+                    seen_hashes.add(content_sha256)
+                    parsed.append((base_name, content_sha256, tokenizer.tokenize(text_content)))
+                except Exception:
+                    chunk_failed_files.append(base_name)
+                finally:
+                    if (index + 1) % insert_batch_size == 0 or index + 1 == total_files:
+                        commit_chunk(index + 1)
+
+            if members_done == total_files and not remaining_members:
+                commit_chunk(total_files)
+
+            if not text_ids and not any_skipped:
                 batch.status = models.TextUploadBatchStatus.FAILED
                 batch.last_error = 'No files could be imported from the uploaded archive.'
-                append_failed_files(batch, ingestion_failed_files)
                 db.session.commit()
                 raise RuntimeError('No files could be imported from the uploaded archive.')
 
-            failed_files = list(dict.fromkeys(ingestion_failed_files))
-            append_failed_files(batch, failed_files)
             batch.import_finished_at = utcnow()
             batch.status = models.TextUploadBatchStatus.QUEUED
             batch.last_error = None
@@ -160,7 +433,6 @@ def run_text_upload_zip_pipeline(
 
             batch = sync_text_upload_batch_state(db.session, batch.id)
 
-
             return {
                 'status': 'Completed',
                 'total': total_files,
@@ -169,7 +441,9 @@ def run_text_upload_zip_pipeline(
                     'batch_id': batch.id,
                     'text_ids': text_ids,
                     'created': len(text_ids),
+                    'linked': linked_count,
                     'failed_files': load_failed_files(batch.failed_files),
+                    'skipped_files': load_failed_files(batch.skipped_files),
                 },
                 'failed_files': load_failed_files(batch.failed_files),
             }
@@ -189,11 +463,13 @@ def run_text_upload_zip_pipeline(
     except RuntimeError:
         raise
     except Exception as exc:
+        keep_archive = True
+        db.session.rollback()
         if batch is not None:
             batch.status = models.TextUploadBatchStatus.FAILED
             batch.last_error = str(exc)
             db.session.commit()
         raise
     finally:
-        if zip_path and os.path.exists(zip_path):
+        if not keep_archive and zip_path and os.path.exists(zip_path):
             os.remove(zip_path)
@@ -0,0 +1,137 @@
+"""Maintenance of the precomputed text listing summaries.
+
+``text_listing_summaries`` holds one row per text with everything the texts
+listing needs (metadata, assigned usernames, normalization state). Rows are
+refreshed incrementally from an ``after_flush`` hook whenever a text's listed
+attributes or one of its ``textsusers`` rows change, so the listing never has
+to aggregate assignments at read time.
+"""
+
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from .database import models
+
+
+SUMMARY_TEXT_ATTRIBUTES = ('grade', 'source_file_name', 'processing_status')
+REFRESH_CHUNK_SIZE = 500
+
+
+def _chunked(values: list[int], size: int = REFRESH_CHUNK_SIZE) -> Iterable[list[int]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def refresh_text_listing_summaries(connection, text_ids: Iterable[int]) -> None:
+    """Recompute the summary rows of *text_ids* from texts, textsusers and users.
+
+    Args:
+        connection: A SQLAlchemy Connection or Session. Runs inside the caller's
+            transaction and does not commit.
+        text_ids: IDs of the texts to refresh. Summaries of deleted texts are removed.
+    """
+    ids = sorted({text_id for text_id in text_ids if text_id is not None})
+
+    for chunk in _chunked(ids):
+        text_rows = connection.execute(
+            select(
+                models.Text.id,
+                models.Text.grade,
+                models.Text.source_file_name,
+                models.Text.processing_status,
+            ).where(models.Text.id.in_(chunk))
+        ).all()
+
+        association_rows = connection.execute(
+            select(
+                models.TextsUsers.text_id,
+                models.TextsUsers.assigned,
+                models.TextsUsers.normalized,
+                models.User.username,
+            )
+            .join(models.User, models.User.id == models.TextsUsers.user_id)
+            .where(models.TextsUsers.text_id.in_(chunk))
+        ).all()
+
+        assigned_usernames: dict[int, list[str]] = {}
+        normalized_by_any: set[int] = set()
+        for row in association_rows:
+            if row.assigned:
+                assigned_usernames.setdefault(row.text_id, []).append(row.username)
+            if row.normalized:
+                normalized_by_any.add(row.text_id)
+
+        connection.execute(
+            delete(models.TextListingSummary).where(models.TextListingSummary.text_id.in_(chunk))
+        )
+
+        if text_rows:
+            connection.execute(
+                insert(models.TextListingSummary),
+                [
+                    {
+                        'text_id': row.id,
+                        'grade': row.grade,
+                        'source_file_name': row.source_file_name,
+                        'processing_status': row.processing_status or models.ProcessingStatus.PENDING,
+                        'assigned_usernames': sorted(assigned_usernames.get(row.id, [])),
+                        'normalized_by_any': row.id in normalized_by_any,
+                    }
+                    for row in text_rows
+                ],
+            )
+
+
+def backfill_text_listing_summaries(session) -> int:
+    """Create summaries for texts that do not have one yet (e.g. texts created
+    before the summary table existed; upgrade_database_schema creates the table).
+    Commits and returns the number of rows created."""
+    missing_ids = session.execute(
+        select(models.Text.id)
+        .outerjoin(models.TextListingSummary, models.TextListingSummary.text_id == models.Text.id)
+        .where(models.TextListingSummary.text_id.is_(None))
+    ).scalars().all()
+
+    if missing_ids:
+        refresh_text_listing_summaries(session, missing_ids)
+        session.commit()
+
+    return len(missing_ids)
+
+
+def _text_listing_changed(state) -> bool:
+    return any(state.attrs[name].history.has_changes() for name in SUMMARY_TEXT_ATTRIBUTES)
+
+
+def _collect_affected_text_ids(session) -> set[int]:
+    text_ids: set[int] = set()
+
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, (models.Text, models.TextsUsers)):
+            text_ids.add(obj.id if isinstance(obj, models.Text) else obj.text_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, models.Text):
+            if _text_listing_changed(inspect(obj)):
+                text_ids.add(obj.id)
+        elif isinstance(obj, models.TextsUsers):
+            state = inspect(obj)
+            if state.attrs.assigned.history.has_changes() or state.attrs.normalized.history.has_changes():
+                text_ids.add(obj.text_id)
+
+    return text_ids
+
+
+def _refresh_summaries_after_flush(session, _flush_context) -> None:
+    text_ids = _collect_affected_text_ids(session)
+    if text_ids:
+        refresh_text_listing_summaries(session.connection(), text_ids)
+
+
+def register_text_listing_summary_listeners() -> None:
+    """Install the after_flush hook that keeps summaries in sync (idempotent)."""
+    if not event.contains(Session, 'after_flush', _refresh_summaries_after_flush):
+        event.listen(Session, 'after_flush', _refresh_summaries_after_flush)
@@ -45,6 +45,13 @@ def append_failed_files(batch: models.TextUploadBatch, values: Iterable[str]) ->
     batch.failed_files = dump_failed_files(merged)
 
 
+def append_skipped_files(batch: models.TextUploadBatch, values: Iterable[str]) -> None:
+    """Append filenames skipped as duplicates to a batch's JSON record."""
+    merged = load_failed_files(batch.skipped_files)
+    merged.extend(v for v in values if v)
+    batch.skipped_files = dump_failed_files(merged)
+
+
 def is_batch_recovering(
     batch: models.TextUploadBatch, texts: list[models.Text] | None = None
 ) -> bool:
@@ -121,7 +128,7 @@ def sync_text_upload_batch_state(
     elif pending_count > 0:
         batch.status = models.TextUploadBatchStatus.QUEUED
         batch.processing_finished_at = None
-    elif created_count == 0:
+    elif created_count == 0 and not load_failed_files(batch.skipped_files):
         batch.status = models.TextUploadBatchStatus.FAILED
         if batch.processing_finished_at is None:
             batch.processing_finished_at = now
@@ -167,6 +174,7 @@ def serialize_text_upload_batch(
         "processed_texts": batch.processed_texts,
         "failed_texts": batch.failed_texts,
         "failed_files": load_failed_files(batch.failed_files),
+        "skipped_files": load_failed_files(batch.skipped_files),
         "created_at": batch.created_at,
         "updated_at": batch.updated_at,
         "import_finished_at": batch.import_finished_at,
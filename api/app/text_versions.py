@@ -0,0 +1,103 @@
+"""Per-text content version stamps.
+
+``texts.content_version`` is incremented whenever anything shown by the text
+detail or normalizations endpoints changes: the text's listed attributes, its
+tokens (including the whitelist flag), token suggestions, normalizations or
+``textsusers`` rows. The routes expose it as an ETag so clients can revalidate
+with ``If-None-Match`` instead of downloading the text again.
+
+ORM changes are picked up by an ``after_flush`` hook. Bulk statements that
+bypass the ORM must call :func:`bump_text_versions` themselves.
+"""
+
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .database import models
+
+
+VERSIONED_TEXT_ATTRIBUTES = ('grade', 'source_file_name', 'processing_status')
+BUMP_CHUNK_SIZE = 500
+_BUMPED_KEY = 'text_versions_bumped'
+
+
+def bump_text_versions(connection, text_ids: Iterable[int]) -> None:
+    """Increment ``content_version`` of *text_ids*.
+
+    Args:
+        connection: A SQLAlchemy Connection or Session. Runs inside the caller's
+            transaction and does not commit.
+        text_ids: IDs of the changed texts. Unknown IDs are ignored.
+    """
+    ids = sorted({text_id for text_id in text_ids if text_id is not None})
+
+    for start in range(0, len(ids), BUMP_CHUNK_SIZE):
+        connection.execute(
+            update(models.Text)
+            .where(models.Text.id.in_(ids[start:start + BUMP_CHUNK_SIZE]))
+            .values(content_version=models.Text.content_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _collect_changed_text_ids(session) -> set[int]:
+    text_ids: set[int] = set()
+    token_ids: set[int] = set()
+
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, (models.Token, models.Normalization, models.TextsUsers)):
+            text_ids.add(obj.text_id)
+        elif isinstance(obj, models.TokensSuggestions):
+            token_ids.add(obj.token_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, models.Text):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in VERSIONED_TEXT_ATTRIBUTES):
+                text_ids.add(obj.id)
+        elif isinstance(obj, (models.Token, models.Normalization, models.TextsUsers)):
+            if session.is_modified(obj, include_collections=False):
+                text_ids.add(obj.text_id)
+        elif isinstance(obj, models.TokensSuggestions):
+            token_ids.add(obj.token_id)
+
+    if token_ids:
+        text_ids.update(
+            session.connection().execute(
+                select(models.Token.text_id).where(models.Token.id.in_(token_ids)).distinct()
+            ).scalars()
+        )
+
+    return text_ids
+
+
+def _bump_versions_after_flush(session, _flush_context) -> None:
+    # Changes only become visible at commit, so one bump per text and
+    # transaction is enough even when the transaction flushes many times.
+    # Texts created in this transaction keep their initial version.
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    bumped.update(obj.id for obj in session.new if isinstance(obj, models.Text))
+
+    text_ids = _collect_changed_text_ids(session) - bumped
+    if text_ids:
+        bump_text_versions(session.connection(), text_ids)
+        bumped.update(text_ids)
+
+
+def _reset_bumped_texts(session, *_args) -> None:
+    session.info.pop(_BUMPED_KEY, None)
+
+
+def register_text_version_listeners() -> None:
+    """Install the session hooks that maintain ``content_version`` (idempotent)."""
+    hooks = (
+        ('after_flush', _bump_versions_after_flush),
+        ('after_commit', _reset_bumped_texts),
+        ('after_rollback', _reset_bumped_texts),
+    )
+    for name, fn in hooks:
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
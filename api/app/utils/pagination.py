@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """Encode keyset values into an opaque, URL-safe cursor string."""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError('Invalid cursor.') from exc
+
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor.')
+
+    return values
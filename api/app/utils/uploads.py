@@ -0,0 +1,132 @@
+"""Streaming reception of file uploads straight to the spool directory."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass, field
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
+
+
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised when an upload cannot be accepted.
+
+    ``reason`` is ``'missing'`` (no file part), ``'invalid_type'`` (wrong
+    extension) or ``'too_large'`` (over the size limit).
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@dataclass
+class ReceivedUpload:
+    filename: str  # unique name of the stored file, within the spool folder
+    path: str
+    size: int
+    sha256: str
+    form: MultiDict = field(default_factory=MultiDict)  # the other (non-file) form fields
+
+
+class _HashingSpoolFile:
+    """Write target for one uploaded file: writes to disk, hashes, and enforces *max_size*."""
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._file = open(path, 'wb')
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadRejected('too_large')
+        self._hasher.update(data)
+        return self._file.write(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        # Werkzeug rewinds the stream once the part is complete
+        self._file.flush()
+        return self._file.tell()
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def receive_file_upload(
+    environ,
+    *,
+    folder: str,
+    max_size: int,
+    field_name: str = 'file',
+    extension: str = '.zip',
+    prefix: str = '',
+) -> ReceivedUpload:
+    """Streams the *field_name* file of a multipart request into *folder*.
+
+    The request body is parsed with Werkzeug's form parser and the file is
+    written to disk in chunks as it arrives, so it is never buffered whole in
+    memory or copied to a second temporary file. The SHA-256 of the content is
+    computed on the fly. Reading stops as soon as the declared
+    ``Content-Length`` or the bytes received exceed *max_size*.
+
+    Raises:
+        UploadRejected: the file part is missing, its name does not end with
+            *extension*, or it exceeds *max_size*. Partial files are removed.
+    """
+    content_length = environ.get('CONTENT_LENGTH')
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadRejected('too_large')
+
+    spool_files: list[_HashingSpoolFile] = []
+    client_filenames: dict[int, str] = {}
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if not filename or not filename.endswith(extension):
+            raise UploadRejected('invalid_type')
+        spool_file = _HashingSpoolFile(os.path.join(folder, f'{uuid.uuid4()}.part'), max_size)
+        spool_files.append(spool_file)
+        client_filenames[id(spool_file)] = filename
+        return spool_file
+
+    try:
+        try:
+            _, form, files = parse_form_data(environ, stream_factory=stream_factory)
+        finally:
+            for spool_file in spool_files:
+                spool_file.close()
+
+        file_storage = files.get(field_name)
+        if file_storage is None:
+            raise UploadRejected('missing')
+
+        received = file_storage.stream
+        unique_name = f"{prefix}{uuid.uuid4()}_{secure_filename(client_filenames[id(received)])}"
+        path = os.path.join(folder, unique_name)
+        os.replace(received.path, path)
+        spool_files.remove(received)
+        return ReceivedUpload(
+            filename=unique_name,
+            path=path,
+            size=received.size,
+            sha256=received.hexdigest(),
+            form=form,
+        )
+    finally:
+        # Other file parts and partial uploads are not kept
+        for spool_file in spool_files:
+            if os.path.exists(spool_file.path):
+                os.remove(spool_file.path)
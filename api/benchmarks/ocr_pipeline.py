@@ -0,0 +1,76 @@
+"""Benchmark of the OCR archive pipeline with a simulated OCR backend.
+
+Builds a ZIP of 40 small scans and runs ``run_ocr_zip_pipeline`` against
+``StubOCRBackend`` (200 ms per call, no network) with one OCR thread and with
+the configured ``OCR_CONCURRENCY``.
+
+Run from the ``api`` directory:
+
+    SECRET_KEY=dev python -m benchmarks.ocr_pipeline
+
+Uses an in-memory SQLite database unless ``DATABASE_URL`` is set (the
+benchmark removes the raw texts and images it creates).
+"""
+
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from PIL import Image, ImageDraw
+
+from app.app import create_app
+from app.database.models import Base, RawText
+from app.extensions import db
+from app.services import ocr_service
+from app.tasks.constants import IMAGES_FOLDER
+from app.tasks.ocr_task_logic import run_ocr_zip_pipeline
+
+IMAGE_COUNT = 40
+OCR_LATENCY_SECONDS = 0.2
+
+
+def build_archive(path: str) -> None:
+    with zipfile.ZipFile(path, 'w') as archive:
+        for index in range(IMAGE_COUNT):
+            image = Image.new('RGB', (1240, 1754), 'white')
+            ImageDraw.Draw(image).text((100, 100), f'Página {index}', fill='black')
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            archive.writestr(f'scan_{index:03}.png', buffer.getvalue())
+
+
+def run(app, concurrency: int) -> float:
+    app.config.update(OCR_CONCURRENCY=concurrency, OCR_REQUESTS_PER_MINUTE=0)
+    with tempfile.TemporaryDirectory() as directory:
+        zip_path = os.path.join(directory, 'scans.zip')
+        build_archive(zip_path)
+
+        start_time = time.perf_counter()
+        run_ocr_zip_pipeline(None, zip_path)
+        elapsed = time.perf_counter() - start_time
+
+    for raw_text in db.session.query(RawText).all():
+        image_path = os.path.join(IMAGES_FOLDER, raw_text.image_path)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+        db.session.delete(raw_text)
+    db.session.commit()
+    return elapsed
+
+
+if __name__ == '__main__':
+    app = create_app()
+    ocr_service.set_ocr_client(
+        ocr_service.OCRClient(ocr_service.StubOCRBackend(latency_seconds=OCR_LATENCY_SECONDS))
+    )
+
+    with app.app_context():
+        Base.metadata.create_all(bind=db.engine)
+
+        print(f"{IMAGE_COUNT} images, {OCR_LATENCY_SECONDS * 1000:.0f} ms simulated OCR latency")
+        for concurrency in (1, app.config['OCR_CONCURRENCY']):
+            print(f"OCR_CONCURRENCY={concurrency:<3} {run(app, concurrency):8.2f} s")
@@ -0,0 +1,141 @@
+"""Benchmark of the text detail query path.
+
+Seeds one text with 5,000 tokens, flags every 4th token and links 7
+suggestions to each flagged token, then compares:
+
+* the previous ORM path (``joinedload(Text.tokens).joinedload(Token.suggestions)``),
+* ``queries.get_text_by_id`` (Core query with aggregated suggestions),
+* the full ``GET /api/texts/<id>`` streamed response.
+
+Run from the ``api`` directory:
+
+    SECRET_KEY=dev python -m benchmarks.text_detail
+
+Uses an in-memory SQLite database unless ``DATABASE_URL`` is set (the
+benchmark creates its tables there and removes its rows afterwards).
+"""
+
+import os
+import statistics
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('RATELIMIT_ENABLED', 'False')
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm import joinedload
+
+from app.app import create_app
+from app.database import queries
+from app.database.models import Base, Suggestion, Text, Token, TokensSuggestions, User
+from app.extensions import db
+
+TOKEN_COUNT = 5000
+FLAG_EVERY = 4
+SUGGESTIONS_PER_FLAGGED_TOKEN = 7
+ROUNDS = 10
+
+
+def legacy_get_text_by_id(session, text_id):
+    text_info = (
+        session.query(Text)
+        .filter(Text.id == text_id)
+        .options(joinedload(Text.tokens).joinedload(Token.suggestions))
+        .first()
+    )
+    return [
+        {
+            "id": token.id,
+            "text": token.token_text,
+            "candidates": [s.token_text for s in token.suggestions],
+        }
+        for token in text_info.tokens
+    ]
+
+
+def seed_text(session) -> int:
+    text = Text(source_file_name='benchmark_text.txt', grade=1)
+    session.add(text)
+    session.flush()
+
+    session.bulk_insert_mappings(Token, [
+        {
+            'text_id': text.id,
+            'token_text': f'palavra{position}',
+            'is_word': True,
+            'position': position,
+            'to_be_normalized': position % FLAG_EVERY == 0,
+            'whitespace_after': ' ',
+            'whitelisted': False,
+        }
+        for position in range(TOKEN_COUNT)
+    ])
+    session.bulk_insert_mappings(Suggestion, [
+        {'token_text': f'benchmark_sugestao{i}'} for i in range(SUGGESTIONS_PER_FLAGGED_TOKEN)
+    ])
+
+    suggestion_ids = [
+        row.id for row in session.query(Suggestion.id).filter(Suggestion.token_text.like('benchmark_sugestao%'))
+    ]
+    flagged_ids = [
+        row.id for row in session.query(Token.id).filter(Token.text_id == text.id, Token.to_be_normalized.is_(True))
+    ]
+    session.bulk_insert_mappings(TokensSuggestions, [
+        {'token_id': token_id, 'suggestion_id': suggestion_id}
+        for token_id in flagged_ids
+        for suggestion_id in suggestion_ids
+    ])
+    session.commit()
+    return text.id
+
+
+def time_it(label, fn):
+    fn()  # warm-up
+    samples = []
+    for _ in range(ROUNDS):
+        start_time = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    print(f"{label:<32} median {statistics.median(samples):8.2f} ms   min {min(samples):8.2f} ms")
+
+
+if __name__ == '__main__':
+    app = create_app()
+    app.config.update(RATELIMIT_ENABLED=False, JWT_COOKIE_CSRF_PROTECT=False)
+
+    with app.app_context():
+        Base.metadata.create_all(bind=db.engine)
+        session = db.session
+
+        user = User(username='benchmark_user')
+        user.set_password('benchmark')
+        session.add(user)
+        session.commit()
+        text_id = seed_text(session)
+        user_id = user.id
+
+        client = app.test_client()
+        client.set_cookie('access_token_cookie', create_access_token(identity=str(user_id)))
+
+        print(f"{TOKEN_COUNT} tokens, {SUGGESTIONS_PER_FLAGGED_TOKEN} suggestions per flagged token "
+              f"(1 in {FLAG_EVERY} flagged), {ROUNDS} rounds")
+
+        def run_legacy():
+            legacy_get_text_by_id(session, text_id)
+            session.expunge_all()
+
+        def run_route():
+            response = client.get(f'/api/texts/{text_id}')
+            assert response.status_code == 200, response.status_code
+            response.get_data()
+
+        time_it('ORM joinedload (previous)', run_legacy)
+        time_it('Core get_text_by_id', lambda: queries.get_text_by_id(session, text_id, user_id))
+        time_it('GET /api/texts/<id> (streamed)', run_route)
+
+        session.query(Text).filter(Text.id == text_id).delete()
+        session.query(Suggestion).filter(Suggestion.token_text.like('benchmark_sugestao%')).delete(
+            synchronize_session=False
+        )
+        session.query(User).filter(User.id == user_id).delete()
+        session.commit()
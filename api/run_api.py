@@ -1,6 +1,10 @@
 from app.app import create_app
+from app.database.scripts.upgrade import upgrade_database_schema
+from app.extensions import db
 
 app = create_app()
+with app.app_context():
+    upgrade_database_schema(db.engine)
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
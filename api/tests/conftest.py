@@ -7,11 +7,12 @@ from app.database.models import User, Base
 os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
 os.environ['TESTING'] = 'True'
 os.environ['RATELIMIT_ENABLED'] = 'False'
+os.environ['OCR_CACHE_ENABLED'] = 'False'
 
 from app.app import create_app
 
 @pytest.fixture
-def app():
+def app(tmp_path):
     """Create and configure a new app instance for each test."""
     app = create_app()
     app.config.update({
@@ -21,6 +22,15 @@ def app():
         "WTF_CSRF_ENABLED": False,  # Disable CSRF for testing if used
         "JWT_COOKIE_CSRF_PROTECT": False, # Disable JWT CSRF for testing
         "RATELIMIT_ENABLED": False,
+        "OCR_REQUESTS_PER_MINUTE": 0,
+        "OCR_RETRY_BACKOFF_SECONDS": 0,
+        "TEXT_UPLOAD_PARSE_WORKERS": 0,
+        # Keep uploads, images and exports out of the source tree
+        "TEMP_UPLOADS_FOLDER": str(tmp_path / "temp_uploads"),
+        "CHUNKED_UPLOADS_FOLDER": str(tmp_path / "temp_uploads" / "chunked"),
+        "IMAGES_FOLDER": str(tmp_path / "images"),
+        "IMAGE_DERIVATIVES_FOLDER": str(tmp_path / "image_derivatives"),
+        "EXPORTS_FOLDER": str(tmp_path / "exports"),
     })
     from app.extensions import limiter
     limiter.enabled = False
@@ -0,0 +1,172 @@
+import hashlib
+import os
+from datetime import timedelta
+
+import pytest
+
+from app.database.models import BackgroundJob, ChunkedUpload, TextUploadBatch
+from app.extensions import db
+
+
+CONTENT = b"PK" + bytes(range(256)) * 3  # 770 bytes -> 8 parts of 100 bytes
+
+
+@pytest.fixture
+def upload_folders(app, mocker, tmp_path):
+    chunked_folder = tmp_path / "chunked"
+    chunked_folder.mkdir()
+    app.config["CHUNKED_UPLOADS_FOLDER"] = str(chunked_folder)
+    app.config["TEMP_UPLOADS_FOLDER"] = str(tmp_path)
+    mocker.patch("app.chunked_uploads.CHUNKED_UPLOAD_PART_SIZE", 100)
+    return tmp_path, chunked_folder
+
+
+def _create(admin_client, **overrides):
+    body = {"file_name": "corpus.zip", "total_size": len(CONTENT), **overrides}
+    return admin_client.post("/api/upload/chunked", json=body)
+
+
+def _put_part(admin_client, upload_id, part_number, data=None):
+    if data is None:
+        data = CONTENT[(part_number - 1) * 100:part_number * 100]
+    return admin_client.put(
+        f"/api/upload/chunked/{upload_id}/parts/{part_number}",
+        data=data,
+        content_type="application/octet-stream",
+    )
+
+
+def test_chunked_upload_resumes_and_queues_import(admin_client, app, upload_folders):
+    spool_folder, chunked_folder = upload_folders
+
+    created = _create(admin_client, duplicate_policy="link")
+    assert created.status_code == 201
+    upload_id = created.json["upload_id"]
+    assert created.json["total_parts"] == 8
+    assert created.json["received_parts"] == []
+
+    for part_number in (3, 1, 8, 2):
+        assert _put_part(admin_client, upload_id, part_number).status_code == 200
+    # Re-sending a part replaces it
+    assert _put_part(admin_client, upload_id, 3).json == {"part_number": 3, "size": 100}
+
+    status = admin_client.get(f"/api/upload/chunked/{upload_id}")
+    assert status.json["received_parts"] == [1, 2, 3, 8]
+
+    incomplete = admin_client.post(f"/api/upload/chunked/{upload_id}/complete")
+    assert incomplete.status_code == 409
+    assert incomplete.json["error"] == "Upload is missing 4 part(s)."
+
+    for part_number in (4, 5, 6, 7):
+        _put_part(admin_client, upload_id, part_number)
+
+    completed = admin_client.post(f"/api/upload/chunked/{upload_id}/complete")
+
+    assert completed.status_code == 202
+    with app.app_context():
+        payload = db.session.get(BackgroundJob, completed.json["job_id"]).payload_json
+        batch = db.session.get(TextUploadBatch, completed.json["batch_id"])
+        assert batch.archive_sha256 == hashlib.sha256(CONTENT).hexdigest()
+        assert db.session.get(ChunkedUpload, upload_id).status == "completed"
+    assert payload["duplicate_policy"] == "link"
+    assert payload["zip_path"] == os.path.join(str(spool_folder), payload["original_filename"])
+    with open(payload["zip_path"], "rb") as archive:
+        assert archive.read() == CONTENT
+    assert list(chunked_folder.iterdir()) == []
+
+    # A retried completion returns the same import instead of queueing another
+    repeated = admin_client.post(f"/api/upload/chunked/{upload_id}/complete")
+    assert repeated.status_code == 202
+    assert repeated.json == completed.json
+    status = admin_client.get(f"/api/upload/chunked/{upload_id}").json
+    assert (status["status"], status["job_id"], status["batch_id"]) == (
+        "completed", completed.json["job_id"], completed.json["batch_id"]
+    )
+    assert _put_part(admin_client, upload_id, 1).status_code == 409
+    with app.app_context():
+        assert db.session.query(BackgroundJob).count() == 1
+
+
+def _upload_all_parts(admin_client):
+    upload_id = _create(admin_client).json["upload_id"]
+    for part_number in range(1, 9):
+        _put_part(admin_client, upload_id, part_number)
+    return upload_id
+
+
+def test_chunked_upload_is_completed_only_once(admin_client, app, upload_folders):
+    from app.chunked_uploads import claim_for_completion
+
+    upload_id = _upload_all_parts(admin_client)
+
+    with app.app_context():
+        # Another request is assembling the parts
+        assert claim_for_completion(db.session, db.session.get(ChunkedUpload, upload_id))
+        assert not claim_for_completion(db.session, db.session.get(ChunkedUpload, upload_id))
+
+    overlapping = admin_client.post(f"/api/upload/chunked/{upload_id}/complete")
+
+    assert overlapping.status_code == 409
+    assert overlapping.json["error"] == "Upload is already being completed."
+    with app.app_context():
+        assert db.session.query(BackgroundJob).count() == 0
+
+
+def test_chunked_upload_removes_partial_archive_when_assembly_fails(admin_client, app, upload_folders, mocker):
+    from app.chunked_uploads import parts_folder
+
+    spool_folder, _ = upload_folders
+    upload_id = _upload_all_parts(admin_client)
+    os.remove(os.path.join(parts_folder(upload_id), "5.part"))
+    mocker.patch("app.chunked_uploads.received_parts", return_value=list(range(1, 9)))
+
+    failed = admin_client.post(f"/api/upload/chunked/{upload_id}/complete")
+
+    assert failed.status_code == 500
+    assert failed.json["error"] == "Failed to assemble the uploaded parts."
+    assert [entry.name for entry in spool_folder.iterdir() if entry.is_file()] == []
+    with app.app_context():
+        assert db.session.get(ChunkedUpload, upload_id).status == "receiving"
+        assert db.session.query(TextUploadBatch).count() == 0
+
+
+def test_chunked_upload_rejects_parts_of_the_wrong_size(admin_client, upload_folders):
+    upload_id = _create(admin_client).json["upload_id"]
+
+    too_short = _put_part(admin_client, upload_id, 1, data=b"x" * 99)
+    last_part = _put_part(admin_client, upload_id, 8)
+    out_of_range = _put_part(admin_client, upload_id, 9, data=b"x")
+
+    assert too_short.status_code == 400
+    assert too_short.json["error"] == "Part 1 must be 100 bytes."
+    assert last_part.json == {"part_number": 8, "size": 70}
+    assert out_of_range.status_code == 400
+    assert admin_client.get(f"/api/upload/chunked/{upload_id}").json["received_parts"] == [8]
+
+
+def test_chunked_upload_validates_the_archive(admin_client, upload_folders):
+    assert _create(admin_client, file_name="corpus.rar").status_code == 400
+    too_large = _create(admin_client, total_size=200 * 1024 * 1024)
+    assert too_large.status_code == 400
+    assert too_large.json["error"] == "Uploaded ZIP exceeds the maximum supported size."
+    assert admin_client.get("/api/upload/chunked/unknown").status_code == 404
+
+
+def test_cleanup_expired_chunked_uploads(admin_client, app, upload_folders):
+    from app.chunked_uploads import cleanup_expired_chunked_uploads, parts_folder
+    from app.text_upload_batches import utcnow
+
+    stale_id = _create(admin_client).json["upload_id"]
+    active_id = _create(admin_client).json["upload_id"]
+    _put_part(admin_client, stale_id, 1)
+
+    with app.app_context():
+        db.session.get(ChunkedUpload, stale_id).updated_at = utcnow() - timedelta(days=2)
+        db.session.commit()
+
+        assert cleanup_expired_chunked_uploads(db.session, 24 * 60 * 60) == 1
+        assert db.session.get(ChunkedUpload, stale_id) is None
+        assert db.session.get(ChunkedUpload, active_id) is not None
+
+    assert not os.path.exists(parts_folder(stale_id))
+    assert os.path.exists(parts_folder(active_id))
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.database.models import Normalization, Text, Token, User
+from app.download_texts import ExportToken, iter_normalized_tokens, rebuild_text
+from app.extensions import db
+
+
+def _create_user(username):
+    user = User(username=username)
+    user.set_password("password123")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _create_text(name, token_texts, grade=1):
+    text = Text(source_file_name=name, grade=grade)
+    db.session.add(text)
+    db.session.flush()
+    db.session.add_all([
+        Token(text_id=text.id, token_text=token_text, is_word=True, position=position, whitespace_after=" ")
+        for position, token_text in enumerate(token_texts)
+    ])
+    db.session.commit()
+    return text.id
+
+
+def _normalize(text_id, user_id, start_index, end_index, new_token):
+    db.session.add(Normalization(
+        text_id=text_id,
+        user_id=user_id,
+        start_index=start_index,
+        end_index=end_index,
+        new_token=new_token,
+        creation_time=datetime.now(),
+    ))
+    db.session.commit()
+
+
+def test_iter_normalized_tokens_merges_texts_in_constant_queries(app):
+    ana = _create_user("ana")
+    bia = _create_user("bia")
+    first = _create_text("a.docx", ["Eu", "nao", "sei"])
+    empty = _create_text("b.docx", [])
+    last = _create_text("c.docx", ["Ele", "foi"], grade=2)
+    _normalize(first, ana.id, 1, 1, "não")
+    _normalize(last, ana.id, 1, 1, "vai")
+    _normalize(last, bia.id, 0, 0, "Ela")
+    user_id = ana.id
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        result = [
+            (text_id, name, grade, [token.token_text for token in tokens])
+            for text_id, name, grade, tokens in iter_normalized_tokens([last, empty, first, 999], user_id)
+        ]
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert result == [
+        (first, "a.docx", 1, ["Eu", "não", "sei"]),
+        (empty, "b.docx", 1, []),
+        (last, "c.docx", 2, ["Ele", "vai"]),
+    ]
+    assert len(statements) == 3
+
+
+def test_iter_normalized_tokens_with_tags(app):
+    ana = _create_user("ana")
+    text_id = _create_text("a.docx", ["Eu", "nao"])
+    _normalize(text_id, ana.id, 1, 1, "não")
+
+    (_, _, _, tokens), = iter_normalized_tokens([text_id], ana.id, use_tags=True)
+    assert tokens[1].token_text == "<norm orig='nao'>não</norm>"
+    assert tokens[1].whitespace_after == " "
+
+
+def _tokens(*pairs):
+    return [ExportToken(position, text, whitespace) for position, (text, whitespace) in enumerate(pairs)]
+
+
+def test_rebuild_text_uses_stored_whitespace():
+    tokens = _tokens(("Ele", " "), ("disse", ":"), ("\"", ""), ("oi", ""), ("\"", "\n\n"), ("(", ""), ("fim", ""), (")", "\n"))
+    assert rebuild_text(tokens) == 'Ele disse:"oi"\n\n(fim)\n'
+
+
+def test_rebuild_text_heuristic_mode_and_missing_whitespace():
+    tokens = _tokens(("Ele", None), ("disse", None), (",", None), ("(", None), ("sim", None), (")", None))
+    assert rebuild_text(tokens, whitespace_mode="heuristic") == "Ele disse, (sim)"
+    # Tokens without stored whitespace fall back to the heuristic
+    assert rebuild_text(tokens) == "Ele disse, (sim)"
+    assert rebuild_text(_tokens(("a", "  "), ("b", "")), whitespace_mode="heuristic") == "a b"
+
+    with pytest.raises(ValueError):
+        rebuild_text(tokens, whitespace_mode="guess")
+
+
+def test_multi_token_normalization_replaces_whole_span(app):
+    ana = _create_user("ana")
+    text_id = _create_text("a.docx", ["Eu", "a", "gente", "fomos", "."])
+    _normalize(text_id, ana.id, 1, 2, "agente")
+    _normalize(text_id, ana.id, 4, 6, "!")
+    user_id = ana.id
+
+    (_, _, _, tokens), = iter_normalized_tokens([text_id], user_id)
+    assert [token.token_text for token in tokens] == ["Eu", "agente", "fomos", "!"]
+    assert rebuild_text(tokens) == "Eu agente fomos ! "
+
+    (_, _, _, tagged), = iter_normalized_tokens([text_id], user_id, use_tags=True)
+    assert tagged[1].token_text == "<norm orig='a gente'>agente</norm>"
@@ -1,4 +1,5 @@
 import io
+from datetime import datetime
 import pytest
 
 from app.background_jobs import create_background_job
@@ -20,26 +21,125 @@ def test_request_report(auth_client, mocker):
     assert response.data.decode('utf-8') == "id,text\n1,hello"
     mock_generate.assert_called_once()
 
+def test_request_report_from_database(auth_client):
+    """Test the streamed CSV report built from bulk-loaded tokens and normalizations."""
+    from app.database.models import Normalization, Token
+
+    with auth_client.application.app_context():
+        user_id = db.session.query(User.id).filter_by(username="testuser").scalar()
+        text_ids = []
+        for name in ["a.docx", "b.docx"]:
+            text = Text(source_file_name=name)
+            db.session.add(text)
+            db.session.flush()
+            db.session.add_all([
+                Token(text_id=text.id, token_text=word, is_word=True, position=position, whitespace_after=" ")
+                for position, word in enumerate(["Eu", "a", "gente", "fomos", "la"])
+            ])
+            text_ids.append(text.id)
+        db.session.add_all([
+            Normalization(text_id=text_ids[1], user_id=user_id, start_index=4, end_index=4, new_token="lá", creation_time=datetime.now()),
+            Normalization(text_id=text_ids[0], user_id=user_id, start_index=1, end_index=2, new_token="agente", creation_time=datetime.now()),
+        ])
+        db.session.commit()
+
+    response = auth_client.post('/api/report/', json={"text_ids": text_ids})
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/csv"
+    assert response.data.decode('utf-8').splitlines() == [
+        "\ufeffText ID;User;Previous Tokens;Word;Subsequent Tokens;Normalization",
+        "a.docx;testuser;Eu;a gente;fomos la;agente",
+        "b.docx;testuser;Eu a gente fomos;la;;lá",
+    ]
+
+def test_request_agreement_report(admin_client):
+    """Test the multi-user agreement report."""
+    from app.database.models import Normalization, Token
+
+    with admin_client.application.app_context():
+        users = {}
+        for username in ["ana", "bia", "caio"]:
+            user = User(username=username)
+            user.set_password("password123")
+            db.session.add(user)
+            db.session.flush()
+            users[username] = user.id
+        text = Text(source_file_name="a.docx")
+        db.session.add(text)
+        db.session.flush()
+        db.session.add_all([
+            Token(text_id=text.id, token_text=word, is_word=True, position=position, whitespace_after=" ")
+            for position, word in enumerate(["Eu", "a", "gente", "fomos", "la"])
+        ])
+        for username, start, end, new_token in [
+            ("ana", 1, 2, "agente"), ("bia", 1, 2, "agente"), ("caio", 1, 1, "à"), ("bia", 4, 4, "lá"),
+        ]:
+            db.session.add(Normalization(
+                text_id=text.id, user_id=users[username], start_index=start, end_index=end,
+                new_token=new_token, creation_time=datetime.now(),
+            ))
+        db.session.commit()
+        text_id = text.id
+
+    response = admin_client.post('/api/report/agreement', json={"text_ids": [text_id], "usernames": ["bia", "ana", "caio"]})
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == "attachment; filename=agreement_report.csv"
+    assert response.data.decode('utf-8').splitlines() == [
+        "\ufeffText ID;Previous Tokens;Word;Subsequent Tokens;bia;ana;caio;Agreement",
+        "a.docx;Eu;a gente;fomos la;agente;agente;à [1-1];2/3",
+        "a.docx;Eu a gente fomos;la;;lá;;;1/3",
+    ]
+
+    response = admin_client.post('/api/report/agreement', json={"text_ids": [text_id], "usernames": ["ana", "nobody"]})
+    assert response.status_code == 400
+    assert response.json["code"] == "VALIDATION_ERROR"
+
+def test_request_agreement_report_requires_admin(auth_client):
+    response = auth_client.post('/api/report/agreement', json={"text_ids": [1], "usernames": ["a", "b"]})
+    assert response.status_code == 403
+
 def test_download_normalized_texts(auth_client, mocker):
     """Test downloading normalized texts as zip."""
-    # Mock save_modified_texts to return a fake path
-    mock_save = mocker.patch('app.routes.download_routes.save_modified_texts')
-    mock_save.return_value = "/tmp/fake_path/texts.zip"
-    
-    # Mock os.path.exists to return True
-    mocker.patch('os.path.exists', return_value=True)
-    
-    # Mock send_from_directory
-    # Since send_from_directory is hard to mock perfectly because it returns a response object,
-    # we can mock the function in the module.
-    mock_send = mocker.patch('app.routes.download_routes.send_from_directory')
-    mock_send.return_value = "ZIP_CONTENT"
+    mock_zip = mocker.patch('app.routes.download_routes.iter_modified_texts_zip')
+    mock_zip.return_value = iter([b"PK\x03\x04", b"ZIP_CONTENT"])
 
     payload = {"text_ids": [1], "use_tags": False}
     response = auth_client.post('/api/download/', json=payload)
     
     assert response.status_code == 200
-    mock_save.assert_called_once()
+    assert response.headers["Content-Type"] == "application/zip"
+    assert response.headers["Content-Disposition"] == "attachment; filename=recovered_texts.zip"
+    assert response.data == b"PK\x03\x04ZIP_CONTENT"
+    mock_zip.assert_called_once()
+
+def test_download_normalized_texts_streams_archive(auth_client):
+    """Test that the streamed archive contains one rebuilt entry per text."""
+    import zipfile
+    from app.database.models import Normalization, Token
+
+    with auth_client.application.app_context():
+        user_id = db.session.query(User.id).filter_by(username="testuser").scalar()
+        text_ids = []
+        for name, grade in [("redacao1.docx", 2), ("redacao2.docx", 3)]:
+            text = Text(source_file_name=name, grade=grade)
+            db.session.add(text)
+            db.session.flush()
+            db.session.add_all([
+                Token(text_id=text.id, token_text="Eu", is_word=True, position=0, whitespace_after=" "),
+                Token(text_id=text.id, token_text="nao", is_word=True, position=1, whitespace_after=""),
+                Token(text_id=text.id, token_text=".", is_word=False, position=2, whitespace_after=""),
+            ])
+            text_ids.append(text.id)
+        db.session.add(Normalization(text_id=text_ids[0], user_id=user_id, start_index=1, end_index=1, new_token="não", creation_time=datetime.now()))
+        db.session.commit()
+
+    response = auth_client.post('/api/download/', json={"text_ids": text_ids})
+    assert response.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert sorted(archive.namelist()) == ["NOTA 2/redacao1n.txt", "NOTA 3/redacao2n.txt"]
+        assert archive.read("NOTA 2/redacao1n.txt").decode("utf-8") == "Eu não."
+        assert archive.read("NOTA 3/redacao2n.txt").decode("utf-8") == "Eu nao."
 
 def test_upload_file_no_file(auth_client):
     """Test upload without file part."""
@@ -100,6 +200,109 @@ def test_upload_file_success(client, app, mocker):
         assert saved_job.payload_json["batch_id"] == response.json["batch_id"]
         assert saved_job.payload_json["original_filename"].endswith("_test.zip")
 
+def test_upload_file_streams_archive_to_spool_folder(admin_client, app, tmp_path):
+    """The archive is written to the spool folder with its SHA-256 in the job payload."""
+    import hashlib
+
+    app.config['TEMP_UPLOADS_FOLDER'] = str(tmp_path)
+    content = b"PK" + b"x" * 300_000
+
+    response = admin_client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(content), 'big.zip')},
+        content_type='multipart/form-data',
+    )
+
+    assert response.status_code == 202
+    with app.app_context():
+        from app.database.models import BackgroundJob
+
+        payload = db.session.get(BackgroundJob, response.json["job_id"]).payload_json
+    assert payload["archive_sha256"] == hashlib.sha256(content).hexdigest()
+    assert payload["zip_path"].startswith(str(tmp_path))
+    with open(payload["zip_path"], "rb") as saved:
+        assert saved.read() == content
+    assert [path.name for path in tmp_path.iterdir()] == [payload["original_filename"]]
+
+
+def test_upload_file_rejects_oversized_archive(admin_client, mocker, tmp_path):
+    admin_client.application.config['TEMP_UPLOADS_FOLDER'] = str(tmp_path)
+    mocker.patch('app.routes.upload_routes.TEXT_UPLOAD_MAX_ARCHIVE_SIZE', 1024)
+
+    response = admin_client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(b"x" * 200_000), 'big.zip')},
+        content_type='multipart/form-data',
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Uploaded ZIP exceeds the maximum supported size."
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_upload_file_skip_policy_rejects_known_archive(admin_client, app, tmp_path):
+    app.config['TEMP_UPLOADS_FOLDER'] = str(tmp_path)
+
+    def upload(policy):
+        return admin_client.post(
+            '/api/upload',
+            data={'file': (io.BytesIO(b"same archive"), 'texts.zip'), 'duplicate_policy': policy},
+            content_type='multipart/form-data',
+        )
+
+    first = upload('skip')
+    assert first.status_code == 202
+
+    response = upload('skip')
+
+    assert response.status_code == 409
+    assert response.json["error"] == f"This archive was already uploaded (batch {first.json['batch_id']})."
+    assert len(list(tmp_path.iterdir())) == 1
+
+    with app.app_context():
+        from app.database.models import BackgroundJob
+
+        batch = db.session.get(TextUploadBatch, first.json["batch_id"])
+        assert batch.archive_sha256 is not None
+        assert db.session.get(BackgroundJob, first.json["job_id"]).payload_json["duplicate_policy"] == "skip"
+
+    assert upload('import').status_code == 202
+
+
+def test_upload_file_rejects_unknown_duplicate_policy(admin_client, tmp_path):
+    admin_client.application.config['TEMP_UPLOADS_FOLDER'] = str(tmp_path)
+
+    response = admin_client.post(
+        '/api/upload',
+        data={'file': (io.BytesIO(b"zip"), 'texts.zip'), 'duplicate_policy': 'replace'},
+        content_type='multipart/form-data',
+    )
+
+    assert response.status_code == 400
+    assert response.json["code"] == "VALIDATION_ERROR"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_receive_file_upload_aborts_while_streaming(tmp_path):
+    """Without a Content-Length the size limit is enforced on the bytes received."""
+    from werkzeug.test import EnvironBuilder
+
+    from app.utils.uploads import UploadRejected, receive_file_upload
+
+    environ = EnvironBuilder(
+        method='POST',
+        data={'file': (io.BytesIO(b"x" * 500_000), 'big.zip')},
+    ).get_environ()
+    del environ['CONTENT_LENGTH']
+    environ['wsgi.input_terminated'] = True
+
+    with pytest.raises(UploadRejected) as exc_info:
+        receive_file_upload(environ, folder=str(tmp_path), max_size=100_000)
+
+    assert exc_info.value.reason == 'too_large'
+    assert environ['wsgi.input'].tell() < 500_000
+    assert list(tmp_path.iterdir()) == []
+
 def test_task_status(auth_client, app):
     """Test checking background job status."""
     with app.app_context():
@@ -236,3 +439,48 @@ def test_get_active_text_upload_batches_returns_current_admin_batches(admin_clie
     assert response.status_code == 200
     assert response.json["batches"]
     assert response.json["batches"][0]["id"] == batch_id
+
+def test_download_job_export_flow(auth_client, tmp_path):
+    """Test queueing an export, running it in the worker and fetching the archive."""
+    import os
+    import zipfile
+    from app.database.models import BackgroundJob, Token
+    from app.job_worker import process_next_background_job
+    from app.tasks.export_task_logic import cleanup_expired_exports
+
+    auth_client.application.config['EXPORTS_FOLDER'] = str(tmp_path)
+
+    with auth_client.application.app_context():
+        text = Text(source_file_name="redacao.docx", grade=1)
+        db.session.add(text)
+        db.session.flush()
+        db.session.add(Token(text_id=text.id, token_text="Oi", is_word=True, position=0, whitespace_after=""))
+        db.session.commit()
+        text_id = text.id
+
+    response = auth_client.post('/api/download/jobs', json={"text_ids": [text_id]})
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+
+    assert auth_client.get(f'/api/download/jobs/{job_id}/file').status_code == 409
+
+    with auth_client.application.app_context():
+        assert db.session.get(BackgroundJob, job_id).kind == BackgroundJobKind.TEXT_EXPORT
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+
+    status = auth_client.get(f'/api/status/{job_id}')
+    assert status.json["state"] == "SUCCESS"
+    assert status.json["result"]["kind"] == "text_export"
+
+    response = auth_client.get(f'/api/download/jobs/{job_id}/file')
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.read("NOTA 1/redacaon.txt").decode("utf-8") == "Oi"
+    response.close()
+
+    export_path = tmp_path / f"{job_id}.zip"
+    os.utime(export_path, (0, 0))
+    assert cleanup_expired_exports(3600) == 1
+    assert auth_client.get(f'/api/download/jobs/{job_id}/file').status_code == 404
+    assert auth_client.get('/api/download/jobs/unknown/file').status_code == 404
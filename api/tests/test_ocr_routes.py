@@ -112,12 +112,11 @@ def test_upload_ocr_zip_empty_filename(admin_client, app):
 
 def test_get_raw_text_image_success(admin_client, app, tmp_path):
     """Test successful retrieval of raw text image."""
-    from app.routes.ocr_routes import IMAGES_FOLDER
-    
     # Create a test image file
-    os.makedirs(IMAGES_FOLDER, exist_ok=True)
+    images_folder = app.config['IMAGES_FOLDER']
+    os.makedirs(images_folder, exist_ok=True)
     test_image_name = "test_uuid_image.jpg"
-    test_image_path = os.path.join(IMAGES_FOLDER, test_image_name)
+    test_image_path = os.path.join(images_folder, test_image_name)
     
     with open(test_image_path, 'wb') as f:
         f.write(b'fake image content')
@@ -146,6 +145,49 @@ def test_get_raw_text_image_success(admin_client, app, tmp_path):
             os.remove(test_image_path)
 
 
+def test_get_raw_text_image_sizes_and_caching(admin_client, app, tmp_path):
+    """Test thumbnails are generated once and served with caching, conditional and range support."""
+    from PIL import Image
+
+    images_folder = tmp_path / "images"
+    derivatives_folder = tmp_path / "derived"
+    images_folder.mkdir()
+    app.config['IMAGES_FOLDER'] = str(images_folder)
+    app.config['IMAGE_DERIVATIVES_FOLDER'] = str(derivatives_folder)
+    Image.new('RGB', (2000, 1000), 'white').save(images_folder / "uuid_page.jpg")
+
+    with app.app_context():
+        raw_text = RawText(source_file_name="page.jpg", text_content="Text", image_path="uuid_page.jpg")
+        db.session.add(raw_text)
+        db.session.commit()
+        raw_text_id = raw_text.id
+
+    url = f'/api/ocr/raw-texts/{raw_text_id}/image'
+    response = admin_client.get(url, query_string={"size": "thumbnail"})
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    assert Image.open(io.BytesIO(response.data)).size == (256, 128)
+    assert "private" in response.headers["Cache-Control"]
+    assert "public" not in response.headers["Cache-Control"]
+    assert "max-age=604800" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+    response.close()
+
+    generated = derivatives_folder / "thumbnail_uuid_page.jpg"
+    mtime = generated.stat().st_mtime_ns
+    response = admin_client.get(url, query_string={"size": "thumbnail"}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response.close()
+    assert generated.stat().st_mtime_ns == mtime
+
+    response = admin_client.get(url, query_string={"size": "preview"}, headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert len(response.data) == 10
+    response.close()
+
+    assert admin_client.get(url, query_string={"size": "huge"}).status_code == 400
+
+
 def test_get_raw_text_image_not_found(admin_client, app):
     """Test retrieval of non-existent raw text."""
     response = admin_client.get('/api/ocr/raw-texts/99999/image')
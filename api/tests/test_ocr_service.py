@@ -5,6 +5,14 @@ import io
 from app.services import ocr_service
 
 
+@pytest.fixture(autouse=True)
+def reset_shared_ocr_client():
+    """Each test builds the shared OCR client from its own mocks and environment."""
+    ocr_service.set_ocr_client(None)
+    yield
+    ocr_service.set_ocr_client(None)
+
+
 def test_perform_ocr_with_file_path(mocker, tmp_path):
     """Test OCR with image file path."""
     # Create a test image
@@ -141,3 +149,116 @@ def test_perform_ocr_prompt_content(mocker, tmp_path):
     assert 'OCR' in prompt
     assert 'transcreva' in prompt.lower() or 'transcrev' in prompt.lower()
     assert 'parágrafo' in prompt.lower()
+
+
+def test_shared_client_is_created_once(mocker):
+    """Test that the Gemini client and API key are only set up on first use."""
+    mock_client = mocker.MagicMock()
+    mock_client.models.generate_content.return_value = mocker.MagicMock(text="Page")
+    client_factory = mocker.patch('app.services.ocr_service.genai.Client', return_value=mock_client)
+    mocker.patch.dict(os.environ, {'API_KEY': 'test-api-key'})
+
+    image = Image.new('L', (20, 20))
+    assert ocr_service.perform_ocr(image) == "Page"
+    assert ocr_service.perform_ocr(image) == "Page"
+
+    client_factory.assert_called_once_with(api_key='test-api-key')
+    assert mock_client.models.generate_content.call_count == 2
+    # In-memory images are passed directly, converted to RGB
+    assert mock_client.models.generate_content.call_args.kwargs['contents'][1].mode == 'RGB'
+
+
+def test_stub_backend(mocker):
+    """Test the local stub backend selected with OCR_BACKEND=stub."""
+    mocker.patch.dict(os.environ, {'OCR_BACKEND': 'stub'}, clear=True)
+    client_factory = mocker.patch('app.services.ocr_service.genai.Client')
+
+    assert ocr_service.perform_ocr(Image.new('RGB', (10, 10))) == "Texto de teste."
+    assert isinstance(ocr_service.get_ocr_client().backend, ocr_service.StubOCRBackend)
+    client_factory.assert_not_called()
+
+    custom = ocr_service.OCRClient(ocr_service.StubOCRBackend(text="Outro"))
+    assert ocr_service.perform_ocr(Image.new('RGB', (10, 10)), client=custom) == "Outro"
+    assert custom.backend.calls == 1
+
+
+def test_ocr_cache_skips_backend_for_same_pixels(mocker, tmp_path):
+    """Test that a re-encoded copy of an image is served from the OCR cache."""
+    mock_client = mocker.MagicMock()
+    mock_client.models.generate_content.return_value = mocker.MagicMock(text="Cached page")
+    mocker.patch('app.services.ocr_service.genai.Client', return_value=mock_client)
+
+    cache = ocr_service.OCRResultCache(str(tmp_path))
+    client = ocr_service.OCRClient(ocr_service.GeminiOCRBackend('test-api-key'), cache=cache)
+
+    image = Image.new('RGBA', (300, 600), color=(10, 20, 30, 255))
+    png_bytes = io.BytesIO()
+    image.save(png_bytes, format='PNG')
+    bmp_path = tmp_path / "copy.bmp"
+    image.convert('RGB').save(bmp_path)
+
+    assert client.perform(png_bytes.getvalue()) == "Cached page"
+    assert client.perform(str(bmp_path)) == "Cached page"
+    assert mock_client.models.generate_content.call_count == 1
+
+    # Other pixels, or another model, miss the cache
+    client.perform(Image.new('RGB', (300, 600)))
+    other_model = ocr_service.OCRClient(
+        ocr_service.GeminiOCRBackend('test-api-key', model='other-model'), cache=cache
+    )
+    other_model.perform(png_bytes.getvalue())
+    assert mock_client.models.generate_content.call_count == 3
+
+
+def test_ocr_cache_ignores_stub_backend(tmp_path):
+    """Test that results of backends without a cache namespace are not cached."""
+    client = ocr_service.OCRClient(ocr_service.StubOCRBackend(), cache=ocr_service.OCRResultCache(str(tmp_path)))
+
+    client.perform(Image.new('RGB', (10, 10)))
+    client.perform(Image.new('RGB', (10, 10)))
+    assert client.backend.calls == 2
+    assert not any(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("text", [None, "", "  \n"])
+def test_empty_ocr_result_is_rejected_and_not_cached(mocker, tmp_path, text):
+    """Test that an empty backend response (e.g. a blocked Gemini reply) raises instead of being cached."""
+    mock_client = mocker.MagicMock()
+    mock_client.models.generate_content.return_value = mocker.MagicMock(text=text)
+    mocker.patch('app.services.ocr_service.genai.Client', return_value=mock_client)
+    client = ocr_service.OCRClient(
+        ocr_service.GeminiOCRBackend('test-api-key'), cache=ocr_service.OCRResultCache(str(tmp_path))
+    )
+
+    with pytest.raises(ocr_service.EmptyOCRResult):
+        client.perform(Image.new('RGB', (10, 10)))
+    assert not any(tmp_path.iterdir())
+
+    mock_client.models.generate_content.return_value = mocker.MagicMock(text="Page")
+    assert client.perform(Image.new('RGB', (10, 10))) == "Page"
+
+
+def test_ocr_cache_prunes_least_recently_used_entries(mocker, tmp_path):
+    """Test that the cache keeps at most max_entries, dropping the least recently used first."""
+    mocker.patch.object(ocr_service.OCRResultCache, 'PRUNE_EVERY', 1)
+    cache = ocr_service.OCRResultCache(str(tmp_path), max_entries=2)
+
+    cache.put('aa01', 'first')
+    cache.put('bb02', 'second')
+    for age, key in enumerate(('bb02', 'aa01'), start=1):
+        old = os.path.getmtime(cache._path(key)) - 100 * age
+        os.utime(cache._path(key), (old, old))
+    assert cache.get('aa01') == 'first'  # now the most recently used
+    cache.put('cc03', 'third')
+
+    assert [cache.get(key) for key in ('aa01', 'bb02', 'cc03')] == ['first', None, 'third']
+    assert ocr_service.OCRResultCache(str(tmp_path), max_entries=0).prune() == 0
+
+
+def test_ocr_backend_requires_extract_text():
+    """Test that a backend without extract_text cannot be instantiated."""
+    class IncompleteBackend(ocr_service.OCRBackend):
+        cache_namespace = 'incomplete'
+
+    with pytest.raises(TypeError, match='extract_text'):
+        IncompleteBackend()
@@ -6,7 +6,6 @@ from PIL import Image
 from unittest.mock import MagicMock
 
 from app.tasks.ocr_task_logic import run_ocr_zip_pipeline
-from app.tasks.constants import IMAGES_FOLDER
 from app.tasks.persistence import add_to_database
 from app.tasks.text_formatting import format_text_content
 from app.database.models import RawText
@@ -100,12 +99,8 @@ def test_process_ocr_zip_success(app, mocker, tmp_path):
         assert raw_texts[0].image_path is not None
         
         # Verify image was saved
-        saved_image_path = os.path.join(IMAGES_FOLDER, raw_texts[0].image_path)
+        saved_image_path = os.path.join(app.config['IMAGES_FOLDER'], raw_texts[0].image_path)
         assert os.path.exists(saved_image_path)
-        
-        # Cleanup
-        if os.path.exists(saved_image_path):
-            os.remove(saved_image_path)
     
     # Verify ZIP was deleted
     assert not os.path.exists(zip_path)
@@ -138,12 +133,6 @@ def test_process_ocr_zip_multiple_images(app, mocker, tmp_path):
         # Verify all were saved to database
         raw_texts = db.session.query(RawText).all()
         assert len(raw_texts) == 3
-        
-        # Cleanup saved images
-        for rt in raw_texts:
-            img_path = os.path.join(IMAGES_FOLDER, rt.image_path)
-            if os.path.exists(img_path):
-                os.remove(img_path)
 
 
 def test_process_ocr_zip_file_not_found(app, mocker):
@@ -197,12 +186,6 @@ def test_process_ocr_zip_mixed_files(app, mocker, tmp_path):
         
         raw_texts = db.session.query(RawText).all()
         assert len(raw_texts) == 2
-        
-        # Cleanup
-        for rt in raw_texts:
-            img_path = os.path.join(IMAGES_FOLDER, rt.image_path)
-            if os.path.exists(img_path):
-                os.remove(img_path)
 
 
 def test_process_ocr_zip_filters_double_underscore(app, mocker, tmp_path):
@@ -229,12 +212,6 @@ def test_process_ocr_zip_filters_double_underscore(app, mocker, tmp_path):
         # Should only process 1 image (not the __MACOSX one)
         assert result['total'] == 1
         assert 'normal.jpg' in result['result']
-        
-        # Cleanup
-        for rt in db.session.query(RawText).all():
-            img_path = os.path.join(IMAGES_FOLDER, rt.image_path)
-            if os.path.exists(img_path):
-                os.remove(img_path)
 
 
 def test_process_ocr_zip_image_conversion(app, mocker, tmp_path):
@@ -260,16 +237,13 @@ def test_process_ocr_zip_image_conversion(app, mocker, tmp_path):
         # Verify image was saved as JPEG
         assert raw_text.image_path.endswith('.jpg')
         
-        saved_path = os.path.join(IMAGES_FOLDER, raw_text.image_path)
+        saved_path = os.path.join(app.config['IMAGES_FOLDER'], raw_text.image_path)
         
         # Load and verify it's RGB JPEG
         saved_img = Image.open(saved_path)
         assert saved_img.mode == 'RGB'
         assert saved_img.format == 'JPEG'
         saved_img.close()
-        
-        # Cleanup
-        os.remove(saved_path)
 
 
 def test_process_ocr_zip_unique_filenames(app, mocker, tmp_path):
@@ -296,11 +270,6 @@ def test_process_ocr_zip_unique_filenames(app, mocker, tmp_path):
         # First part should be a UUID
         uuid_part = raw_text.image_path.split('_')[0]
         assert len(uuid_part) == 36  # UUID length with dashes
-        
-        # Cleanup
-        img_path = os.path.join(IMAGES_FOLDER, raw_text.image_path)
-        if os.path.exists(img_path):
-            os.remove(img_path)
 
 
 def test_process_ocr_zip_ocr_error_raises_runtime_error(app, mocker, tmp_path):
@@ -320,8 +289,6 @@ def test_process_ocr_zip_ocr_error_raises_runtime_error(app, mocker, tmp_path):
     
     reporter = MagicMock()
     reporter.report_progress = MagicMock()
-
-    existing_files = set(os.listdir(IMAGES_FOLDER)) if os.path.isdir(IMAGES_FOLDER) else set()
     
     with app.app_context():
         with pytest.raises(RuntimeError, match='OCR Processing Error: OCR failed'):
@@ -331,10 +298,247 @@ def test_process_ocr_zip_ocr_error_raises_runtime_error(app, mocker, tmp_path):
         raw_texts = db.session.query(RawText).all()
         assert len(raw_texts) == 0
 
-    # Cleanup saved temp images generated before the failure.
-    if os.path.isdir(IMAGES_FOLDER):
-        current_files = set(os.listdir(IMAGES_FOLDER))
-        for file_name in current_files - existing_files:
-            file_path = os.path.join(IMAGES_FOLDER, file_name)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
+    # Images stored before the failure are removed
+    assert os.listdir(app.config['IMAGES_FOLDER']) == []
+
+
+def test_process_ocr_zip_concurrent_keeps_order_and_skips_failed_images(app, mocker, tmp_path):
+    """Test that images are OCRed concurrently, in archive order, and failures only skip the image."""
+    import threading
+    import time
+
+    zip_path = tmp_path / "concurrent.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for i in range(6):
+            img = Image.new('RGB', (40 + i, 40))
+            img_bytes = io.BytesIO()
+            img.save(img_bytes, format='JPEG')
+            zf.writestr(f'page_{i}.jpg', img_bytes.getvalue())
+        zf.writestr('broken.jpg', b'not an image')
+
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+    calls = {}
+
+    def fake_ocr(image):
+        nonlocal active, max_active
+        page = f'page_{image.width - 40}.jpg'
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+            calls[page] = calls.get(page, 0) + 1
+            attempt = calls[page]
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        if page == 'page_2.jpg':
+            raise Exception('OCR failed')
+        if page == 'page_4.jpg' and attempt == 1:
+            raise Exception('Temporary error')
+        return f"Text {page}"
+
+    mocker.patch('app.tasks.ocr_task_logic.ocr_service.perform_ocr', side_effect=fake_ocr)
+    app.config.update(OCR_CONCURRENCY=3, OCR_MAX_RETRIES=1)
+    reporter = MagicMock()
+
+    with app.app_context():
+        result = run_ocr_zip_pipeline(reporter, str(zip_path))
+
+        assert list(result['result']) == ['page_0.jpg', 'page_1.jpg', 'page_3.jpg', 'page_4.jpg', 'page_5.jpg']
+        assert result['failed_files'] == ['page_2.jpg', 'broken.jpg']
+        assert result['result']['page_4.jpg']['text_content'] == "Text page_4.jpg"
+        assert calls['page_2.jpg'] == 2
+        assert 1 < max_active <= 3
+        assert [c.kwargs['current'] for c in reporter.report_progress.call_args_list] == list(range(1, 8))
+
+        raw_texts = db.session.query(RawText).order_by(RawText.id).all()
+        assert [rt.source_file_name for rt in raw_texts] == list(result['result'])
+
+        # Images of failed pages are not kept
+        assert set(os.listdir(app.config['IMAGES_FOLDER'])) == {rt.image_path for rt in raw_texts}
+
+
+def test_ocr_upload_job_resumes_from_checkpoint(app, mocker, tmp_path):
+    """Test that a failed OCR job keeps its ZIP, is requeued and only OCRs the remaining images."""
+    from app.background_jobs import create_background_job
+    from app.database.models import BackgroundJob, BackgroundJobKind, BackgroundJobState, User
+    from app.job_worker import process_next_background_job
+    from app.tasks import ocr_task_logic
+
+    zip_path = tmp_path / "resume.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for i in range(4):
+            img = Image.new('RGB', (40 + i, 40))
+            img_bytes = io.BytesIO()
+            img.save(img_bytes, format='JPEG')
+            zf.writestr(f'scans/page_{i}.jpg', img_bytes.getvalue())
+
+    mock_ocr = mocker.patch(
+        'app.tasks.ocr_task_logic.ocr_service.perform_ocr',
+        side_effect=lambda image: f"Text {image.width - 40}",
+    )
+    real_add_raw_text = ocr_task_logic.add_raw_text
+    stored = []
+
+    def failing_add_raw_text(file_name, text_content, image_path):
+        stored.append(image_path)
+        if len(stored) == 3:
+            raise RuntimeError('database unavailable')
+        return real_add_raw_text(file_name, text_content, image_path)
+
+    add_raw_text = mocker.patch('app.tasks.ocr_task_logic.add_raw_text', side_effect=failing_add_raw_text)
+
+    with app.app_context():
+        user = User(username="ocr_admin", is_admin=True)
+        user.set_password("password123")
+        db.session.add(user)
+        db.session.commit()
+        job_id = create_background_job(
+            db.session,
+            kind=BackgroundJobKind.OCR_UPLOAD,
+            created_by_user_id=user.id,
+            payload_json={'zip_path': str(zip_path)},
+        ).id
+
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.state == BackgroundJobState.PENDING
+        assert 'database unavailable' in job.error_message
+        assert sorted(job.payload_json['checkpoint']['raw_text_ids']) == ['scans/page_0.jpg', 'scans/page_1.jpg']
+        assert db.session.query(RawText).count() == 2
+        assert os.path.exists(zip_path)
+        # Images of the members that were not committed are removed
+        assert set(os.listdir(app.config['IMAGES_FOLDER'])) == set(stored[:2])
+
+        mock_ocr.reset_mock()
+        add_raw_text.side_effect = real_add_raw_text
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.state == BackgroundJobState.SUCCESS
+        assert job.attempts == 2
+        assert mock_ocr.call_count == 2
+        assert list(job.result_json) == ['page_0.jpg', 'page_1.jpg', 'page_2.jpg', 'page_3.jpg']
+        assert job.result_json['page_3.jpg']['text_content'] == "Text 3"
+
+        raw_texts = db.session.query(RawText).all()
+        assert sorted(rt.source_file_name for rt in raw_texts) == ['page_0.jpg', 'page_1.jpg', 'page_2.jpg', 'page_3.jpg']
+        assert not os.path.exists(zip_path)
+        assert set(os.listdir(app.config['IMAGES_FOLDER'])) == {rt.image_path for rt in raw_texts}
+
+
+def test_ocr_upload_job_whose_ocr_calls_all_failed_is_retried(app, mocker, tmp_path):
+    """Test that an archive whose every OCR call failed keeps its ZIP and is retried."""
+    from app.background_jobs import create_background_job
+    from app.database.models import BackgroundJob, BackgroundJobKind, BackgroundJobState, User
+    from app.job_worker import process_next_background_job
+
+    zip_path = tmp_path / "quota.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for i in range(2):
+            img_bytes = io.BytesIO()
+            Image.new('RGB', (40, 40)).save(img_bytes, format='JPEG')
+            zf.writestr(f'page_{i}.jpg', img_bytes.getvalue())
+
+    mock_ocr = mocker.patch(
+        'app.tasks.ocr_task_logic.ocr_service.perform_ocr',
+        side_effect=Exception('quota exceeded'),
+    )
+    app.config.update(OCR_MAX_RETRIES=0, OCR_UPLOAD_MAX_ATTEMPTS=2)
+
+    with app.app_context():
+        user = User(username="ocr_admin", is_admin=True)
+        user.set_password("password123")
+        db.session.add(user)
+        db.session.commit()
+        job_id = create_background_job(
+            db.session,
+            kind=BackgroundJobKind.OCR_UPLOAD,
+            created_by_user_id=user.id,
+            payload_json={'zip_path': str(zip_path)},
+        ).id
+
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.state == BackgroundJobState.PENDING
+        assert 'quota exceeded' in job.error_message
+        assert os.path.exists(zip_path)
+
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.state == BackgroundJobState.FAILURE
+        assert job.attempts == 2
+
+    assert mock_ocr.call_count == 4
+    assert not os.path.exists(zip_path)
+    assert os.listdir(app.config['IMAGES_FOLDER']) == []
+
+
+def test_ocr_upload_job_with_unusable_archive_fails_without_retry(app, mocker, tmp_path):
+    """Test that invalid archives and archives without a decodable image are not retried."""
+    from app.background_jobs import create_background_job
+    from app.database.models import BackgroundJob, BackgroundJobKind, BackgroundJobState, User
+    from app.job_worker import process_next_background_job
+
+    undecodable_path = tmp_path / "undecodable.zip"
+    with zipfile.ZipFile(undecodable_path, 'w') as zf:
+        zf.writestr('page_0.jpg', b'not an image')
+        zf.writestr('page_1.png', b'\x89PNG\r\n\x1a\ntruncated')
+    invalid_path = tmp_path / "invalid.zip"
+    invalid_path.write_bytes(b'not a zip')
+
+    mock_ocr = mocker.patch('app.tasks.ocr_task_logic.ocr_service.perform_ocr', return_value="Text")
+
+    with app.app_context():
+        user = User(username="ocr_admin", is_admin=True)
+        user.set_password("password123")
+        db.session.add(user)
+        db.session.commit()
+        job_ids = [
+            create_background_job(
+                db.session,
+                kind=BackgroundJobKind.OCR_UPLOAD,
+                created_by_user_id=user.id,
+                payload_json={'zip_path': str(path)},
+            ).id
+            for path in (undecodable_path, invalid_path)
+        ]
+
+        while process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300):
+            pass
+
+        for job_id in job_ids:
+            job = db.session.get(BackgroundJob, job_id)
+            assert job.state == BackgroundJobState.FAILURE
+            assert job.attempts == 1
+        assert 'magic bytes' in db.session.get(BackgroundJob, job_ids[0]).error_message
+
+    mock_ocr.assert_not_called()
+    assert not os.path.exists(undecodable_path)
+    assert not os.path.exists(invalid_path)
+
+
+def test_process_ocr_zip_downscales_large_images(app, mocker, tmp_path):
+    """Test that images are decoded at reduced size and capped at OCR_MAX_RESOLUTION."""
+    zip_path = tmp_path / "large.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for name, size, image_format in (('scan.jpg', (4000, 3000), 'JPEG'), ('scan.png', (1200, 2400), 'PNG'), ('small.jpg', (300, 200), 'JPEG')):
+            img_bytes = io.BytesIO()
+            Image.new('L', size, color=255).save(img_bytes, format=image_format)
+            zf.writestr(name, img_bytes.getvalue())
+
+    sizes = {}
+    mocker.patch(
+        'app.tasks.ocr_task_logic.ocr_service.perform_ocr',
+        side_effect=lambda image: sizes.setdefault(image.size, image.mode) and "Text",
+    )
+    app.config.update(OCR_MAX_RESOLUTION=1000)
+
+    with app.app_context():
+        run_ocr_zip_pipeline(None, str(zip_path))
+
+        assert sizes == {(1000, 750): 'RGB', (500, 1000): 'RGB', (300, 200): 'RGB'}
+        for rt in db.session.query(RawText).all():
+            saved_path = os.path.join(app.config['IMAGES_FOLDER'], rt.image_path)
+            with Image.open(saved_path) as saved:
+                assert max(saved.size) <= 1000
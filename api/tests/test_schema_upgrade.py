@@ -0,0 +1,139 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.database.models import Text, TextListingSummary, TextUploadBatch
+from app.database.scripts.upgrade import upgrade_database_schema
+from app.text_listing import backfill_text_listing_summaries
+
+
+# Tables changed since the first release, as they were created by it
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER NOT NULL,
+        username VARCHAR(30) NOT NULL,
+        hashed_password VARCHAR(120) NOT NULL,
+        last_login TIMESTAMP,
+        is_admin BOOLEAN NOT NULL,
+        is_active BOOLEAN NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (username)
+    )""",
+    """CREATE TABLE text_upload_batches (
+        id INTEGER NOT NULL,
+        created_by_user_id INTEGER NOT NULL,
+        source_file_name VARCHAR(255),
+        status VARCHAR(21) NOT NULL,
+        total_files INTEGER NOT NULL,
+        created_texts INTEGER NOT NULL,
+        processed_texts INTEGER NOT NULL,
+        failed_texts INTEGER NOT NULL,
+        failed_files TEXT NOT NULL,
+        last_error TEXT,
+        created_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL,
+        import_finished_at TIMESTAMP,
+        processing_started_at TIMESTAMP,
+        processing_finished_at TIMESTAMP,
+        PRIMARY KEY (id),
+        FOREIGN KEY(created_by_user_id) REFERENCES users (id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX ix_text_upload_batches_status ON text_upload_batches (status)",
+    "CREATE INDEX ix_text_upload_batches_created_by_user_id ON text_upload_batches (created_by_user_id)",
+    """CREATE TABLE texts (
+        id INTEGER NOT NULL,
+        grade SMALLINT,
+        source_file_name VARCHAR(255),
+        creation_date TIMESTAMP NOT NULL,
+        processing_status VARCHAR(10) NOT NULL,
+        upload_batch_id INTEGER,
+        processing_started_at TIMESTAMP,
+        processing_heartbeat_at TIMESTAMP,
+        processing_attempts INTEGER NOT NULL,
+        last_processing_error TEXT,
+        PRIMARY KEY (id),
+        FOREIGN KEY(upload_batch_id) REFERENCES text_upload_batches (id) ON DELETE SET NULL
+    )""",
+    "CREATE INDEX ix_texts_upload_batch_id ON texts (upload_batch_id)",
+    """CREATE TABLE tokens (
+        id INTEGER NOT NULL,
+        text_id INTEGER NOT NULL,
+        token_text VARCHAR(512) NOT NULL,
+        is_word BOOLEAN NOT NULL,
+        position INTEGER NOT NULL,
+        to_be_normalized BOOLEAN,
+        whitespace_after TEXT,
+        whitelisted BOOLEAN NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_text_position UNIQUE (text_id, position),
+        FOREIGN KEY(text_id) REFERENCES texts (id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX ix_tokens_text_id ON tokens (text_id)",
+    """INSERT INTO texts (id, grade, source_file_name, creation_date, processing_status, processing_attempts)
+       VALUES (1, 3, 'essay.txt', '2025-01-01 00:00:00', 'READY', 0)""",
+]
+
+
+def _baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+    return engine
+
+
+def test_upgrade_database_schema_upgrades_the_baseline_schema(tmp_path):
+    engine = _baseline_engine(tmp_path)
+
+    upgrade_database_schema(engine)
+    # Running it again is a no-op
+    upgrade_database_schema(engine)
+
+    inspector = inspect(engine)
+    assert "content_version" in {column["name"] for column in inspector.get_columns("texts")}
+    assert "ix_tokens_token_text" in {index["name"] for index in inspector.get_indexes("tokens")}
+    assert {"background_jobs", "raw_texts", "textsusers", "chunked_uploads"} <= set(inspector.get_table_names())
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT content_version FROM texts WHERE id = 1")).scalar_one() == 1
+
+
+def test_upgraded_database_gets_listing_summaries(tmp_path):
+    engine = _baseline_engine(tmp_path)
+
+    upgrade_database_schema(engine)
+
+    assert "text_listing_summaries" in inspect(engine).get_table_names()
+    with Session(engine) as session:
+        assert backfill_text_listing_summaries(session) == 1
+        summary = session.get(TextListingSummary, 1)
+        assert (summary.grade, summary.source_file_name, summary.assigned_usernames) == (3, "essay.txt", [])
+
+
+def test_upgraded_database_supports_duplicate_detection(tmp_path):
+    engine = _baseline_engine(tmp_path)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, hashed_password, is_admin, is_active)"
+            " VALUES (1, 'admin', 'x', 1, 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO text_upload_batches (id, created_by_user_id, status, total_files, created_texts,"
+            " processed_texts, failed_texts, failed_files, created_at, updated_at)"
+            " VALUES (1, 1, 'COMPLETED', 1, 1, 1, 0, '[]', '2025-01-01', '2025-01-01')"
+        ))
+
+    upgrade_database_schema(engine)
+
+    inspector = inspect(engine)
+    assert "ix_texts_content_sha256" in {index["name"] for index in inspector.get_indexes("texts")}
+    assert "ix_text_upload_batches_archive_sha256" in {
+        index["name"] for index in inspector.get_indexes("text_upload_batches")
+    }
+    with Session(engine) as session:
+        assert session.get(Text, 1).content_sha256 is None
+        old_batch = session.get(TextUploadBatch, 1)
+        assert (old_batch.archive_sha256, old_batch.skipped_files) == (None, "[]")
+
+        session.add(TextUploadBatch(created_by_user_id=1, archive_sha256="a" * 64))
+        session.commit()
+        assert session.query(TextUploadBatch).filter_by(archive_sha256="a" * 64).count() == 1
@@ -0,0 +1,122 @@
+from app.database import queries
+from app.database.models import ProcessingStatus, Text, TextListingSummary, TextsUsers, User
+from app.extensions import db
+from app.text_listing import backfill_text_listing_summaries
+
+
+def _create_user(username):
+    user = User(username=username)
+    user.set_password("password123")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_summary_created_and_updated_with_text(app):
+    text = Text(source_file_name="essay.docx", grade=3)
+    db.session.add(text)
+    db.session.commit()
+
+    summary = db.session.get(TextListingSummary, text.id)
+    assert summary.source_file_name == "essay.docx"
+    assert summary.processing_status == ProcessingStatus.PENDING
+    assert summary.assigned_usernames == []
+
+    text.processing_status = ProcessingStatus.READY
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(TextListingSummary, text.id).processing_status == ProcessingStatus.READY
+
+
+def test_summary_tracks_assignments_and_normalization(app):
+    ana = _create_user("ana")
+    bia = _create_user("bia")
+    text = Text(source_file_name="essay.docx")
+    db.session.add(text)
+    db.session.commit()
+
+    queries.bulk_assign_texts(db.session, [text.id], [bia.id, ana.id])
+    queries.assign_text_to_user(db.session, text.id, ana.id)
+    db.session.expire_all()
+
+    summary = db.session.get(TextListingSummary, text.id)
+    assert summary.assigned_usernames == ["ana", "bia"]
+    assert summary.normalized_by_any is False
+
+    queries.toggle_normalized(db.session, text.id, bia.id)
+    queries.bulk_unassign_texts(db.session, [text.id], [ana.id])
+    db.session.expire_all()
+
+    summary = db.session.get(TextListingSummary, text.id)
+    assert summary.assigned_usernames == ["bia"]
+    assert summary.normalized_by_any is True
+
+
+def test_summary_removed_with_text(app):
+    text = Text(source_file_name="essay.docx")
+    db.session.add(text)
+    db.session.commit()
+    text_id = text.id
+
+    db.session.delete(text)
+    db.session.commit()
+
+    assert db.session.get(TextListingSummary, text_id) is None
+
+
+def test_get_filtered_texts_reads_summary(app):
+    ana = _create_user("ana")
+    bia = _create_user("bia")
+    texts = [Text(source_file_name="20152t4p4363n3r.docx", grade=4), Text(source_file_name="other.txt", grade=5)]
+    db.session.add_all(texts)
+    db.session.commit()
+    db.session.add(TextsUsers(text_id=texts[0].id, user_id=ana.id, assigned=True, normalized=True))
+    db.session.commit()
+
+    rows = queries.get_filtered_texts(db.session, user_id=ana.id, file_name="20152 t4")
+    assert [(row.id, row.users_assigned, row.normalized_by_user) for row in rows] == [
+        (texts[0].id, ["ana"], True)
+    ]
+
+    rows = queries.get_filtered_texts(db.session, user_id=bia.id, assigned_users=["ana"])
+    assert [(row.id, row.normalized_by_user) for row in rows] == [(texts[0].id, False)]
+
+    rows = queries.get_filtered_texts(db.session, user_id=ana.id, normalized=False)
+    assert [row.id for row in rows] == [texts[1].id]
+
+
+def test_backfill_text_listing_summaries(app):
+    text = Text(source_file_name="legacy.txt")
+    db.session.add(text)
+    db.session.commit()
+    db.session.query(TextListingSummary).delete()
+    db.session.commit()
+
+    assert backfill_text_listing_summaries(db.session) == 1
+    assert db.session.get(TextListingSummary, text.id).source_file_name == "legacy.txt"
+    assert backfill_text_listing_summaries(db.session) == 0
+
+
+def test_search_texts_by_file_name_ranks_matches(app):
+    db.session.add_all([
+        Text(source_file_name="2015_t4p4_redacao.docx"),
+        Text(source_file_name="redacao_2015.docx"),
+        Text(source_file_name="2016_t1p1.docx"),
+        Text(source_file_name="100%_final.docx"),
+    ])
+    db.session.commit()
+
+    prefix = queries.search_texts_by_file_name(db.session, "2015", mode="prefix")
+    assert [row.source_file_name for row in prefix] == ["2015_t4p4_redacao.docx"]
+
+    substring = queries.search_texts_by_file_name(db.session, "2015", mode="substring")
+    assert [row.source_file_name for row in substring] == ["2015_t4p4_redacao.docx", "redacao_2015.docx"]
+
+    fuzzy = queries.search_texts_by_file_name(db.session, "2015 t4p4", mode="fuzzy")
+    assert fuzzy[0].source_file_name == "2015_t4p4_redacao.docx"
+    assert fuzzy[0].score >= fuzzy[-1].score
+
+    # LIKE wildcards in the term are matched literally
+    assert [row.source_file_name for row in queries.search_texts_by_file_name(db.session, "%_", mode="substring")] == ["100%_final.docx"]
+    assert queries.search_texts_by_file_name(db.session, "   ") == []
@@ -1,4 +1,5 @@
 import base64
+import os
 import zipfile
 from unittest.mock import MagicMock
 
@@ -36,7 +37,7 @@ def test_run_text_upload_zip_pipeline_success(app, mocker, tmp_path):
     tokenizer.tokenize.return_value = []
 
     mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
-    mocker.patch("app.database.queries.add_text", return_value=11)
+    mocker.patch("app.database.queries.add_texts_batch", return_value=[11])
 
     task = MagicMock()
     batch_id = _create_upload_batch(app)
@@ -87,6 +88,7 @@ def test_run_text_upload_zip_pipeline_rejects_large_archives(app, tmp_path):
 
     task = MagicMock()
     batch_id = _create_upload_batch(app)
+    app.config.update(TEXT_UPLOAD_MAX_FILES=200)
 
     with app.app_context(), pytest.raises(RuntimeError, match="Maximum of 200 files allowed per upload."):
         run_text_upload_zip_pipeline(task, batch_id=batch_id, zip_path=str(zip_path))
@@ -105,8 +107,11 @@ def test_run_text_upload_zip_pipeline_collects_partial_failures(app, mocker, tmp
     tokenizer.tokenize.return_value = []
 
     mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
-    add_text = mocker.patch("app.database.queries.add_text")
-    add_text.side_effect = [11, RuntimeError("insert failed"), 12]
+    # The chunk insert fails, then its texts are retried one by one
+    mocker.patch(
+        "app.database.queries.add_texts_batch",
+        side_effect=[RuntimeError("insert failed"), [11], RuntimeError("insert failed"), [12]],
+    )
 
     task = MagicMock()
     batch_id = _create_upload_batch(app)
@@ -121,32 +126,119 @@ def test_run_text_upload_zip_pipeline_collects_partial_failures(app, mocker, tmp
     assert not zip_path.exists()
 
 
-def test_run_text_upload_zip_pipeline_accepts_base64_payload(app, mocker, tmp_path):
+def test_text_upload_import_job_resumes_from_checkpoint(app, mocker, tmp_path):
+    from app.background_jobs import create_background_job
+    from app.database.models import BackgroundJob, BackgroundJobKind, BackgroundJobState
+    from app.extensions import db
+    from app.job_worker import process_next_background_job
+    from app.tasks import text_upload_task_logic
+
+    zip_path = tmp_path / "resumable.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        for index in range(6):
+            zip_file.writestr(f"doc-{index}.txt", f"texto {index}")
+
+    tokenizer = MagicMock()
+    tokenizer.tokenize.return_value = []
+    mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
+
+    real_insert = text_upload_task_logic._insert_parsed_texts
+    chunks = []
+
+    def failing_insert(session, batch_id, parsed):
+        chunks.append([name for name, _, _ in parsed])
+        if len(chunks) == 3:
+            raise ConnectionError("database unavailable")
+        return real_insert(session, batch_id, parsed)
+
+    insert = mocker.patch(
+        "app.tasks.text_upload_task_logic._insert_parsed_texts", side_effect=failing_insert
+    )
+
+    batch_id = _create_upload_batch(app)
+    app.config.update(TEXT_UPLOAD_INSERT_BATCH_SIZE=2)
+
+    with app.app_context():
+        job_id = create_background_job(
+            db.session,
+            kind=BackgroundJobKind.TEXT_UPLOAD_IMPORT,
+            created_by_user_id=db.session.get(TextUploadBatch, batch_id).created_by_user_id,
+            payload_json={"batch_id": batch_id, "zip_path": str(zip_path)},
+        ).id
+
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.state == BackgroundJobState.PENDING
+        assert "database unavailable" in job.error_message
+        assert job.payload_json["checkpoint"] == {"members_done": 4, "linked": 0}
+        assert db.session.query(Text).filter_by(upload_batch_id=batch_id).count() == 4
+        assert zip_path.exists()
+
+        insert.side_effect = real_insert
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_id)
+        assert job.state == BackgroundJobState.SUCCESS
+        assert job.attempts == 2
+        saved_names = [db.session.get(Text, text_id).source_file_name for text_id in job.result_json["text_ids"]]
+        saved_batch = db.session.get(TextUploadBatch, batch_id)
+        assert saved_batch.status == TextUploadBatchStatus.QUEUED
+        assert saved_batch.last_error is None
+
+    assert saved_names == [f"doc-{index}.txt" for index in range(6)]
+    assert tokenizer.tokenize.call_count == 8
+    assert not zip_path.exists()
+
+
+def test_legacy_base64_text_upload_jobs_are_spooled_to_files(app, mocker, tmp_path):
+    from app.background_jobs import create_background_job
+    from app.database.models import BackgroundJob, BackgroundJobKind, BackgroundJobState
+    from app.extensions import db
+    from app.job_worker import process_next_background_job
+    from app.tasks.text_upload_task_logic import migrate_legacy_text_upload_jobs
+
     zip_buffer = tmp_path / "payload.zip"
     with zipfile.ZipFile(zip_buffer, "w") as zip_file:
         zip_file.writestr("doc.txt", "hello world")
 
     tokenizer = MagicMock()
     tokenizer.tokenize.return_value = []
-
     mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
-    mocker.patch("app.database.queries.add_text", return_value=42)
+    app.config["TEMP_UPLOADS_FOLDER"] = str(tmp_path)
+    mocker.patch("app.tasks.text_upload_task_logic.LEGACY_PAYLOAD_DECODE_CHUNK", 8)
 
-    task = MagicMock()
     zip_payload_b64 = base64.b64encode(zip_buffer.read_bytes()).decode("ascii")
     batch_id = _create_upload_batch(app)
 
     with app.app_context():
-        result = run_text_upload_zip_pipeline(
-            task,
-            batch_id=batch_id,
-            zip_payload_b64=zip_payload_b64,
-            original_filename="payload.zip",
-        )
-
-    assert result["result"]["text_ids"] == [42]
-    assert result["result"]["created"] == 1
-    assert result["result"]["batch_id"] == batch_id
+        user_id = db.session.get(TextUploadBatch, batch_id).created_by_user_id
+        invalid_batch = TextUploadBatch(created_by_user_id=user_id, source_file_name="broken.zip")
+        db.session.add(invalid_batch)
+        db.session.commit()
+        invalid_batch_id = invalid_batch.id
+        job_ids = [
+            create_background_job(
+                db.session,
+                kind=BackgroundJobKind.TEXT_UPLOAD_IMPORT,
+                created_by_user_id=user_id,
+                payload_json={"batch_id": target, "zip_payload_b64": encoded, "original_filename": "payload.zip"},
+            ).id
+            for target, encoded in ((batch_id, zip_payload_b64), (invalid_batch_id, "not*base64"))
+        ]
+
+        assert migrate_legacy_text_upload_jobs(db.session) == 1
+        job, invalid_job = (db.session.get(BackgroundJob, job_id) for job_id in job_ids)
+        assert "zip_payload_b64" not in job.payload_json
+        with open(job.payload_json["zip_path"], "rb") as archive:
+            assert archive.read() == zip_buffer.read_bytes()
+        assert invalid_job.state == BackgroundJobState.FAILURE
+        assert db.session.get(TextUploadBatch, invalid_batch_id).status == TextUploadBatchStatus.FAILED
+
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        job = db.session.get(BackgroundJob, job_ids[0])
+        assert job.state == BackgroundJobState.SUCCESS
+        assert job.result_json["created"] == 1
+        assert job.result_json["batch_id"] == batch_id
+        assert not os.path.exists(job.payload_json["zip_path"])
 
 
 def test_run_text_upload_zip_pipeline_keeps_imported_texts_pending_until_worker_claims_them(app, mocker, tmp_path):
@@ -193,3 +285,130 @@ def test_run_text_upload_zip_pipeline_marks_batch_queued_after_import(app, mocke
 
     assert saved_batch.status == TextUploadBatchStatus.QUEUED
     assert saved_batch.import_finished_at is not None
+
+
+def test_run_text_upload_zip_pipeline_parses_members_in_worker_processes(app, mocker, tmp_path):
+    import io
+
+    from docx import Document
+
+    from app.extensions import db
+
+    docx_buffer = io.BytesIO()
+    document = Document()
+    document.add_paragraph("primeiro paragrafo")
+    document.add_paragraph("segundo paragrafo")
+    document.save(docx_buffer)
+
+    zip_path = tmp_path / "parallel.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        for index in range(5):
+            zip_file.writestr(f"doc-{index}.txt", f"texto {index}")
+        zip_file.writestr("essay.docx", docx_buffer.getvalue())
+        zip_file.writestr("broken.docx", b"not a docx")
+
+    tokenizer = MagicMock()
+    tokenizer.tokenize.return_value = []
+    mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
+
+    task = MagicMock()
+    batch_id = _create_upload_batch(app)
+    app.config.update(TEXT_UPLOAD_PARSE_WORKERS=2, TEXT_UPLOAD_INSERT_BATCH_SIZE=2)
+
+    with app.app_context():
+        result = run_text_upload_zip_pipeline(task, batch_id=batch_id, zip_path=str(zip_path))
+        saved_names = [db.session.get(Text, text_id).source_file_name for text_id in result["result"]["text_ids"]]
+
+    assert saved_names == [f"doc-{index}.txt" for index in range(5)] + ["essay.docx"]
+    assert result["failed_files"] == ["broken.docx"]
+    parsed_contents = [call.args[0] for call in tokenizer.tokenize.call_args_list]
+    assert parsed_contents == [f"texto {index}" for index in range(5)] + ["primeiro paragrafo\nsegundo paragrafo"]
+    assert not zip_path.exists()
+
+
+def _content_sha256(content: str) -> str:
+    import hashlib
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def test_run_text_upload_zip_pipeline_skips_known_documents(app, mocker, tmp_path):
+    from app.extensions import db
+
+    zip_path = tmp_path / "again.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr("known.txt", "hello world")
+        zip_file.writestr("new.txt", "texto novo")
+        zip_file.writestr("copy-of-new.txt", "texto novo")
+
+    tokenizer = MagicMock()
+    tokenizer.tokenize.return_value = []
+    mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
+
+    batch_id = _create_upload_batch(app)
+    with app.app_context():
+        db.session.add(Text(source_file_name="old.txt", content_sha256=_content_sha256("hello world")))
+        db.session.commit()
+
+        result = run_text_upload_zip_pipeline(
+            MagicMock(), batch_id=batch_id, zip_path=str(zip_path), duplicate_policy="skip"
+        )
+        saved_text = db.session.get(Text, result["result"]["text_ids"][0])
+        saved_batch = db.session.get(TextUploadBatch, batch_id)
+
+    assert result["result"]["created"] == 1
+    assert result["result"]["skipped_files"] == ["known.txt", "copy-of-new.txt"]
+    assert saved_text.source_file_name == "new.txt"
+    assert saved_text.content_sha256 == _content_sha256("texto novo")
+    assert tokenizer.tokenize.call_count == 1
+    assert saved_batch.status == TextUploadBatchStatus.QUEUED
+
+
+def test_run_text_upload_zip_pipeline_links_processed_documents(app, mocker, tmp_path):
+    from app.database.models import Suggestion, Token, TokensSuggestions
+    from app.extensions import db
+
+    zip_path = tmp_path / "linked.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_file:
+        zip_file.writestr("essay.txt", "Eu nao")
+
+    tokenizer = MagicMock()
+    mocker.patch("app.text_pipeline.get_tokenizer", return_value=tokenizer)
+
+    batch_id = _create_upload_batch(app)
+    with app.app_context():
+        source = Text(
+            source_file_name="essay.txt",
+            grade=3,
+            processing_status=ProcessingStatus.READY,
+            content_sha256=_content_sha256("Eu nao"),
+        )
+        db.session.add(source)
+        db.session.flush()
+        db.session.add(Token(text_id=source.id, token_text="Eu", is_word=True, position=0, whitespace_after=" "))
+        misspelled = Token(text_id=source.id, token_text="nao", is_word=True, position=1, to_be_normalized=True)
+        suggestion = Suggestion(token_text="não")
+        db.session.add_all([misspelled, suggestion])
+        db.session.flush()
+        db.session.add(TokensSuggestions(token_id=misspelled.id, suggestion_id=suggestion.id))
+        db.session.commit()
+        source_id = source.id
+
+        result = run_text_upload_zip_pipeline(
+            MagicMock(), batch_id=batch_id, zip_path=str(zip_path), duplicate_policy="link"
+        )
+        linked = db.session.get(Text, result["result"]["text_ids"][0])
+        linked_id, linked_status, linked_grade = linked.id, linked.processing_status, linked.grade
+        linked_tokens = [
+            (token.token_text, token.to_be_normalized, token.whitespace_after, [s.token_text for s in token.suggestions])
+            for token in linked.tokens
+        ]
+        saved_batch = db.session.get(TextUploadBatch, batch_id)
+
+    assert result["result"]["linked"] == 1
+    assert linked_id != source_id
+    assert linked_status == ProcessingStatus.READY
+    assert linked_grade == 3
+    assert linked_tokens == [("Eu", None, " ", []), ("nao", True, "", ["não"])]
+    tokenizer.tokenize.assert_not_called()
+    assert saved_batch.status == TextUploadBatchStatus.COMPLETED
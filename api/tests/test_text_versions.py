@@ -0,0 +1,95 @@
+from app.database import queries
+from app.database.models import Suggestion, Text, Token, TokensSuggestions, User
+from app.extensions import db
+
+
+def _create_text(token_texts=("Eu", "nao", "sei")):
+    text = Text(source_file_name="essay.txt")
+    db.session.add(text)
+    db.session.flush()
+    db.session.add_all([
+        Token(text_id=text.id, token_text=token_text, is_word=True, position=position, to_be_normalized=False)
+        for position, token_text in enumerate(token_texts)
+    ])
+    db.session.commit()
+    return text.id
+
+
+def _version(text_id):
+    db.session.expire_all()
+    return queries.get_text_content_version(db.session, text_id)
+
+
+def test_content_version_bumped_on_changes(app):
+    user = User(username="ana")
+    user.set_password("password123")
+    db.session.add(user)
+    db.session.commit()
+    text_id = _create_text()
+    other_text_id = _create_text(("outro",))
+    version = _version(text_id)
+
+    queries.save_normalization(db.session, text_id, user.id, 1, 1, "não")
+    assert _version(text_id) == version + 1
+
+    # Several flushes in one transaction bump once
+    token = db.session.query(Token).filter_by(text_id=text_id, position=0).one()
+    token.to_be_normalized = True
+    db.session.flush()
+    db.session.add(Suggestion(token_text="eu"))
+    db.session.flush()
+    suggestion = db.session.query(Suggestion).filter_by(token_text="eu").one()
+    db.session.add(TokensSuggestions(token_id=token.id, suggestion_id=suggestion.id))
+    db.session.commit()
+    assert _version(text_id) == version + 2
+
+    queries.delete_all_normalizations(db.session, user.id, text_id)
+    assert _version(text_id) == version + 3
+
+    queries.toggle_normalized(db.session, text_id, user.id)
+    assert _version(text_id) == version + 4
+
+    queries.add_whitelist_token(db.session, "sei")
+    assert _version(text_id) == version + 5
+    assert _version(other_text_id) == 1
+
+    text = db.session.get(Text, text_id)
+    text.processing_heartbeat_at = None
+    db.session.commit()
+    assert _version(text_id) == version + 5
+
+
+def test_text_detail_conditional_get(auth_client):
+    with auth_client.application.app_context():
+        text_id = _create_text()
+        user_id = db.session.query(User.id).filter_by(username="testuser").scalar()
+
+    response = auth_client.get(f'/api/texts/{text_id}')
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert len(response.json["tokens"]) == 3
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert etag == f'"text-{text_id}-v1-u{user_id}"'
+
+    response = auth_client.get(f'/api/texts/{text_id}', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    normalizations = auth_client.get(f'/api/texts/{text_id}/normalizations')
+    assert normalizations.status_code == 200
+    assert auth_client.get(
+        f'/api/texts/{text_id}/normalizations', headers={"If-None-Match": normalizations.headers["ETag"]}
+    ).status_code == 304
+
+    auth_client.post(
+        f'/api/texts/{text_id}/normalizations',
+        json={"first_index": 1, "last_index": 1, "new_token": "não"},
+    )
+
+    response = auth_client.get(f'/api/texts/{text_id}', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json["id"] == text_id
+    assert auth_client.get(
+        f'/api/texts/{text_id}/normalizations', headers={"If-None-Match": normalizations.headers["ETag"]}
+    ).json == {"1": {"last_index": 1, "new_token": "não"}}
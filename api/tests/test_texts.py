@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import MagicMock
-from app.database.models import Text, TextsUsers, Normalization, Token
+from app.database.models import Text, TextsUsers, Normalization, Token, User
 from app.extensions import db
 from datetime import datetime
 
@@ -115,6 +115,50 @@ def test_get_text_detail(auth_client, mocker):
     assert data["id"] == 1
     assert len(data["tokens"]) == 1
 
+def _text_detail_with_tokens(tokens):
+    return {
+        "id": 1,
+        "grade": 10,
+        "tokens": tokens,
+        "normalized_by_user": False,
+        "source_file_name": "test.txt",
+        "assigned_to_user": True,
+    }
+
+
+def _failing_tokens(count):
+    for position in range(count):
+        yield {"id": position, "text": "palavra", "isWord": True, "position": position, "toBeNormalized": False}
+    raise RuntimeError("connection lost")
+
+
+def test_get_text_detail_token_query_error_returns_500(auth_client, mocker):
+    """Test that a failure reading the first tokens still returns the error envelope."""
+    mocker.patch('app.database.queries.get_text_by_id', return_value=_text_detail_with_tokens(_failing_tokens(0)))
+
+    response = auth_client.get('/api/texts/1')
+
+    assert response.status_code == 500
+    assert response.json["code"] == "INTERNAL_SERVER_ERROR"
+
+
+def test_get_text_detail_logs_and_rolls_back_when_stream_fails(auth_client, mocker, caplog):
+    """Test that an error after the response started is logged and the session rolled back."""
+    from app.routes import text_routes
+
+    mocker.patch.object(text_routes, 'TOKEN_STREAM_CHUNK_SIZE', 1)
+    mocker.patch('app.database.queries.get_text_by_id', return_value=_text_detail_with_tokens(_failing_tokens(2)))
+    rollback = mocker.patch.object(text_routes.session, 'rollback')
+
+    response = auth_client.get('/api/texts/1')
+
+    assert response.status_code == 200
+    with pytest.raises(RuntimeError, match="connection lost"):
+        response.get_data()
+    assert "Streaming the detail of text 1 failed" in caplog.text
+    rollback.assert_called_once()
+
+
 def test_get_text_detail_not_found(auth_client, mocker):
     """Test retrieving non-existent text."""
     mock_get = mocker.patch('app.database.queries.get_text_by_id')
@@ -252,3 +296,264 @@ def test_delete_whitelist_token(auth_client, mocker):
     assert response.status_code == 200
     assert response.json["message"] == "Token 'token text' removed from whitelist."
     mock_remove.assert_called_once_with(mocker.ANY, "token text")
+
+
+def test_get_texts_list_paginated_returns_next_cursor(auth_client, mocker):
+    """Test keyset pagination on the texts listing."""
+    mock_get = mocker.patch('app.database.queries.get_texts_data')
+    mock_get.return_value = [
+        MagicMock(id=text_id, sort_value=text_id, grade=None, normalized_by_user=False,
+                  source_file_name=f"{text_id}.txt", users_assigned=[], processing_status="READY")
+        for text_id in (1, 2, 3)
+    ]
+
+    response = auth_client.get('/api/texts/?limit=2')
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json["textsData"]] == [1, 2]
+    assert response.json["nextCursor"]
+    assert mock_get.call_args.kwargs["limit"] == 3
+
+    mock_get.return_value = [
+        MagicMock(id=3, sort_value=3, grade=None, normalized_by_user=False,
+                  source_file_name="3.txt", users_assigned=[], processing_status="READY")
+    ]
+    response = auth_client.get(f'/api/texts/?limit=2&cursor={response.json["nextCursor"]}')
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json["textsData"]] == [3]
+    assert response.json["nextCursor"] is None
+    assert mock_get.call_args.kwargs["after"] == (2, 2)
+
+
+def test_get_texts_list_projection(auth_client, mocker):
+    """Test the fields= projection only returns the requested fields."""
+    mock_get = mocker.patch('app.database.queries.get_texts_data')
+    mock_get.return_value = [MagicMock(id=1, sourceFileName="a.txt", source_file_name="a.txt")]
+
+    response = auth_client.get('/api/texts/?fields=sourceFileName')
+
+    assert response.status_code == 200
+    assert response.json == {"textsData": [{"id": 1, "sourceFileName": "a.txt"}]}
+    assert mock_get.call_args.kwargs["fields"] == ["id", "source_file_name"]
+
+
+def test_get_texts_list_invalid_options(auth_client, mocker):
+    """Test validation of unknown fields, sort keys and malformed cursors."""
+    mock_get = mocker.patch('app.database.queries.get_texts_data')
+
+    assert auth_client.get('/api/texts/?fields=password').status_code == 400
+    assert auth_client.get('/api/texts/?sort=creation_date').status_code == 400
+    response = auth_client.get('/api/texts/?cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.json["details"][0]["field"] == "cursor"
+    mock_get.assert_not_called()
+
+
+def test_get_texts_list_rejects_tampered_cursors(auth_client, mocker):
+    """Test that cursor values of the wrong type are rejected before reaching SQL."""
+    from app.utils.pagination import encode_cursor
+
+    mock_filtered = mocker.patch('app.database.queries.get_filtered_texts')
+
+    for sort, values in (
+        ("grade", ["x", {}]),
+        ("grade", [3, "7"]),
+        ("grade", [True, 7]),
+        ("source_file_name", [5, 7]),
+        ("id", [None, 7]),
+        ("-id", [7, 7.5]),
+    ):
+        cursor = encode_cursor([sort, *values])
+        response = auth_client.get(f'/api/texts/?sort={sort}&cursor={cursor}')
+        assert response.status_code == 400, (sort, values)
+        assert response.json["details"] == [{"field": "cursor", "message": "Invalid cursor"}]
+
+    mock_filtered.assert_not_called()
+
+
+def test_get_filtered_texts_keyset_query(app):
+    """Test keyset seeking of get_filtered_texts directly against the database."""
+    from app.database import queries
+
+    with app.app_context():
+        for name, grade in [("b.txt", 2), ("a.txt", 2), ("c.txt", None), ("d.txt", 1)]:
+            db.session.add(Text(source_file_name=name, grade=grade))
+        db.session.commit()
+
+        first_page = queries.get_filtered_texts(
+            db.session, sort_by="grade", descending=True, limit=2, fields=["id", "source_file_name"]
+        )
+        assert [row.source_file_name for row in first_page] == ["a.txt", "b.txt"]
+
+        last_row = first_page[-1]
+        second_page = queries.get_filtered_texts(
+            db.session,
+            sort_by="grade",
+            descending=True,
+            after=(last_row.sort_value, last_row.id),
+            limit=2,
+            fields=["id", "source_file_name"],
+        )
+        assert [row.source_file_name for row in second_page] == ["d.txt", "c.txt"]
+
+
+def test_search_texts(auth_client, mocker):
+    """Test the ranked file name search endpoint."""
+    mock_search = mocker.patch('app.database.queries.search_texts_by_file_name')
+    mock_search.return_value = [
+        MagicMock(id=3, source_file_name="2015_t4p4.docx", grade=2, processing_status="READY", score=0.8123456),
+    ]
+
+    response = auth_client.get('/api/texts/search?q=2015&mode=prefix&limit=5')
+    assert response.status_code == 200
+    assert response.json["results"] == [
+        {"id": 3, "sourceFileName": "2015_t4p4.docx", "grade": 2, "processingStatus": "READY", "score": 0.8123}
+    ]
+    assert mock_search.call_args.args[1] == "2015"
+    assert mock_search.call_args.kwargs == {"mode": "prefix", "limit": 5}
+
+    response = auth_client.get('/api/texts/search?q=2015&mode=regex')
+    assert response.status_code == 400
+
+
+def test_get_text_detail_from_database(auth_client):
+    """Test the streamed text detail with tokens and aggregated suggestions."""
+    from app.database.models import Suggestion, TokensSuggestions, User
+
+    with auth_client.application.app_context():
+        user = db.session.query(User).filter_by(username="testuser").first()
+        text = Text(source_file_name="essay.txt", grade=3)
+        db.session.add(text)
+        db.session.flush()
+        db.session.add(TextsUsers(text_id=text.id, user_id=user.id, assigned=True, normalized=False))
+        tokens = [
+            Token(text_id=text.id, token_text="Eu", is_word=True, position=0, to_be_normalized=False, whitespace_after=" "),
+            Token(text_id=text.id, token_text="nao", is_word=True, position=1, to_be_normalized=True, whitespace_after=""),
+            Token(text_id=text.id, token_text=".", is_word=False, position=2, to_be_normalized=False, whitespace_after=None),
+        ]
+        db.session.add_all(tokens)
+        suggestions = [Suggestion(token_text="não"), Suggestion(token_text="nau")]
+        db.session.add_all(suggestions)
+        db.session.flush()
+        db.session.add_all([
+            TokensSuggestions(token_id=tokens[1].id, suggestion_id=suggestions[1].id),
+            TokensSuggestions(token_id=tokens[1].id, suggestion_id=suggestions[0].id),
+        ])
+        db.session.commit()
+        text_id = text.id
+
+    response = auth_client.get(f'/api/texts/{text_id}')
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    data = response.json
+    assert data["sourceFileName"] == "essay.txt"
+    assert data["assignedToUser"] is True
+    assert data["normalizedByUser"] is False
+    assert [token["text"] for token in data["tokens"]] == ["Eu", "nao", "."]
+    assert data["tokens"][0]["candidates"] == []
+    assert data["tokens"][1]["candidates"] == ["nau", "não"]
+    assert data["tokens"][1]["toBeNormalized"] is True
+    assert data["tokens"][0]["whitespaceAfter"] == " "
+
+
+def test_save_normalizations_batch(auth_client):
+    """Test saving and deleting several normalizations in one request."""
+    with auth_client.application.app_context():
+        user = db.session.query(User).filter_by(username="testuser").one()
+        text = Text(source_file_name="essay.txt", grade=1)
+        db.session.add(text)
+        db.session.flush()
+        for start_index, new_token in ((0, "Eu"), (3, "lá")):
+            db.session.add(Normalization(
+                text_id=text.id, user_id=user.id, start_index=start_index,
+                end_index=start_index, new_token=new_token, creation_time=datetime.now(),
+            ))
+        db.session.commit()
+        text_id = text.id
+        version = text.content_version
+
+    payload = {
+        "normalizations": [
+            {"first_index": 0, "last_index": 1, "new_token": "Eu mesmo"},
+            {"first_index": 5, "last_index": 5, "new_token": "não"},
+        ],
+        "deletions": [3, 9],
+    }
+    response = auth_client.post(f'/api/texts/{text_id}/normalizations/batch', json=payload)
+    assert response.status_code == 200
+    assert response.json == {"saved": 2, "deleted": 1}
+
+    assert auth_client.get(f'/api/texts/{text_id}/normalizations').json == {
+        "0": {"last_index": 1, "new_token": "Eu mesmo"},
+        "5": {"last_index": 5, "new_token": "não"},
+    }
+    with auth_client.application.app_context():
+        assert db.session.get(Text, text_id).content_version == version + 1
+
+
+@pytest.mark.parametrize("payload", [
+    {},
+    {"normalizations": [{"first_index": 2, "last_index": 2, "new_token": "a"}], "deletions": [2]},
+    {"normalizations": [
+        {"first_index": 2, "last_index": 2, "new_token": "a"},
+        {"first_index": 2, "last_index": 3, "new_token": "b"},
+    ]},
+    {"normalizations": [{"first_index": 4, "last_index": 3, "new_token": "a"}]},
+])
+def test_save_normalizations_batch_rejects_invalid_batches(auth_client, mocker, payload):
+    """Test that empty or conflicting batches are rejected before touching the database."""
+    mock_save = mocker.patch('app.database.queries.save_normalizations_batch')
+
+    response = auth_client.post('/api/texts/1/normalizations/batch', json=payload)
+    assert response.status_code == 400
+    assert response.json["code"] == "VALIDATION_ERROR"
+    mock_save.assert_not_called()
+
+
+def test_suggest_for_all_is_propagated_by_the_worker(auth_client):
+    """Test that suggest_for_all queues a job that links the suggestion to every matching token."""
+    from app.database.models import BackgroundJob, BackgroundJobKind, BackgroundJobState, Suggestion, TokensSuggestions
+    from app.job_worker import process_next_background_job
+
+    with auth_client.application.app_context():
+        text_ids = []
+        for words in (["Eu", "nao", "sei"], ["nao", "vou"], ["sim"]):
+            text = Text(source_file_name="essay.txt", grade=1)
+            db.session.add(text)
+            db.session.flush()
+            db.session.add_all([
+                Token(text_id=text.id, token_text=word, is_word=True, position=position, to_be_normalized=False)
+                for position, word in enumerate(words)
+            ])
+            text_ids.append(text.id)
+        db.session.commit()
+        versions = [db.session.get(Text, text_id).content_version for text_id in text_ids]
+
+    payload = {"first_index": 1, "last_index": 1, "new_token": "não", "suggest_for_all": True}
+    response = auth_client.post(f'/api/texts/{text_ids[0]}/normalizations', json=payload)
+    assert response.status_code == 200
+
+    with auth_client.application.app_context():
+        job = db.session.query(BackgroundJob).one()
+        assert job.kind == BackgroundJobKind.SUGGESTION_PROPAGATION
+        assert job.payload_json == {"token_text": "nao", "suggestion": "não"}
+        assert db.session.query(TokensSuggestions).count() == 0
+
+        assert process_next_background_job(db.session, worker_id="test-worker", stale_after_seconds=300)
+        db.session.expire_all()
+        job = db.session.get(BackgroundJob, job.id)
+        assert job.state == BackgroundJobState.SUCCESS
+        assert job.result_json["linked_tokens"] == 2
+
+        linked = (
+            db.session.query(Token.token_text)
+            .join(TokensSuggestions, TokensSuggestions.token_id == Token.id)
+            .join(Suggestion, Suggestion.id == TokensSuggestions.suggestion_id)
+            .filter(Suggestion.token_text == "não")
+            .all()
+        )
+        assert [row.token_text for row in linked] == ["nao", "nao"]
+        new_versions = [db.session.get(Text, text_id).content_version for text_id in text_ids]
+        # The first text is also bumped by the normalization itself
+        assert new_versions == [versions[0] + 2, versions[1] + 1, versions[2]]